@@ -0,0 +1,110 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.features import load_pipeline
+from housing.forest_engine import compile_forest
+from housing.ingest_data import load_housing_data
+from housing.model_store import FLAT_MAX_ROWS, MODEL_FILE, RoutedForest
+
+
+def latency_percentiles(predict, X, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(timings, [50, 99]) * 1000
+    return {"p50_ms": p50, "p99_ms": p99}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare sklearn, flattened-forest and routed prediction latency, "
+            "and report the batch sizes where the flattened forest is faster."
+        )
+    )
+    parser.add_argument(
+        "--model-folder",
+        default=os.path.join(os.path.dirname(__file__), "..", "artifacts"),
+        help="Folder with best_model.pkl and preprocessing.pkl",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100, 1000, 10000, 100000],
+        help="Batch sizes to benchmark",
+    )
+    parser.add_argument(
+        "--budget-rows",
+        type=int,
+        default=2_000_000,
+        help="Rows predicted per batch size and engine, bounds the repeats",
+    )
+    parser.add_argument("--output", help="Path to save the results as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    model = pd.read_pickle(os.path.join(args.model_folder, MODEL_FILE))
+    forest = compile_forest(model)
+    routed = RoutedForest(forest, model)
+    housing = load_housing_data()
+    # The fitted pipeline of the model, so the benchmark sees its real input.
+    features = load_pipeline(args.model_folder).transform(housing)
+    rng = np.random.default_rng(0)
+
+    results = []
+    for batch_size in args.batch_sizes:
+        X = features[rng.integers(0, len(features), batch_size)]
+        np.testing.assert_allclose(forest.predict(X), model.predict(X), rtol=1e-9)
+        repeats = int(np.clip(args.budget_rows // batch_size, 5, 1000))
+        result = {"batch_size": batch_size, "repeats": repeats}
+        engines = (
+            ("sklearn", model.predict),
+            ("flat", forest.predict),
+            ("routed", routed.predict),
+        )
+        for engine, predict in engines:
+            for name, value in latency_percentiles(predict, X, repeats).items():
+                result[f"{engine}_{name}"] = value
+        result["p50_speedup"] = result["sklearn_p50_ms"] / result["flat_p50_ms"]
+        results.append(result)
+        print(
+            f"batch {batch_size:>7}: sklearn p50 {result['sklearn_p50_ms']:9.3f} ms "
+            f"p99 {result['sklearn_p99_ms']:9.3f} ms | flat p50 "
+            f"{result['flat_p50_ms']:9.3f} ms p99 {result['flat_p99_ms']:9.3f} ms "
+            f"| x{result['p50_speedup']:.2f} | routed p50 "
+            f"{result['routed_p50_ms']:9.3f} ms"
+        )
+
+    # The flat engine only pays off up to some batch size; report where.
+    faster = [r["batch_size"] for r in results if r["p50_speedup"] > 1]
+    slower = [r["batch_size"] for r in results if r["p50_speedup"] <= 1]
+    if not faster:
+        print("flat is not faster than sklearn at any batch size measured")
+    elif not slower:
+        print(f"flat is faster than sklearn up to {max(faster)} rows at least")
+    else:
+        print(
+            f"flat is faster than sklearn up to {max(faster)} rows and slower "
+            f"from {min(slower)} rows; RoutedForest switches after "
+            f"FLAT_MAX_ROWS = {FLAT_MAX_ROWS}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import datetime
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.instrumentation import peak_rss_mb
+from housing.synthetic_data import HOUSING_ROWS, write_synthetic_housing
+
+STAGES = ["prepare_data", "prepare_features", "train_model", "score_model"]
+
+
+def run_stage(stage, workdir, options):
+    """
+    Runs one stage on the data of ``workdir`` and measures it.
+
+    Called in a fresh process per stage, so the peak RSS is that of the
+    stage alone (plus the interpreter and its imports, reported as
+    ``baseline_rss_mb``). Worker processes started by the stage are not
+    included.
+    """
+    os.environ["MLFLOW_TRACKING_URI"] = "file://" + os.path.join(workdir, "mlruns")
+    from housing.features import HousingFeatures
+    from housing.ingest_data import prepare_data
+    from housing.score import score_model
+    from housing.schema import read_housing
+    from housing.storage import data_file
+    from housing.tracking import close_tracker
+    from housing.train import train_model
+
+    data_folder = os.path.join(workdir, "data")
+    processed = os.path.join(data_folder, "processed")
+    train_file = data_file(processed, "train", options["format"])
+    test_file = data_file(processed, "test", options["format"])
+    model_folder = os.path.join(workdir, "artifacts")
+
+    if stage == "prepare_data":
+
+        def call():
+            prepare_data(
+                data_folder,
+                options["format"],
+                options["chunksize"],
+                housing_url=None,
+                housing_path=os.path.join(workdir, "raw"),
+            )
+
+    elif stage == "prepare_features":
+        frame = read_housing(train_file)
+
+        def call():
+            HousingFeatures().fit_transform(frame)
+
+    elif stage == "train_model":
+
+        def call():
+            train_model(
+                train_file,
+                model_folder,
+                search=options["search"],
+                n_jobs=options["n_jobs"],
+                time_budget=options["time_budget"],
+            )
+
+    else:
+
+        def call():
+            score_model(
+                model_folder,
+                test_file,
+                os.path.join(workdir, "scores"),
+                chunksize=options["chunksize"],
+                n_jobs=options["n_jobs"],
+            )
+
+    baseline = peak_rss_mb()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    call()
+    seconds = time.perf_counter() - start_wall
+    cpu_seconds = time.process_time() - start_cpu
+    # Deliver the tracking events of the stage before timing the next one.
+    close_tracker()
+    return {
+        "seconds": seconds,
+        "cpu_seconds": cpu_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "baseline_rss_mb": baseline,
+    }
+
+
+def stage_rows(stage, n_rows):
+    n_test = math.ceil(0.2 * n_rows)
+    if stage == "prepare_data":
+        return n_rows
+    if stage == "score_model":
+        return n_test
+    return n_rows - n_test
+
+
+def environment():
+    import numpy
+    import pandas
+    import sklearn
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def compare(results, baseline_path, max_slowdown):
+    """
+    Returns the stages that got slower than ``max_slowdown`` allows compared
+    with a previous results file.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["scale"], r["stage"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["scale"], result["stage"]))
+        if previous is None:
+            continue
+        ratio = result["seconds"] / previous["seconds"]
+        result["baseline_ratio"] = ratio
+        if ratio > 1 + max_slowdown:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline stages on synthetic housing data."
+    )
+    parser.add_argument(
+        "--scales",
+        type=float,
+        nargs="+",
+        default=[1, 10],
+        help="Multiples of the size of the real data, e.g. 1 10 100 1000",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES,
+        default=STAGES,
+        help="Stages to benchmark, in pipeline order",
+    )
+    parser.add_argument("--format", default="csv", help="Format of the splits")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="Split and score out of core in chunks of this many rows",
+    )
+    parser.add_argument("--search", default="halving", help="Search engine")
+    parser.add_argument("--n-jobs", type=int, help="Number of parallel workers")
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=60.0,
+        help="Wall-clock budget of the hyperparameter search in seconds",
+    )
+    parser.add_argument("--work-dir", help="Where data and models are written")
+    parser.add_argument(
+        "--output", default="bench_stages.json", help="Path to save the results"
+    )
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=0.2,
+        help="Relative slowdown against the baseline reported as a regression",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    options = {
+        "format": args.format,
+        "chunksize": args.chunksize,
+        "search": args.search,
+        "n_jobs": args.n_jobs,
+        "time_budget": args.time_budget,
+    }
+    root = args.work_dir or tempfile.mkdtemp(prefix="bench_stages_")
+    context = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        for scale in args.scales:
+            workdir = os.path.join(root, f"{scale:g}x")
+            write_synthetic_housing(os.path.join(workdir, "raw"), scale)
+            n_rows = int(scale * HOUSING_ROWS)
+            for stage in args.stages:
+                # Not a multiprocessing.Pool: its daemonic workers could not
+                # start the search and scoring workers.
+                with ProcessPoolExecutor(1, mp_context=context) as executor:
+                    measured = executor.submit(
+                        run_stage, stage, workdir, options
+                    ).result()
+                result = {"scale": scale, "rows": n_rows, "stage": stage, **measured}
+                result["rows_per_second"] = stage_rows(stage, n_rows) / max(
+                    measured["seconds"], 1e-9
+                )
+                results.append(result)
+                logging.info(
+                    f"{scale:g}x {stage}: {measured['seconds']:.2f} s, "
+                    f"peak RSS {measured['peak_rss_mb']:.0f} MB"
+                )
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_slowdown)
+        for result in regressions:
+            logging.warning(
+                f"Regression: {result['scale']:g}x {result['stage']} is "
+                f"{result['baseline_ratio']:.2f}x slower than the baseline"
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {"environment": environment(), "options": options, "results": results},
+            f,
+            indent=2,
+        )
+    logging.info(f"Saved benchmark results to {args.output}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,14 @@
 import argparse
 import logging
-import mlflow
 import sys
 import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
-from ingest_data import prepare_data
-from train import train_model
-from score import score_model
+from housing.ingest_data import prepare_data
+from housing.train import train_model
+from housing.score import score_model
+from housing.tracking import Tracker
 
 
 def main():
@@ -23,6 +23,11 @@ def main():
     parser.add_argument(
         "--output-folder", default="../artifacts", help="Path to save the trained model"
     )
+    parser.add_argument(
+        "--tracking-uri",
+        default=os.environ.get("MLFLOW_TRACKING_URI"),
+        help="MLflow tracking server, the MLflow default if unset",
+    )
     parser.add_argument("--log-level", default="INFO", help="Set the logging level")
     parser.add_argument("--log-path", help="Path to save the log file")
     parser.add_argument(
@@ -43,15 +48,17 @@ def main():
 
     logging.info("Starting main mlflow run")
 
-    mlflow.set_tracking_uri("http://127.0.0.1:8080")
-
-    with mlflow.start_run(run_name="Main Run") as main_run:
-        mlflow.log_param("project", "housing_data_project")
+    tracker = Tracker(args.tracking_uri)
+    try:
+        with tracker.start_run("Main Run") as main_run:
+            main_run.log_params({"project": "housing_data_project"})
 
-        # Pass args to train_model function
-        train_model(args.train_data, args.output_folder, args)
+            # Pass args to train_model function
+            train_model(args.train_data, args.output_folder, args, run=main_run)
 
-        logging.info("Main mlflow run completed successfully")
+            logging.info("Main mlflow run completed successfully")
+    finally:
+        tracker.close()
 
 
 if __name__ == "__main__":
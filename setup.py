@@ -12,12 +12,21 @@ setup(
         "pytest",
         "matplotlib",
         "scipy",
+        "joblib",
+        "mlflow",
+        "six",
     ],
     entry_points={
         "console_scripts": [
-            "train_model = src.train:main",
-            "score_model = src.score:main",
-            "ingest_data = src.ingest_data:main",
+            "ingest_data = housing.ingest_data:main",
+            "train_model = housing.train:main",
+            "score_model = housing.score:main",
+            "serve_model = housing.serve:main",
+            "run_pipeline = housing.pipeline:main",
+            "compact_model = housing.compact_model:main",
+            "refresh_model = housing.refresh_model:main",
+            "synthetic_data = housing.synthetic_data:main",
+            "tracking_replay = housing.tracking:main",
         ],
     },
 )
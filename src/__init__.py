@@ -1,3 +0,0 @@
-from .ingest_data import *
-from .score import *
-from .train import *
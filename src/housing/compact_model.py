@@ -0,0 +1,165 @@
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from .features import LABEL_COLUMN, load_pipeline
+from .forest_engine import compact_forest, compile_forest
+from .model_store import FOREST_FILE, MODEL_FILE, save_forest
+from .schema import read_housing
+
+
+def rmse(y_true, y_pred):
+    return float(np.sqrt(np.mean((np.asarray(y_true) - y_pred) ** 2)))
+
+
+def compact_model(
+    model_folder,
+    test_data,
+    tolerance=0.0,
+    value_dtype="uint16",
+    dry_run=False,
+):
+    """
+    Compacts the forest of a model folder and reports what it costs.
+
+    The pickled estimator is compiled, compacted with
+    :func:`forest_engine.compact_forest` and, unless ``dry_run`` is set,
+    written as the memory-mappable forest that scoring and serving load. The
+    pickled estimator is kept as the exact reference. The report records the
+    settings used and compares the sizes of the pickle and of the full and
+    compacted forests, and the RMSE of the exact and compacted forests on
+    ``test_data``. It is logged and, unless ``dry_run`` is set, saved as
+    ``compaction.txt`` in the model folder; a dry run leaves the folder
+    untouched.
+
+    Parameters:
+    model_folder (str): Folder with the trained model and feature pipeline.
+    test_data (str): Path to the test dataset.
+    tolerance (float): Largest change of any tree output allowed by pruning.
+    value_dtype (str): Storage type of the node values, see
+    :func:`forest_engine.compact_forest`.
+    dry_run (bool): Only report, do not write to the model folder.
+
+    Returns:
+    dict: The report.
+
+    Raises:
+    TypeError: If the model is not a fitted random forest.
+    """
+    model = pd.read_pickle(os.path.join(model_folder, MODEL_FILE))
+    if not isinstance(model, RandomForestRegressor) or not hasattr(
+        model, "estimators_"
+    ):
+        raise TypeError(
+            f"Only a fitted RandomForestRegressor can be compacted, {model_folder} "
+            f"holds a {type(model).__name__}"
+        )
+    forest = compile_forest(model)
+    compaction = {"tolerance": tolerance, "value_dtype": value_dtype}
+    if dry_run:
+        compact = compact_forest(forest, **compaction)
+    else:
+        compact = save_forest(
+            forest, os.path.join(model_folder, FOREST_FILE), compaction
+        )
+
+    test_set = read_housing(test_data)
+    X = load_pipeline(model_folder).transform(test_set)
+    exact = forest.predict(X)
+    compacted = compact.predict(X)
+    labels = test_set[LABEL_COLUMN].to_numpy()
+
+    report = {
+        "TOLERANCE": tolerance,
+        "VALUE_DTYPE": value_dtype,
+        "PICKLE_BYTES": os.path.getsize(os.path.join(model_folder, MODEL_FILE)),
+        "FOREST_BYTES": forest.nbytes,
+        "COMPACT_BYTES": compact.nbytes,
+        "SIZE_REDUCTION": 1 - compact.nbytes / forest.nbytes,
+        "NODES": len(forest.value),
+        "COMPACT_NODES": len(compact.value),
+        "RMSE": rmse(labels, exact),
+        "COMPACT_RMSE": rmse(labels, compacted),
+        "MAX_ABS_DIFF": float(np.max(np.abs(compacted - exact), initial=0.0)),
+    }
+    report["RMSE_DELTA"] = report["COMPACT_RMSE"] - report["RMSE"]
+
+    text = "".join(f"{name}: {value}\n" for name, value in report.items())
+    summary = (
+        f"Compacted forest from {forest.nbytes} to {compact.nbytes} bytes "
+        f"({report['SIZE_REDUCTION']:.1%} smaller), "
+        f"RMSE delta {report['RMSE_DELTA']:+.3f}."
+    )
+    if dry_run:
+        logging.info(f"{summary} Dry run, nothing saved:\n{text}")
+    else:
+        report_path = os.path.join(model_folder, "compaction.txt")
+        with open(report_path, "w") as f:
+            f.write(text)
+        logging.info(f"{summary} Report saved to {report_path}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact the trained forest.")
+    parser.add_argument(
+        "--model-folder",
+        default=os.path.join("..", "artifacts"),
+        help="Path to the model",
+    )
+    parser.add_argument(
+        "--dataset-folder",
+        default=os.path.join("..", "data/processed/test.csv"),
+        help="Path to the dataset used to measure the RMSE delta",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.0,
+        help="Prune subtrees that change a tree output by at most this much",
+    )
+    parser.add_argument(
+        "--value-dtype",
+        default="uint16",
+        choices=["uint8", "uint16", "float32", "float64"],
+        help="Storage type of the leaf values",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report, leave the model folder untouched",
+    )
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+
+    args = parser.parse_args(argv)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log and not args.log_path:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    compact_model(
+        args.model_folder,
+        args.dataset_folder,
+        args.tolerance,
+        args.value_dtype,
+        args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from .instrumentation import span
+from .model_store import load_model
+from .schema import (  # noqa: F401 (LABEL_COLUMN is used by importers)
+    CATEGORY_COLUMN,
+    LABEL_COLUMN,
+    NUMERIC_COLUMNS,
+    OCEAN_PROXIMITY,
+)
+from .spatial import SpatialNeighbors
+
+RATIO_FEATURES = [
+    ("rooms_per_household", "total_rooms", "households"),
+    ("bedrooms_per_room", "total_bedrooms", "total_rooms"),
+    ("population_per_household", "population", "households"),
+]
+NUMERIC_FEATURES = NUMERIC_COLUMNS + [name for name, _, _ in RATIO_FEATURES]
+CATEGORY_FEATURES = [f"{CATEGORY_COLUMN}_{value}" for value in OCEAN_PROXIMITY]
+FEATURE_COLUMNS = NUMERIC_FEATURES + CATEGORY_FEATURES
+PIPELINE_FILE = "preprocessing.pkl"
+
+_POSITION = {column: j for j, column in enumerate(NUMERIC_COLUMNS)}
+
+
+def category_codes(values):
+    """
+    Returns the position of each ``ocean_proximity`` value in
+    ``OCEAN_PROXIMITY``, -1 for missing or unknown values.
+    """
+    if (
+        isinstance(values.dtype, pd.CategoricalDtype)
+        and list(values.cat.categories) == OCEAN_PROXIMITY
+    ):
+        return values.cat.codes.to_numpy()
+    return pd.Categorical(values, categories=OCEAN_PROXIMITY).codes
+
+
+def prepare_features(data, medians=None, dtype=np.float32, one_hot=True):
+    """
+    Builds the feature matrix for machine learning modeling.
+
+    The raw numeric columns are copied once into a single preallocated,
+    column-major matrix. The ratio features are computed in place with NumPy
+    and, if ``medians`` are given, missing values are imputed in the same
+    pass, so no intermediate DataFrames are created. With ``one_hot``,
+    ``ocean_proximity`` is encoded in the last columns, one 0/1 column per
+    value of ``OCEAN_PROXIMITY``, set straight from the categorical codes; a
+    missing value leaves them all 0. Any other column is ignored.
+
+    Parameters:
+    data (pandas.DataFrame): Input data.
+    medians (numpy.ndarray): Value imputed for missing entries of each numeric
+    feature, or None to leave them missing.
+    dtype (numpy.dtype): Floating point type of the matrix. Tree ensembles work
+    in float32 internally, so float32 avoids another copy when fitting.
+    one_hot (bool): Encode ``ocean_proximity``.
+
+    Returns:
+    numpy.ndarray: Matrix with one column per entry of ``FEATURE_COLUMNS``, or
+    of ``NUMERIC_FEATURES`` without ``one_hot``.
+    """
+    try:
+        columns = FEATURE_COLUMNS if one_hot else NUMERIC_FEATURES
+        matrix = np.empty((len(data), len(columns)), dtype=dtype, order="F")
+        for j, column in enumerate(NUMERIC_COLUMNS):
+            matrix[:, j] = data[column]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for j, (_, numerator, denominator) in enumerate(
+                RATIO_FEATURES, start=len(NUMERIC_COLUMNS)
+            ):
+                np.divide(
+                    matrix[:, _POSITION[numerator]],
+                    matrix[:, _POSITION[denominator]],
+                    out=matrix[:, j],
+                )
+        if medians is not None:
+            impute_medians(matrix, medians)
+        if one_hot:
+            start = len(NUMERIC_FEATURES)
+            matrix[:, start:] = 0
+            codes = category_codes(data[CATEGORY_COLUMN])
+            (rows,) = np.nonzero(codes >= 0)
+            matrix[rows, start + codes[rows]] = 1
+        logging.info("Features prepared successfully")
+        return matrix
+    except Exception as e:
+        logging.error(f"Failed to prepare features: {e}")
+        raise
+
+
+def _append_columns(matrix, columns):
+    out = np.empty(
+        (len(matrix), matrix.shape[1] + columns.shape[1]), matrix.dtype, order="F"
+    )
+    out[:, : matrix.shape[1]] = matrix
+    out[:, matrix.shape[1] :] = columns
+    return out
+
+
+def impute_medians(matrix, medians):
+    """
+    Replaces missing values of each column of ``matrix`` in place.
+
+    Parameters:
+    matrix (numpy.ndarray): Feature matrix.
+    medians (numpy.ndarray): Value imputed for each column.
+    """
+    for j, median in enumerate(medians):
+        column = matrix[:, j]
+        np.copyto(column, median, where=np.isnan(column))
+
+
+class HousingFeatures(BaseEstimator, TransformerMixin):
+    """
+    Feature pipeline shared by training and scoring.
+
+    Builds the matrix of :func:`prepare_features` and imputes missing values
+    with the per-feature medians learnt during ``fit``. With ``one_hot``,
+    ``ocean_proximity`` is one-hot encoded. With ``n_neighbors``,
+    the spatial features of :class:`spatial.SpatialNeighbors` are appended;
+    their KD-tree over the training coordinates is fitted once and saved
+    with the pipeline, and the neighbour target mean is only added when
+    ``fit`` is given the labels. Scoring only calls ``transform``, so no
+    statistics are recomputed on the data being scored.
+
+    Parameters:
+    dtype (str): Floating point type of the feature matrix.
+    n_neighbors (int): Number of neighbours of the spatial features, or None
+    to leave them out.
+    one_hot (bool): Encode ``ocean_proximity``.
+    """
+
+    def __init__(self, dtype="float32", n_neighbors=None, one_hot=True):
+        self.dtype = dtype
+        self.n_neighbors = n_neighbors
+        self.one_hot = one_hot
+
+    def fit(self, X, y=None):
+        self.fit_transform(X, y)
+        return self
+
+    def fit_transform(self, X, y=None):
+        matrix = prepare_features(X, dtype=self.dtype, one_hot=self.one_hot)
+        with span("impute", rows=len(matrix)):
+            self.medians_ = np.nanmedian(matrix[:, : len(NUMERIC_FEATURES)], axis=0)
+            impute_medians(matrix, self.medians_)
+        self.feature_names_out_ = list(
+            FEATURE_COLUMNS if self.one_hot else NUMERIC_FEATURES
+        )
+        self.neighbors_ = None
+        if self.n_neighbors:
+            self.neighbors_ = SpatialNeighbors(self.n_neighbors)
+            matrix = self._fit_neighbors(self.neighbors_, matrix, y)
+            self.feature_names_out_ += self.neighbors_.feature_names
+        return matrix
+
+    def _fit_neighbors(self, neighbors, matrix, y):
+        with span("neighbors", rows=len(matrix)):
+            spatial = neighbors.fit_transform(
+                matrix[:, _POSITION["longitude"]],
+                matrix[:, _POSITION["latitude"]],
+                matrix[:, _POSITION["median_income"]],
+                y,
+                dtype=self.dtype,
+            )
+            return _append_columns(matrix, spatial)
+
+    def training_transform(self, X, y=None):
+        """
+        Returns the features of rows the pipeline was fitted on, as
+        :meth:`fit_transform` built them.
+
+        :meth:`transform` describes a row among all the training rows, so the
+        spatial features of a training row would count the row itself, label
+        included. Here they are rebuilt from a spatial index fitted on ``X``
+        alone, with each row left out of its own features and the target
+        mean out of fold; the medians are not refitted. Without spatial
+        features this is :meth:`transform`.
+
+        Parameters:
+        X (pandas.DataFrame): Rows the pipeline was fitted on.
+        y (numpy.ndarray): Their labels, needed for the neighbour target mean.
+
+        Returns:
+        numpy.ndarray: Feature matrix.
+        """
+        neighbors = getattr(self, "neighbors_", None)
+        if neighbors is None:
+            return self.transform(X)
+        if neighbors.label_sums_ is None:
+            y = None
+        elif y is None:
+            raise ValueError("y is required for the neighbour target mean")
+        matrix = prepare_features(
+            X, self.medians_, dtype=self.dtype, one_hot=getattr(self, "one_hot", False)
+        )
+        refit = SpatialNeighbors(
+            neighbors.n_neighbors,
+            neighbors.n_folds,
+            neighbors.batch_size,
+            neighbors.leaf_size,
+            neighbors.random_state,
+        )
+        return self._fit_neighbors(refit, matrix, y)
+
+    def fold_features(self, matrix, y):
+        """
+        Returns the per-fold features of a cross-validation on the matrix
+        built by :meth:`fit_transform`, for the ``fold_features`` of the
+        searches in :mod:`search`.
+
+        Only the neighbour target mean depends on the labels. It is the last
+        column of the matrix, and for each fold it is recomputed from the
+        labels of the fold's training rows alone.
+
+        Parameters:
+        matrix (numpy.ndarray): Feature matrix of the training rows.
+        y (numpy.ndarray): Their labels.
+
+        Returns:
+        callable: Maps the train and test row indices of a fold to the last
+        column of the matrix for that fold, or None if no feature depends on
+        the labels.
+        """
+        neighbors = getattr(self, "neighbors_", None)
+        if neighbors is None or neighbors.label_sums_ is None:
+            return None
+        longitude = matrix[:, _POSITION["longitude"]]
+        latitude = matrix[:, _POSITION["latitude"]]
+        median_income = matrix[:, _POSITION["median_income"]]
+
+        def target_mean(train_index, test_index):
+            column = neighbors.fold_target_mean(
+                longitude, latitude, median_income, y, train_index
+            )
+            return column.astype(self.dtype)[:, None]
+
+        return target_mean
+
+    def transform(self, X):
+        # Pipelines saved before the one-hot and spatial features have neither
+        # one_hot nor neighbors_.
+        matrix = prepare_features(
+            X, self.medians_, dtype=self.dtype, one_hot=getattr(self, "one_hot", False)
+        )
+        neighbors = getattr(self, "neighbors_", None)
+        if neighbors is not None:
+            spatial = neighbors.transform(
+                matrix[:, _POSITION["longitude"]],
+                matrix[:, _POSITION["latitude"]],
+                dtype=self.dtype,
+            )
+            matrix = _append_columns(matrix, spatial)
+        return matrix
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_out_, dtype=object)
+
+
+def save_pipeline(pipeline, folder):
+    """
+    Saves a fitted feature pipeline next to the model.
+
+    Parameters:
+    pipeline (HousingFeatures): Fitted feature pipeline.
+    folder (str): Model folder.
+
+    Returns:
+    str: Path of the saved pipeline.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, PIPELINE_FILE)
+    pd.to_pickle(pipeline, path)
+    return path
+
+
+def load_pipeline(folder):
+    """
+    Loads the fitted feature pipeline saved by :func:`save_pipeline`.
+
+    Parameters:
+    folder (str): Model folder.
+
+    Returns:
+    HousingFeatures: Fitted feature pipeline.
+    """
+    return pd.read_pickle(os.path.join(folder, PIPELINE_FILE))
+
+
+def load_predictor(folder, engine="sklearn"):
+    """
+    Loads the model and its fitted feature pipeline once.
+
+    Parameters:
+    folder (str): Folder with the model (see :func:`model_store.load_model`)
+    and ``preprocessing.pkl``.
+    engine (str): Forest engine, see :func:`model_store.load_model`.
+
+    Returns:
+    callable: Maps a DataFrame of raw housing rows to predictions.
+    """
+    model = load_model(folder, engine)
+    pipeline = load_pipeline(folder)
+    logging.info(f"Loaded model and feature pipeline from {folder}")
+
+    def predict(frame):
+        return model.predict(pipeline.transform(frame))
+
+    return predict
@@ -0,0 +1,269 @@
+import numpy as np
+
+TREE_LEAF = -1
+BLOCK_SIZE = 65536
+COMPACT_MIN_PAIRS = 2048
+
+
+def forest_arrays(model):
+    """
+    Extracts the node arrays of a fitted tree ensemble.
+
+    The nodes of all trees are concatenated and child indices are made global,
+    so that ``roots[t]`` is the first node of tree ``t`` and a node is a leaf
+    when ``children_left`` is -1.
+
+    Parameters:
+    model (sklearn.ensemble.RandomForestRegressor): Fitted single-output forest.
+
+    Returns:
+    dict: ``roots``, ``children_left``, ``children_right``, ``feature``,
+    ``threshold`` and ``value`` arrays.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    sizes = np.array([tree.node_count for tree in trees])
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+
+    def children(side):
+        return np.concatenate(
+            [
+                np.where(
+                    getattr(tree, side) == TREE_LEAF,
+                    TREE_LEAF,
+                    getattr(tree, side) + root,
+                )
+                for tree, root in zip(trees, roots)
+            ]
+        ).astype(np.int32)
+
+    return {
+        "roots": roots,
+        "children_left": children("children_left"),
+        "children_right": children("children_right"),
+        "feature": np.concatenate([tree.feature for tree in trees]).astype(np.int32),
+        "threshold": np.concatenate([tree.threshold for tree in trees]),
+        "value": np.concatenate([tree.value[:, 0, 0] for tree in trees]),
+    }
+
+
+class FlatForest:
+    """
+    Structure-of-arrays random forest evaluated for all trees at once.
+
+    Every (row, tree) pair of a batch is advanced one level per step with
+    vectorized gathers, so there is no per-tree or per-row Python work. Leaves
+    point to themselves as both children. Small batches simply take
+    ``max_depth`` steps; larger ones write out the pairs that reach a leaf and
+    drop them from the active set, so each step only touches the pairs still
+    descending. Rows are processed in blocks of ``BLOCK_SIZE`` to bound
+    the size of the temporaries. Inputs are cast to float32 like scikit-learn
+    does, so predictions match ``RandomForestRegressor.predict`` up to the
+    order in which the tree outputs are summed.
+
+    Parameters:
+    arrays (dict): ``roots``, ``children_left``, ``children_right``,
+    ``feature``, ``threshold`` and ``value`` arrays, with self-looping leaves
+    as produced by :func:`compile_forest`.
+    n_features (int): Number of input features.
+    max_depth (int): Depth of the deepest tree.
+    value_scale (float): Scale applied to the averaged ``value`` codes of a
+    quantized forest (see :func:`compact_forest`).
+    value_offset (float): Offset added after scaling.
+    """
+
+    def __init__(
+        self, arrays, n_features, max_depth, value_scale=1.0, value_offset=0.0
+    ):
+        self.arrays = arrays
+        self.roots = arrays["roots"]
+        self.children_left = arrays["children_left"]
+        self.children_right = arrays["children_right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.n_features_in_ = n_features
+        self.max_depth = max_depth
+        self.value_scale = value_scale
+        self.value_offset = value_offset
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def apply(self, X):
+        """
+        Returns the leaf reached by each row in each tree.
+
+        Parameters:
+        X (numpy.ndarray): Feature matrix of shape (rows, features).
+
+        Returns:
+        numpy.ndarray: Global leaf indices of shape (rows, trees).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_trees = self.n_estimators
+        leaves = np.empty((len(X), n_trees), dtype=self.children_left.dtype)
+        for start in range(0, len(X), BLOCK_SIZE):
+            block = X[start : start + BLOCK_SIZE]
+            flat = block.ravel()
+            out = leaves[start : start + len(block)].reshape(-1)
+            node = np.tile(self.roots.astype(out.dtype), len(block))
+            offset = np.repeat(np.arange(0, flat.size, block.shape[1]), n_trees)
+            if node.size < COMPACT_MIN_PAIRS:
+                out[:] = self._descend(flat, offset, node)
+                continue
+            pair = np.arange(node.size)
+            while node.size:
+                left = self.children_left[node]
+                done = left == node
+                if done.any():
+                    out[pair[done]] = node[done]
+                    active = ~done
+                    node, left = node[active], left[active]
+                    pair, offset = pair[active], offset[active]
+                go_left = flat[offset + self.feature[node]] <= self.threshold[node]
+                node = np.where(go_left, left, self.children_right[node])
+        return leaves
+
+    def _descend(self, flat, offset, node):
+        for _ in range(self.max_depth):
+            go_left = flat[offset + self.feature[node]] <= self.threshold[node]
+            node = np.where(
+                go_left, self.children_left[node], self.children_right[node]
+            )
+        return node
+
+    def predict(self, X):
+        prediction = self.value[self.apply(X)].mean(axis=1, dtype=np.float64)
+        if self.value_scale != 1.0 or self.value_offset != 0.0:
+            prediction = prediction * self.value_scale + self.value_offset
+        return prediction
+
+
+def compile_forest(model):
+    """
+    Compiles a fitted random forest into a :class:`FlatForest`.
+
+    Parameters:
+    model (sklearn.ensemble.RandomForestRegressor): Fitted single-output forest.
+
+    Returns:
+    FlatForest: Equivalent forest in structure-of-arrays form.
+    """
+    arrays = forest_arrays(model)
+    leaves = np.flatnonzero(arrays["children_left"] == TREE_LEAF)
+    arrays["children_left"][leaves] = leaves
+    arrays["children_right"][leaves] = leaves
+    arrays["feature"][leaves] = 0
+    max_depth = max(estimator.tree_.max_depth for estimator in model.estimators_)
+    return FlatForest(arrays, int(model.n_features_in_), int(max_depth))
+
+
+def _reachable(forest, is_leaf):
+    """
+    Marks the nodes reachable from the roots when ``is_leaf`` nodes are not
+    descended into.
+
+    Returns:
+    tuple: Boolean mask of reachable nodes, the depth of each of them and the
+    depth of the deepest one.
+    """
+    reachable = np.zeros(len(is_leaf), dtype=bool)
+    depth = np.zeros(len(is_leaf), dtype=np.int32)
+    frontier = np.asarray(forest.roots)
+    level = 0
+    while frontier.size:
+        reachable[frontier] = True
+        depth[frontier] = level
+        frontier = frontier[~is_leaf[frontier]]
+        frontier = np.concatenate(
+            [forest.children_left[frontier], forest.children_right[frontier]]
+        )
+        level += 1
+    return reachable, depth, level - 1
+
+
+def _float32_thresholds(threshold):
+    # Round down to the nearest float32: for float32 inputs ``x <= t`` and
+    # ``x <= float32_floor(t)`` then agree, so the cast changes no split.
+    rounded = threshold.astype(np.float32)
+    above = rounded > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def compact_forest(forest, tolerance=0.0, value_dtype="uint16"):
+    """
+    Builds a smaller copy of a compiled forest for inference.
+
+    Three reductions are applied:
+
+    - Subtrees whose leaf values all lie within ``tolerance`` of the value of
+      their root node are replaced by that node, and the nodes no longer
+      reachable are dropped. Each tree then moves by at most ``tolerance``,
+      and so does the prediction of the forest.
+    - Thresholds are stored as float32, rounded down so that no split
+      decision changes for the float32 inputs trees are evaluated on, and
+      feature indices use the smallest unsigned integer type.
+    - With an unsigned ``value_dtype``, node values are quantized linearly
+      between the smallest and largest leaf value; the error of each
+      prediction is then at most half a quantization step. ``"float32"``
+      casts them instead and None keeps them as they are.
+
+    Parameters:
+    forest (FlatForest): Forest from :func:`compile_forest`.
+    tolerance (float): Largest change of any tree output allowed by pruning.
+    value_dtype (str): ``"uint8"``, ``"uint16"``, ``"float32"`` or None.
+
+    Returns:
+    FlatForest: Compacted forest.
+    """
+    nodes = np.arange(len(forest.children_left))
+    is_leaf = forest.children_left == nodes
+    value = np.asarray(forest.value, dtype=np.float64)
+
+    _, depth, max_depth = _reachable(forest, is_leaf)
+    low, high = value.copy(), value.copy()
+    for level in range(max_depth - 1, -1, -1):
+        split = nodes[(depth == level) & ~is_leaf]
+        left, right = forest.children_left[split], forest.children_right[split]
+        low[split] = np.minimum(low[left], low[right])
+        high[split] = np.maximum(high[left], high[right])
+    collapsed = (high - value <= tolerance) & (value - low <= tolerance)
+    is_leaf = is_leaf | collapsed
+
+    keep, _, max_depth = _reachable(forest, is_leaf)
+    kept = np.flatnonzero(keep)
+    index = (np.cumsum(keep) - 1).astype(np.int32)
+    own = np.arange(len(kept), dtype=np.int32)
+    leaf = is_leaf[kept]
+    arrays = {
+        "roots": index[forest.roots],
+        "children_left": np.where(leaf, own, index[forest.children_left[kept]]),
+        "children_right": np.where(leaf, own, index[forest.children_right[kept]]),
+        "feature": np.where(leaf, 0, forest.feature[kept]).astype(
+            np.min_scalar_type(max(forest.n_features_in_ - 1, 0))
+        ),
+        "threshold": _float32_thresholds(np.asarray(forest.threshold)[kept]),
+    }
+
+    value = value[kept]
+    scale, offset = forest.value_scale, forest.value_offset
+    if value_dtype in ("uint8", "uint16"):
+        low, high = value[leaf].min(), value[leaf].max()
+        levels = np.iinfo(value_dtype).max
+        step = (high - low) / levels if high > low else 1.0
+        codes = np.rint((np.clip(value, low, high) - low) / step)
+        arrays["value"] = codes.astype(value_dtype)
+        scale, offset = scale * step, offset + scale * low
+    elif value_dtype is not None:
+        arrays["value"] = value.astype(value_dtype)
+    else:
+        arrays["value"] = value
+    return FlatForest(
+        arrays, forest.n_features_in_, int(max_depth), float(scale), float(offset)
+    )
@@ -0,0 +1,439 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tarfile
+
+from . import instrumentation
+from .instrumentation import span
+from .schema import HOUSING_COLUMNS, conform, housing_dtypes
+from .storage import FORMATS, FrameWriter, data_file, write_frame
+
+DOWNLOAD_ROOT = "https://raw.githubusercontent.com/ageron/handson-ml/master/"
+HOUSING_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "raw")
+HOUSING_URL = DOWNLOAD_ROOT + "datasets/housing/housing.tgz"
+HOUSING_SHA256 = "d4cd501af90475f09b814c7447c7701f59bf28e8cf1180205ae5ace9737a0109"
+CHUNK_SIZE = 1 << 20
+INCOME_BINS = [0.0, 1.5, 3.0, 4.5, 6.0, float("inf")]
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """
+    Computes the SHA-256 digest of a file without loading it into memory.
+
+    Parameters:
+    path (str): Path to the file.
+    chunk_size (int): Number of bytes read per iteration.
+
+    Returns:
+    str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def download_file(url, path, chunk_size=CHUNK_SIZE):
+    """
+    Downloads a file with conditional and resumable HTTP requests.
+
+    Validators (ETag/Last-Modified) from the previous download are kept in a
+    ``<path>.meta.json`` sidecar and sent back so an unchanged remote file is
+    answered with ``304 Not Modified``. Data is streamed into ``<path>.part``;
+    an interrupted download is resumed with a ``Range`` request and the
+    finished file is moved into place with an atomic rename.
+
+    Parameters:
+    url (str): URL of the file.
+    path (str): Local destination path.
+    chunk_size (int): Number of bytes read per iteration.
+
+    Returns:
+    bool: True if new content was written to ``path``, False if the local copy
+    was still current.
+    """
+    from six.moves import urllib  # type: ignore
+
+    meta_path = path + ".meta.json"
+    part_path = path + ".part"
+    meta = _read_meta(meta_path) if os.path.exists(path) else {}
+    part_meta = _read_meta(part_path + ".meta.json")
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        validator = part_meta.get("etag") or part_meta.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            logging.info(f"{url} not modified, keeping {path}")
+            return False
+        if e.code == 416 and offset:
+            logging.warning(f"Cannot resume {part_path}, restarting download")
+            os.remove(part_path)
+            return download_file(url, path, chunk_size)
+        raise
+
+    with response:
+        new_meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        if offset and response.status == 206:
+            logging.info(f"Resuming download of {url} at byte {offset}")
+            mode = "ab"
+        else:
+            mode = "wb"
+        _write_meta(part_path + ".meta.json", new_meta)
+        with open(part_path, mode) as f:
+            for block in iter(lambda: response.read(chunk_size), b""):
+                f.write(block)
+
+    os.replace(part_path, path)
+    _write_meta(meta_path, new_meta)
+    os.remove(part_path + ".meta.json")
+    return True
+
+
+def fetch_housing_data(
+    housing_url=HOUSING_URL,
+    housing_path=HOUSING_PATH,
+    expected_sha256=HOUSING_SHA256,
+    extract=False,
+):
+    """
+    Fetches the housing archive into a local checksum-keyed cache.
+
+    If ``housing.tgz`` already has the expected digest, the network is not
+    touched. Otherwise the archive is (re)downloaded with
+    :func:`download_file` and verified. The archive is not extracted unless
+    ``extract`` is set, since :func:`load_housing_data` reads the CSV straight
+    out of it.
+
+    Parameters:
+    housing_url (str): URL of the housing data archive.
+    housing_path (str): Local directory where the data will be saved.
+    expected_sha256 (str): Expected SHA-256 digest of the archive, or None to
+    rely on HTTP conditional requests only.
+    extract (bool): Also extract ``housing.csv`` next to the archive.
+
+    Returns:
+    str: Path to the local archive.
+    """
+    os.makedirs(housing_path, exist_ok=True)
+    tgz_path = os.path.join(housing_path, "housing.tgz")
+
+    cached = False
+    if expected_sha256 and os.path.exists(tgz_path):
+        cached = file_sha256(tgz_path) == expected_sha256
+        if not cached:
+            logging.warning(f"Discarding {tgz_path}, checksum does not match")
+            os.remove(tgz_path)
+
+    if cached:
+        logging.info(f"Using cached housing data {tgz_path}")
+        downloaded = False
+    else:
+        logging.info(f"Fetching data from {housing_url}")
+        downloaded = download_file(housing_url, tgz_path)
+        if expected_sha256 and file_sha256(tgz_path) != expected_sha256:
+            os.remove(tgz_path)
+            raise ValueError(
+                f"Checksum mismatch for data downloaded from {housing_url}"
+            )
+        logging.info(f"Downloaded housing data to {tgz_path}")
+
+    csv_path = os.path.join(housing_path, "housing.csv")
+    if extract and (downloaded or not os.path.exists(csv_path)):
+        with tarfile.open(tgz_path) as housing_tgz:
+            housing_tgz.extract("housing.csv", path=housing_path)
+        logging.info(f"Extracted housing data to {housing_path}")
+    return tgz_path
+
+
+@contextlib.contextmanager
+def open_housing_csv(housing_path=HOUSING_PATH):
+    """
+    Opens ``housing.csv`` as a binary file object.
+
+    The CSV is streamed directly out of ``housing.tgz`` without writing an
+    extracted copy to disk. An already extracted ``housing.csv`` is used when
+    the archive is not present.
+
+    Parameters:
+    housing_path (str): Local directory where the data is stored.
+
+    Yields:
+    file object: Readable binary stream of the CSV contents.
+    """
+    tgz_path = os.path.join(housing_path, "housing.tgz")
+    if not os.path.exists(tgz_path):
+        with open(os.path.join(housing_path, "housing.csv"), "rb") as f:
+            yield f
+        return
+    with tarfile.open(tgz_path, "r:gz") as housing_tgz:
+        member = housing_tgz.extractfile("housing.csv")
+        if member is None:
+            raise ValueError(f"housing.csv is not a regular file in {tgz_path}")
+        with member:
+            yield member
+
+
+def load_housing_data(housing_path=HOUSING_PATH):
+    """
+    Loads ``housing.csv`` typed and validated by the housing schema.
+
+    Parameters:
+    housing_path (str): Local directory where the data is stored.
+
+    Returns:
+    pandas.DataFrame: Float32 numeric columns and a categorical
+    ``ocean_proximity``.
+    """
+    import pandas as pd
+
+    logging.info(f"Loading data from {housing_path}")
+    with open_housing_csv(housing_path) as f:
+        return conform(pd.read_csv(f, dtype=housing_dtypes()), HOUSING_COLUMNS)
+
+
+def income_category(median_income):
+    """
+    Buckets median income into the strata used for the train/test split.
+
+    Parameters:
+    median_income (pandas.Series): Median income values.
+
+    Returns:
+    pandas.Series: Categorical income bucket labelled 1 to 5.
+    """
+    import pandas as pd
+
+    return pd.cut(median_income, bins=INCOME_BINS, labels=[1, 2, 3, 4, 5])
+
+
+def _allocate_test_counts(counts, test_size):
+    # Same total as StratifiedShuffleSplit (ceil of the test fraction), spread
+    # over the strata by largest remainder.
+    import numpy as np
+
+    n_test = int(np.ceil(test_size * counts.sum()))
+    exact = counts * n_test / counts.sum()
+    allocation = np.floor(exact).astype(np.int64)
+    remainder = n_test - allocation.sum()
+    order = np.argsort(-(exact - allocation), kind="stable")
+    allocation[order[:remainder]] += 1
+    return allocation
+
+
+def split_housing_data_chunked(
+    train_file,
+    test_file,
+    chunksize,
+    test_size=0.2,
+    random_state=42,
+    housing_path=HOUSING_PATH,
+):
+    """
+    Splits the housing data into stratified train and test files out of core.
+
+    The first pass over the archive only counts the rows in each income
+    stratum. The second pass draws, chunk by chunk, how many of the chunk's
+    rows go to the test set from a hypergeometric distribution over the rows
+    still to come, so every stratum ends up with exactly its share of test
+    rows and each subset is equally likely. Peak memory is bounded by
+    ``chunksize``, not by the size of the dataset.
+
+    Parameters:
+    train_file (str): Destination of the training split.
+    test_file (str): Destination of the test split.
+    chunksize (int): Number of rows held in memory at a time.
+    test_size (float): Fraction of each stratum assigned to the test set.
+    random_state (int): Seed making the split deterministic.
+    housing_path (str): Local directory where the data is stored.
+    """
+    import numpy as np
+    import pandas as pd
+
+    n_strata = len(INCOME_BINS)  # one extra stratum for missing incomes
+    counts = np.zeros(n_strata, dtype=np.int64)
+    with open_housing_csv(housing_path) as f:
+        for chunk in pd.read_csv(
+            f,
+            chunksize=chunksize,
+            usecols=["median_income"],
+            dtype=housing_dtypes(["median_income"]),
+        ):
+            strata = income_category(chunk["median_income"]).cat.codes + 1
+            counts += np.bincount(strata, minlength=n_strata)
+    logging.info(f"Counted {counts.sum()} rows per income stratum: {counts.tolist()}")
+
+    rows_left = counts.copy()
+    test_left = _allocate_test_counts(counts, test_size)
+    rng = np.random.default_rng(random_state)
+    with open_housing_csv(housing_path) as f, FrameWriter(
+        train_file
+    ) as train_writer, FrameWriter(test_file) as test_writer:
+        for chunk in pd.read_csv(f, chunksize=chunksize, dtype=housing_dtypes()):
+            chunk = conform(chunk, HOUSING_COLUMNS)
+            strata = (income_category(chunk["median_income"]).cat.codes + 1).to_numpy()
+            is_test = np.zeros(len(chunk), dtype=bool)
+            for stratum in np.unique(strata):
+                rows = np.flatnonzero(strata == stratum)
+                n_test = rng.hypergeometric(
+                    test_left[stratum],
+                    rows_left[stratum] - test_left[stratum],
+                    len(rows),
+                )
+                is_test[rng.choice(rows, n_test, replace=False)] = True
+                rows_left[stratum] -= len(rows)
+                test_left[stratum] -= n_test
+            train_writer.write(chunk[~is_test])
+            test_writer.write(chunk[is_test])
+    logging.info(f"Split {train_writer.rows} train and {test_writer.rows} test rows")
+
+
+def prepare_data(
+    output_folder,
+    file_format="csv",
+    chunksize=None,
+    housing_url=HOUSING_URL,
+    expected_sha256=HOUSING_SHA256,
+    housing_path=HOUSING_PATH,
+):
+    with span("ingest") as stage:
+        if housing_url:
+            with span("fetch"):
+                fetch_housing_data(housing_url, housing_path, expected_sha256)
+
+        processed_path = os.path.join(output_folder, "processed")
+        os.makedirs(processed_path, exist_ok=True)
+        logging.info(f"Created directory {processed_path}")
+
+        train_file = data_file(processed_path, "train", file_format)
+        test_file = data_file(processed_path, "test", file_format)
+
+        if chunksize:
+            with span("split"):
+                split_housing_data_chunked(
+                    train_file, test_file, chunksize, housing_path=housing_path
+                )
+        else:
+            from sklearn.model_selection import StratifiedShuffleSplit
+
+            with span("load") as load:
+                housing = load_housing_data(housing_path)
+                load.rows = stage.rows = len(housing)
+
+            with span("split", rows=stage.rows):
+                housing["income_cat"] = income_category(housing["median_income"])
+
+                split = StratifiedShuffleSplit(
+                    n_splits=1, test_size=0.2, random_state=42
+                )
+                for train_index, test_index in split.split(
+                    housing, housing["income_cat"]
+                ):
+                    strat_train_set = housing.loc[train_index]
+                    strat_test_set = housing.loc[test_index]
+
+                for set_ in (strat_train_set, strat_test_set):
+                    set_.drop("income_cat", axis=1, inplace=True)
+
+            with span("save", rows=stage.rows):
+                write_frame(strat_train_set, train_file)
+                write_frame(strat_test_set, test_file)
+    logging.info(f"Saved train data to {train_file}")
+    logging.info(f"Saved test data to {test_file}")
+
+    return train_file, test_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Ingest data for training and validation."
+    )
+    parser.add_argument(
+        "--output-folder",
+        default=os.path.join(os.path.dirname(__file__), "..", "..", "data"),
+        help="Path to save the output data",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(FORMATS),
+        default="csv",
+        help="Storage format of the processed train/test files",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="Split out of core, holding at most this many rows in memory",
+    )
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+    parser.add_argument(
+        "--profile-dir", help="Save a cProfile dump of each stage in this folder"
+    )
+    parser.add_argument(
+        "--span-log", help="Append stage timings to this JSON Lines file"
+    )
+
+    args = parser.parse_args(argv)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log and not args.log_path:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    instrumentation.configure(args.profile_dir, args.span_log)
+
+    logging.info(f"Starting data preparation with output folder {args.output_folder}")
+    train_file, test_file = prepare_data(
+        args.output_folder, args.format, args.chunksize
+    )
+    logging.info(
+        f"Data preparation completed. Train file: {train_file}, Test file: {test_file}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import contextlib
+import itertools
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+logger = logging.getLogger("instrumentation")
+
+_local = threading.local()
+_profile_dir = None
+_span_handler = None
+_profile_sequence = itertools.count()
+
+
+def configure(profile_dir=None, span_log=None):
+    """
+    Sets where span records and profiles are written.
+
+    Span records are always logged as JSON messages by the ``instrumentation``
+    logger. ``span_log`` adds a handler writing them alone, one JSON object
+    per line. Calling it again replaces the handler added by the previous
+    call, so each record is written once.
+
+    Parameters:
+    profile_dir (str): Folder receiving a cProfile dump of every top-level
+    span, or None to disable profiling.
+    span_log (str): JSON Lines file receiving the span records, if any.
+    """
+    global _profile_dir, _span_handler
+    _profile_dir = profile_dir
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    if _span_handler is not None:
+        logger.removeHandler(_span_handler)
+        _span_handler.close()
+        _span_handler = None
+    if span_log:
+        _span_handler = logging.FileHandler(span_log)
+        _span_handler.setFormatter(logging.Formatter("%(message)s"))
+        _span_handler.addFilter(lambda record: record.levelno == logging.INFO)
+        logger.addHandler(_span_handler)
+        if logger.getEffectiveLevel() > logging.INFO:
+            logger.setLevel(logging.INFO)
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of the process so far, in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+class Span:
+    """
+    Measurements of one timed block, see :func:`span`.
+
+    ``cpu_seconds`` is the CPU time of the whole process, so it includes the
+    other threads but not worker processes. The peak RSS is a high-water mark
+    of the process and cannot go down; ``rss_growth_mb`` is how much the
+    block raised it.
+
+    Parameters:
+    name (str): Dotted path of the span, e.g. ``train.search``.
+    rows (int): Number of rows processed, if known.
+    """
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.children = []
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_mb = None
+        self.rss_growth_mb = None
+        self.profile = None
+
+    @property
+    def rows_per_second(self):
+        if not self.rows or not self.wall_seconds:
+            return None
+        return self.rows / self.wall_seconds
+
+    def record(self):
+        """
+        Returns the measurements as a JSON-serializable dict.
+        """
+        return {
+            "span": self.name,
+            "rows": self.rows,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "rows_per_second": self.rows_per_second,
+            "peak_rss_mb": self.peak_rss_mb,
+            "rss_growth_mb": self.rss_growth_mb,
+            "profile": self.profile,
+        }
+
+    def metrics(self):
+        """
+        Returns the measurements of this span and the spans nested in it as
+        tracking metrics named ``<span>.<measurement>``.
+        """
+        metrics = {
+            f"{self.name}.{key}": value
+            for key, value in self.record().items()
+            if key not in ("span", "profile") and value is not None
+        }
+        for child in self.children:
+            metrics.update(child.metrics())
+        return metrics
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+@contextlib.contextmanager
+def span(name, rows=None):
+    """
+    Times a block and logs its wall time, CPU time, peak RSS and rows/sec.
+
+    Spans opened inside the block are nested under it, so their names are
+    prefixed with its name. When profiling is enabled with :func:`configure`,
+    every top-level span is profiled with cProfile and dumped to
+    ``<profile_dir>/<name>-<pid>-<n>.prof``, whose path is part of the
+    record.
+
+    Parameters:
+    name (str): Name of the block.
+    rows (int): Number of rows processed, can also be set on the span later.
+
+    Yields:
+    Span: The measurements, filled in when the block exits.
+    """
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    current = Span(name if parent is None else f"{parent.name}.{name}", rows)
+    profiler = None
+    if parent is None and _profile_dir:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            logger.warning(f"Another profiler is active, not profiling {name}")
+            profiler = None
+
+    stack.append(current)
+    start_rss = peak_rss_mb()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield current
+    finally:
+        current.wall_seconds = time.perf_counter() - start_wall
+        current.cpu_seconds = time.process_time() - start_cpu
+        current.peak_rss_mb = peak_rss_mb()
+        current.rss_growth_mb = current.peak_rss_mb - start_rss
+        stack.pop()
+        if parent is not None:
+            parent.children.append(current)
+        if profiler is not None:
+            profiler.disable()
+            current.profile = os.path.join(
+                _profile_dir,
+                f"{current.name}-{os.getpid()}-{next(_profile_sequence)}.prof",
+            )
+            profiler.dump_stats(current.profile)
+        logger.info(json.dumps(current.record()))
@@ -0,0 +1,240 @@
+import json
+import logging
+import mmap
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from .forest_engine import FlatForest, compact_forest, compile_forest
+
+MODEL_FILE = "best_model.pkl"
+FOREST_FILE = "best_model.forest"
+ENGINES = ("sklearn", "flat", "auto")
+# Largest batch the flattened forest predicts faster than scikit-learn, see
+# scripts/bench_forest.py: 2-4x faster for 1 row, even near 30-60 rows and
+# 1.5-3x slower from 1k rows up.
+FLAT_MAX_ROWS = 32
+
+_MAGIC = b"HFOREST1"
+_ALIGNMENT = 64
+
+
+def write_arrays(path, arrays, metadata=None):
+    """
+    Writes arrays as uncompressed, aligned blocks after a small JSON header.
+
+    The file starts with an 8 byte magic string and the length of the JSON
+    header, which records the dtype, shape and offset of each array. Blocks are
+    aligned to 64 bytes so they can be mapped directly by :func:`read_arrays`.
+    The file is written next to ``path`` and renamed into place.
+
+    Parameters:
+    path (str): Destination file.
+    arrays (dict): Arrays to store, by name.
+    metadata (dict): JSON-serializable values stored in the header.
+    """
+    header = {"metadata": metadata or {}, "arrays": {}}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+    header_bytes = json.dumps(header).encode("utf-8")
+    start = -(-(len(_MAGIC) + 8 + len(header_bytes)) // _ALIGNMENT) * _ALIGNMENT
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(start + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_arrays(path):
+    """
+    Maps the arrays written by :func:`write_arrays` without copying them.
+
+    The arrays are read-only views of a shared memory map, so every process
+    that loads the same file uses the same physical pages.
+
+    Parameters:
+    path (str): File written by :func:`write_arrays`.
+
+    Returns:
+    tuple: Dict of arrays by name and the header metadata.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[: len(_MAGIC)] != _MAGIC:
+        raise ValueError(f"{path} is not a forest model file")
+    (header_size,) = struct.unpack_from("<Q", buffer, len(_MAGIC))
+    header_end = len(_MAGIC) + 8 + header_size
+    header = json.loads(buffer[len(_MAGIC) + 8 : header_end])
+    start = -(-header_end // _ALIGNMENT) * _ALIGNMENT
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        arrays[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=start + spec["offset"]
+        ).reshape(spec["shape"])
+    return arrays, header["metadata"]
+
+
+def save_forest(model, path, compaction=None):
+    """
+    Saves a fitted random forest in the memory-mappable format.
+
+    The forest is compiled with :func:`forest_engine.compile_forest`,
+    optionally compacted, and its structure-of-arrays representation is
+    written with :func:`write_arrays`.
+
+    Parameters:
+    model (sklearn.ensemble.RandomForestRegressor or FlatForest): Fitted
+    single-output forest, or an already compiled one.
+    path (str): Destination file.
+    compaction (dict): Keyword arguments of :func:`forest_engine.compact_forest`,
+    or None to store the forest exactly.
+
+    Returns:
+    FlatForest: The forest that was written.
+    """
+    forest = model if isinstance(model, FlatForest) else compile_forest(model)
+    if compaction is not None:
+        forest = compact_forest(forest, **compaction)
+    write_arrays(
+        path,
+        forest.arrays,
+        {
+            "estimator": type(model).__name__,
+            "n_features": forest.n_features_in_,
+            "max_depth": forest.max_depth,
+            "value_scale": forest.value_scale,
+            "value_offset": forest.value_offset,
+            "compaction": compaction,
+        },
+    )
+    logging.info(f"Saved memory-mappable forest to {path}")
+    return forest
+
+
+def load_forest(path):
+    """
+    Loads a forest saved by :func:`save_forest` without copying its arrays.
+
+    Parameters:
+    path (str): File written by :func:`save_forest`.
+
+    Returns:
+    FlatForest: Forest ready for prediction.
+    """
+    return _flat_forest(*read_arrays(path))
+
+
+def _flat_forest(arrays, metadata):
+    return FlatForest(
+        arrays,
+        metadata["n_features"],
+        metadata["max_depth"],
+        metadata.get("value_scale", 1.0),
+        metadata.get("value_offset", 0.0),
+    )
+
+
+class RoutedForest:
+    """
+    Predicts each batch with the faster of two copies of the same forest.
+
+    Batches of up to ``max_flat_rows`` rows go to the flattened forest, whose
+    vectorized traversal has less per-call overhead, and larger ones to the
+    scikit-learn estimator, whose compiled per-tree traversal scales better.
+
+    Parameters:
+    flat (FlatForest): Flattened forest.
+    estimator (sklearn.ensemble.RandomForestRegressor): Same forest, unpickled.
+    max_flat_rows (int): Largest batch predicted by ``flat``.
+    """
+
+    def __init__(self, flat, estimator, max_flat_rows=FLAT_MAX_ROWS):
+        self.flat = flat
+        self.estimator = estimator
+        self.max_flat_rows = max_flat_rows
+
+    def predict(self, X):
+        if len(X) <= self.max_flat_rows:
+            return self.flat.predict(X)
+        return self.estimator.predict(X)
+
+
+def save_model(model, folder, compaction=None):
+    """
+    Saves a trained model to a model folder.
+
+    The estimator is always pickled. Random forests are also saved in the
+    memory-mappable format, which :func:`load_model` uses for small batches;
+    a stale forest file from an earlier model is removed otherwise.
+
+    Parameters:
+    model (estimator): Fitted estimator.
+    folder (str): Model folder.
+    compaction (dict): Keyword arguments of :func:`forest_engine.compact_forest`
+    applied to the memory-mappable forest, or None.
+
+    Returns:
+    str: Path of the pickled model.
+    """
+    os.makedirs(folder, exist_ok=True)
+    model_path = os.path.join(folder, MODEL_FILE)
+    pd.to_pickle(model, model_path)
+    forest_path = os.path.join(folder, FOREST_FILE)
+    if hasattr(model, "estimators_") and getattr(model, "n_outputs_", 0) == 1:
+        save_forest(model, forest_path, compaction)
+    elif os.path.exists(forest_path):
+        os.remove(forest_path)
+    return model_path
+
+
+def load_model(folder, engine="sklearn"):
+    """
+    Loads the trained model from a model folder.
+
+    ``engine`` chooses how a saved random forest is evaluated:
+
+    - ``"sklearn"``: the pickled estimator, fastest from a few dozen rows up,
+      so batch and bulk scoring use it.
+    - ``"flat"``: the memory-mapped :class:`forest_engine.FlatForest`,
+      fastest for single rows and shared between the processes mapping it.
+    - ``"auto"``: a :class:`RoutedForest` choosing one of them by batch size,
+      for the prediction server. A compacted forest is always used as is,
+      since the pickled estimator has not been compacted and would predict
+      differently.
+
+    Models without a forest file always use the pickled estimator.
+
+    Parameters:
+    folder (str): Model folder.
+    engine (str): One of ``ENGINES``.
+
+    Returns:
+    estimator: Object with a ``predict`` method.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {ENGINES}, got {engine!r}")
+    forest_path = os.path.join(folder, FOREST_FILE)
+    model_path = os.path.join(folder, MODEL_FILE)
+    if engine == "sklearn" or not os.path.exists(forest_path):
+        return pd.read_pickle(model_path)
+    arrays, metadata = read_arrays(forest_path)
+    forest = _flat_forest(arrays, metadata)
+    if engine == "flat" or metadata.get("compaction") is not None:
+        return forest
+    return RoutedForest(forest, pd.read_pickle(model_path))
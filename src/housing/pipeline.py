@@ -0,0 +1,483 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import instrumentation
+from .ingest_data import HOUSING_SHA256, HOUSING_URL, file_sha256
+from .storage import FORMATS, data_file
+
+STATE_FILE = "pipeline_state.json"
+
+
+class Stage:
+    """
+    A step of the pipeline with declared inputs and outputs.
+
+    A stage runs ``func(**params)``. It depends on every stage that declares
+    one of its ``inputs`` as an output, and its fingerprint covers the
+    contents of the input files, the params not listed in ``untracked`` and
+    the source of the ``code`` modules.
+
+    Parameters:
+    name (str): Unique name of the stage.
+    func (callable): Function producing the outputs.
+    inputs (list): Files read by the stage.
+    outputs (list): Files written by the stage.
+    params (dict): Keyword arguments of ``func``.
+    code (list): Modules whose source is part of the fingerprint, the module
+    of ``func`` by default. Relative names are resolved in this package.
+    untracked (list): Params that do not change the outputs, e.g. ``n_jobs``.
+    """
+
+    def __init__(
+        self,
+        name,
+        func,
+        inputs=(),
+        outputs=(),
+        params=None,
+        code=None,
+        untracked=(),
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = [os.path.abspath(path) for path in inputs]
+        self.outputs = [os.path.abspath(path) for path in outputs]
+        self.params = params or {}
+        self.code = list(code) if code is not None else [func.__module__]
+        self.untracked = set(untracked)
+
+    def run(self):
+        return self.func(**self.params)
+
+
+class PipelineRunner:
+    """
+    Runs stages in dependency order and skips those whose outputs are current.
+
+    Before a stage runs, its fingerprint is compared with the one recorded in
+    ``pipeline_state.json`` the last time it succeeded. The stage is skipped
+    when the fingerprints match and its outputs still have the recorded
+    contents. File digests are cached by path, size and modification time,
+    so unchanged files are not read again. A stage whose upstream reran but
+    produced identical outputs is skipped as well. Stages whose upstream
+    stages are done run concurrently in a thread pool.
+
+    Parameters:
+    cache_dir (str): Directory of the state file.
+    max_workers (int): Number of stages run at the same time.
+    """
+
+    def __init__(self, cache_dir, max_workers=None):
+        self.cache_dir = cache_dir
+        self.state_path = os.path.join(cache_dir, STATE_FILE)
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"stages": {}, "files": {}}
+
+    def _save_state(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def file_digest(self, path):
+        """
+        Returns the SHA-256 of a file, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            cached = self._state["files"].get(path)
+        if cached is not None and cached["stat"] == key:
+            return cached["sha256"]
+        digest = file_sha256(path)
+        with self._lock:
+            self._state["files"][path] = {"stat": key, "sha256": digest}
+        return digest
+
+    def fingerprint(self, stage):
+        """
+        Hashes everything that determines the outputs of a stage.
+        """
+        params = {k: v for k, v in stage.params.items() if k not in stage.untracked}
+        code = {
+            module: file_sha256(importlib.util.find_spec(module, __package__).origin)
+            for module in stage.code
+        }
+        inputs = {path: self.file_digest(path) for path in stage.inputs}
+        payload = json.dumps(
+            {"params": params, "code": code, "inputs": inputs},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_current(self, stage, fingerprint):
+        record = self._state["stages"].get(stage.name)
+        if record is None or record["fingerprint"] != fingerprint:
+            return False
+        return all(
+            self.file_digest(path) == record["outputs"].get(path)
+            for path in stage.outputs
+        )
+
+    def _run_stage(self, stage, force):
+        fingerprint = self.fingerprint(stage)
+        if not force and self.is_current(stage, fingerprint):
+            logging.info(f"Stage {stage.name} is up to date, skipping")
+            return False
+        logging.info(f"Running stage {stage.name}")
+        stage.run()
+        outputs = {path: self.file_digest(path) for path in stage.outputs}
+        missing = [path for path, digest in outputs.items() if digest is None]
+        if missing:
+            raise RuntimeError(f"Stage {stage.name} did not write {missing}")
+        with self._lock:
+            self._state["stages"][stage.name] = {
+                "fingerprint": fingerprint,
+                "outputs": outputs,
+            }
+            self._save_state()
+        return True
+
+    def run(self, stages, force=()):
+        """
+        Runs the stages that are not up to date.
+
+        Parameters:
+        stages (list): Stages to run; their order does not matter.
+        force (list): Names of stages to run even if they are up to date.
+
+        Returns:
+        dict: For each stage name, True if it ran and False if it was skipped.
+        """
+        producers = {path: stage for stage in stages for path in stage.outputs}
+        upstream = {
+            stage.name: {
+                producers[path].name for path in stage.inputs if path in producers
+            }
+            for stage in stages
+        }
+        by_name = {stage.name: stage for stage in stages}
+        results, running = {}, {}
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            while len(results) < len(stages):
+                for name, deps in upstream.items():
+                    if name in results or name in running.values():
+                        continue
+                    if deps <= results.keys():
+                        future = executor.submit(
+                            self._run_stage, by_name[name], name in force
+                        )
+                        running[future] = name
+                if not running:
+                    raise ValueError("The stages have a dependency cycle")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        logging.error(f"Stage {name} failed")
+                        for other in running:
+                            other.cancel()
+                        raise
+        with self._lock:
+            self._save_state()
+        return results
+
+
+def housing_stages(
+    data_folder,
+    model_folder,
+    scores_folder,
+    score_data=None,
+    file_format="csv",
+    chunksize=None,
+    search="grid",
+    n_jobs=None,
+    time_budget=None,
+    checkpoint_dir=None,
+    cpu_budget=None,
+    n_neighbors=None,
+    models=None,
+):
+    """
+    Builds the ingest, train and score stages of the housing pipeline.
+
+    Parameters:
+    data_folder (str): Folder receiving ``processed/train`` and
+    ``processed/test``.
+    model_folder (str): Folder of the trained model and feature pipeline.
+    scores_folder (str): Folder of the scores.
+    score_data (list): Datasets to score, each in its own stage. The test split
+    is scored into ``scores_folder`` and the others into subfolders named
+    after them. The test split by default.
+    file_format (str): Storage format of the processed splits.
+    chunksize (int): Split and score out of core in chunks of this many rows.
+    search (str): Hyperparameter search engine, not used with ``models``.
+    n_jobs (int): Number of parallel search or scoring workers.
+    time_budget (float): Wall-clock budget of the search in seconds.
+    checkpoint_dir (str): Where the search checkpoints its fits, if anywhere.
+    cpu_budget (float): CPU seconds the search may spend fitting.
+    n_neighbors (int): Number of neighbours of the spatial features, if any.
+    models (list): Model families compared by a bake-off, or None to search
+    the forest alone.
+
+    Returns:
+    list: Stages for :meth:`PipelineRunner.run`.
+    """
+    from .features import PIPELINE_FILE
+    from .ingest_data import prepare_data
+    from .model_store import FOREST_FILE, MODEL_FILE
+    from .score import score_model
+    from .train import LEADERBOARD_FILE, train_model
+
+    processed = os.path.join(data_folder, "processed")
+    train_file = data_file(processed, "train", file_format)
+    test_file = data_file(processed, "test", file_format)
+    model_files = [
+        os.path.join(model_folder, name)
+        for name in (MODEL_FILE, FOREST_FILE, PIPELINE_FILE)
+    ]
+    train_outputs = model_files
+    if models:
+        # The winner of a bake-off need not be a forest.
+        model_files = [path for path in model_files if not path.endswith(FOREST_FILE)]
+        train_outputs = model_files + [os.path.join(model_folder, LEADERBOARD_FILE)]
+
+    stages = [
+        Stage(
+            "ingest",
+            prepare_data,
+            outputs=[train_file, test_file],
+            params={
+                "output_folder": data_folder,
+                "file_format": file_format,
+                "chunksize": chunksize,
+                "housing_url": HOUSING_URL,
+                "expected_sha256": HOUSING_SHA256,
+            },
+            code=[".ingest_data", ".schema", ".storage"],
+            untracked=["housing_url"],
+        ),
+        Stage(
+            "train",
+            train_model,
+            inputs=[train_file],
+            outputs=train_outputs,
+            params={
+                "train_data": train_file,
+                "output_folder": model_folder,
+                "search": search,
+                "n_jobs": n_jobs,
+                "time_budget": time_budget,
+                "checkpoint_dir": checkpoint_dir,
+                "cpu_budget": cpu_budget,
+                "n_neighbors": n_neighbors,
+                "models": models,
+            },
+            code=[
+                ".train",
+                ".schema",
+                ".storage",
+                ".features",
+                ".spatial",
+                ".search",
+                ".model_store",
+                ".forest_engine",
+            ],
+            # A bake-off searches each family on its grid, and its time
+            # budget only cuts candidates short on a slow run.
+            untracked=["n_jobs", "checkpoint_dir"]
+            + (["search", "time_budget"] if models else []),
+        ),
+    ]
+    score_data = score_data or [test_file]
+    for path in score_data:
+        if os.path.abspath(path) == os.path.abspath(test_file):
+            name, output_folder = "score", scores_folder
+        else:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            name, output_folder = f"score:{stem}", os.path.join(scores_folder, stem)
+        stages.append(
+            Stage(
+                name,
+                score_model,
+                inputs=model_files + [path],
+                outputs=[os.path.join(output_folder, "scores.txt")],
+                params={
+                    "model_path": model_folder,
+                    "test_data": path,
+                    "output_folder": output_folder,
+                    "chunksize": chunksize,
+                    "n_jobs": n_jobs,
+                },
+                code=[
+                    ".score",
+                    ".schema",
+                    ".storage",
+                    ".features",
+                    ".spatial",
+                    ".model_store",
+                    ".forest_engine",
+                ],
+                untracked=["n_jobs"],
+            )
+        )
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the ingest, train and score stages that are out of date."
+    )
+    parser.add_argument(
+        "--data-folder",
+        default=os.path.join("..", "data"),
+        help="Path to save the processed data",
+    )
+    parser.add_argument(
+        "--model-folder",
+        default=os.path.join("..", "artifacts"),
+        help="Path to save the model",
+    )
+    parser.add_argument(
+        "--scores-folder",
+        default=os.path.join("..", "scores"),
+        help="Path to save the scores",
+    )
+    parser.add_argument(
+        "--score-data",
+        nargs="+",
+        help="Datasets to score, the test split by default",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(FORMATS),
+        default="csv",
+        help="Storage format of the processed train/test files",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="Split and score out of core in chunks of this many rows",
+    )
+    parser.add_argument(
+        "--search",
+        help="Hyperparameter search engine: grid (default), halving, random or "
+        "adaptive",
+    )
+    parser.add_argument(
+        "--n-jobs", type=int, help="Number of parallel search or scoring workers"
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Wall-clock budget of the hyperparameter search in seconds",
+    )
+    parser.add_argument(
+        "--cpu-budget",
+        type=float,
+        help="CPU seconds the hyperparameter search may spend fitting",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        help="Checkpoint the search here and resume it if training is restarted",
+    )
+    parser.add_argument(
+        "--neighbors",
+        type=int,
+        help="Add features of this many nearest neighbours by location",
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        help="Compare these model families: linear, tree and/or forest",
+    )
+    parser.add_argument(
+        "--force",
+        nargs="+",
+        default=[],
+        help="Names of stages to run even if they are up to date",
+    )
+    parser.add_argument(
+        "--max-workers", type=int, help="Number of stages run at the same time"
+    )
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+    parser.add_argument(
+        "--profile-dir", help="Save a cProfile dump of each stage in this folder"
+    )
+    parser.add_argument(
+        "--span-log", help="Append stage timings to this JSON Lines file"
+    )
+
+    args = parser.parse_args(argv)
+
+    from .train import check_search_args
+
+    check_search_args(parser, args)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log and not args.log_path:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    instrumentation.configure(args.profile_dir, args.span_log)
+
+    stages = housing_stages(
+        args.data_folder,
+        args.model_folder,
+        args.scores_folder,
+        args.score_data,
+        args.format,
+        args.chunksize,
+        args.search or "grid",
+        args.n_jobs,
+        args.time_budget,
+        args.checkpoint_dir,
+        args.cpu_budget,
+        args.neighbors,
+        args.models,
+    )
+    from .tracking import close_tracker
+
+    try:
+        results = PipelineRunner(args.data_folder, args.max_workers).run(
+            stages, args.force
+        )
+    finally:
+        close_tracker()
+    for name, ran in results.items():
+        logging.info(f"{name}: {'ran' if ran else 'up to date'}")
+
+
+if __name__ == "__main__":
+    main()
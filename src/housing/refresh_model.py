@@ -0,0 +1,280 @@
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+
+from .compact_model import rmse
+from .features import LABEL_COLUMN, load_pipeline
+from .model_store import FOREST_FILE, MODEL_FILE, read_arrays, save_model
+from .schema import read_housing
+
+# Bound of the tree seeds scikit-learn draws from a forest's random_state.
+MAX_SEED = np.iinfo(np.int32).max
+
+
+def _previous_compaction(model_folder):
+    forest_path = os.path.join(model_folder, FOREST_FILE)
+    if not os.path.exists(forest_path):
+        return None
+    _, metadata = read_arrays(forest_path)
+    return metadata.get("compaction")
+
+
+def _next_random_state(model, grown):
+    """
+    Returns a seed for the trees grown after ``grown`` trees were drawn from
+    ``model.random_state``.
+
+    A warm start skips one seed per tree already in the forest, so once
+    trees are retired it would hand the new trees seeds that the remaining
+    ones were grown with. Seeding the stream from its first unused value
+    avoids that.
+    """
+    if not isinstance(model.random_state, (int, np.integer)):
+        return model.random_state
+    seeds = np.random.RandomState(model.random_state).randint(MAX_SEED, size=grown + 1)
+    return int(seeds[-1])
+
+
+def refresh_model(
+    model_folder,
+    new_data,
+    history_data=None,
+    holdout_data=None,
+    n_trees=None,
+    history_ratio=1.0,
+    max_trees=None,
+    full_retrain=False,
+    random_state=42,
+    dry_run=False,
+):
+    """
+    Refreshes a trained forest with newly ingested rows instead of retraining.
+
+    The pickled estimator is warm-started: its trees are kept and ``n_trees``
+    new ones are grown on the new rows plus a random sample of
+    ``history_ratio`` times as many older rows, so that the new trees do not
+    forget the rest of the data. With ``max_trees``, the oldest trees are then
+    retired to cap the size of the model. The fitted feature pipeline is
+    reused as is; its medians are not refitted on the new rows, exactly as
+    at scoring time. The older rows are ones it was fitted on, so they get
+    the features they were trained on from
+    :meth:`features.HousingFeatures.training_transform`: their neighbour
+    features leave them out instead of counting their own label.
+
+    Only random forests can be refreshed; other models, such as the winner
+    of a bake-off between model families, have to be retrained.
+
+    Unless ``dry_run`` is set, the refreshed model is saved in place with the
+    compaction settings of the forest it replaces. The report is logged and,
+    unless ``dry_run`` is set, saved as ``refresh.txt`` in the model folder.
+    It gives the holdout RMSE
+    before and after the refresh and, with ``full_retrain``, that of the
+    same estimator and feature pipeline retrained from scratch on all rows.
+
+    Parameters:
+    model_folder (str): Folder with the trained model and feature pipeline.
+    new_data (str): Path to the newly ingested rows.
+    history_data (str): Path to the rows the model was trained on, sampled
+    for the new trees and used by the full retrain.
+    holdout_data (str): Path to the holdout set measuring the RMSE.
+    n_trees (int): Number of trees to add. By default the forest grows in
+    proportion to the new rows, relative to ``history_data``.
+    history_ratio (float): Older rows sampled per new row.
+    max_trees (int): Largest number of trees kept, the oldest being retired.
+    full_retrain (bool): Also retrain from scratch on the history and the new
+    rows, to compare the holdout RMSE and the time taken.
+    random_state (int): Seed of the history sample.
+    dry_run (bool): Only report, do not write to the model folder.
+
+    Returns:
+    dict: The report.
+
+    Raises:
+    TypeError: If the model is not a random forest.
+    """
+    model = pd.read_pickle(os.path.join(model_folder, MODEL_FILE))
+    if not isinstance(model, RandomForestRegressor):
+        raise TypeError(
+            f"Only a RandomForestRegressor can be refreshed, {model_folder} holds "
+            f"a {type(model).__name__}; retrain it with train.py instead"
+        )
+    pipeline = load_pipeline(model_folder)
+
+    new_set = read_housing(new_data)
+    history_set = read_housing(history_data) if history_data else new_set[:0]
+    if n_trees is None:
+        if not len(history_set):
+            raise ValueError("n_trees is required without history_data")
+        n_trees = round(len(model.estimators_) * len(new_set) / len(history_set))
+    n_trees = max(n_trees, 1)
+    sample = np.sort(
+        np.random.default_rng(random_state).choice(
+            len(history_set),
+            min(len(history_set), round(history_ratio * len(new_set))),
+            replace=False,
+        )
+    )
+    X_train = pipeline.transform(new_set)
+    y_train = new_set[LABEL_COLUMN].to_numpy()
+    if len(sample):
+        history_labels = history_set[LABEL_COLUMN].to_numpy()
+        X_history = pipeline.training_transform(history_set, history_labels)
+        X_train = np.concatenate([X_train, X_history[sample]])
+        y_train = np.concatenate([y_train, history_labels[sample]])
+
+    report = {}
+    if holdout_data:
+        holdout_set = read_housing(holdout_data)
+        X_holdout = pipeline.transform(holdout_set)
+        labels = holdout_set[LABEL_COLUMN].to_numpy()
+        report["OLD_RMSE"] = rmse(labels, model.predict(X_holdout))
+
+    old_trees = len(model.estimators_)
+    start = time.perf_counter()
+    model.set_params(warm_start=True, n_estimators=old_trees + n_trees)
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False)
+    retired = 0
+    if max_trees is not None and len(model.estimators_) > max_trees:
+        retired = len(model.estimators_) - max_trees
+        model.estimators_ = model.estimators_[retired:]
+        model.set_params(
+            n_estimators=len(model.estimators_),
+            random_state=_next_random_state(model, old_trees + n_trees),
+        )
+    refresh_seconds = time.perf_counter() - start
+
+    report.update(
+        OLD_TREES=old_trees,
+        ADDED_TREES=n_trees,
+        RETIRED_TREES=retired,
+        TREES=len(model.estimators_),
+        NEW_ROWS=len(new_set),
+        HISTORY_ROWS=len(sample),
+        REFRESH_SECONDS=refresh_seconds,
+    )
+    if holdout_data:
+        report["RMSE"] = rmse(labels, model.predict(X_holdout))
+
+    if full_retrain:
+        all_rows = pd.concat([history_set, new_set], ignore_index=True)
+        all_labels = all_rows[LABEL_COLUMN].to_numpy()
+        retrained_pipeline = clone(pipeline)
+        retrained = clone(model).set_params(n_estimators=len(model.estimators_))
+        start = time.perf_counter()
+        retrained.fit(
+            retrained_pipeline.fit_transform(all_rows, all_labels), all_labels
+        )
+        report["FULL_RETRAIN_SECONDS"] = time.perf_counter() - start
+        if holdout_data:
+            report["FULL_RETRAIN_RMSE"] = rmse(
+                labels, retrained.predict(retrained_pipeline.transform(holdout_set))
+            )
+            report["RMSE_VS_FULL_RETRAIN"] = (
+                report["RMSE"] - report["FULL_RETRAIN_RMSE"]
+            )
+
+    text = "".join(f"{name}: {value}\n" for name, value in report.items())
+    summary = (
+        f"Refreshed forest from {old_trees} to {report['TREES']} trees on "
+        f"{len(y_train)} rows in {refresh_seconds:.2f} s."
+    )
+    if dry_run:
+        logging.info(f"{summary} Dry run, nothing saved:\n{text}")
+    else:
+        save_model(model, model_folder, _previous_compaction(model_folder))
+        report_path = os.path.join(model_folder, "refresh.txt")
+        with open(report_path, "w") as f:
+            f.write(text)
+        logging.info(f"{summary} Report saved to {report_path}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Refresh the trained forest with newly ingested rows."
+    )
+    parser.add_argument(
+        "--model-folder",
+        default=os.path.join("..", "artifacts"),
+        help="Path to the model",
+    )
+    parser.add_argument(
+        "--new-data", required=True, help="Path to the newly ingested rows"
+    )
+    parser.add_argument(
+        "--history-data",
+        default=os.path.join("..", "data/processed/train.csv"),
+        help="Path to the rows the model was trained on",
+    )
+    parser.add_argument(
+        "--holdout-data",
+        default=os.path.join("..", "data/processed/test.csv"),
+        help="Path to the dataset used to measure the RMSE",
+    )
+    parser.add_argument(
+        "--n-trees",
+        type=int,
+        help="Number of trees to add, in proportion to the new rows by default",
+    )
+    parser.add_argument(
+        "--history-ratio",
+        type=float,
+        default=1.0,
+        help="Older rows sampled per new row for the new trees",
+    )
+    parser.add_argument(
+        "--max-trees",
+        type=int,
+        help="Retire the oldest trees beyond this many",
+    )
+    parser.add_argument(
+        "--full-retrain",
+        action="store_true",
+        help="Compare with a full retrain on the history and the new rows",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only log the report, leave the model folder untouched",
+    )
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+
+    args = parser.parse_args(argv)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log and not args.log_path:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    refresh_model(
+        args.model_folder,
+        args.new_data,
+        history_data=args.history_data,
+        holdout_data=args.holdout_data,
+        n_trees=args.n_trees,
+        history_ratio=args.history_ratio,
+        max_trees=args.max_trees,
+        full_retrain=args.full_retrain,
+        dry_run=args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+from .storage import iter_frames, read_frame
+
+NUMERIC_COLUMNS = [
+    "longitude",
+    "latitude",
+    "housing_median_age",
+    "total_rooms",
+    "total_bedrooms",
+    "population",
+    "households",
+    "median_income",
+]
+LABEL_COLUMN = "median_house_value"
+CATEGORY_COLUMN = "ocean_proximity"
+OCEAN_PROXIMITY = ["<1H OCEAN", "INLAND", "ISLAND", "NEAR BAY", "NEAR OCEAN"]
+# Columns of a row to predict, and of a labelled row as in housing.csv.
+INPUT_COLUMNS = NUMERIC_COLUMNS + [CATEGORY_COLUMN]
+HOUSING_COLUMNS = NUMERIC_COLUMNS + [LABEL_COLUMN, CATEGORY_COLUMN]
+NUMERIC_DTYPE = "float32"
+
+
+class SchemaError(ValueError):
+    """
+    Raised when housing data does not match the declared schema.
+    """
+
+
+def housing_dtypes(columns=None):
+    """
+    Returns the dtype each housing column is read as.
+
+    Numeric columns, the label included, are float32: the raw values have at
+    most 7 significant digits and the features are float32 anyway.
+    ``ocean_proximity`` is read as a pandas categorical, one byte per row
+    instead of a Python string.
+
+    Parameters:
+    columns (list): Columns to include, or None for all of them.
+
+    Returns:
+    dict: dtype by column name.
+    """
+    dtypes = {column: NUMERIC_DTYPE for column in NUMERIC_COLUMNS + [LABEL_COLUMN]}
+    dtypes[CATEGORY_COLUMN] = "category"
+    if columns is None:
+        return dtypes
+    return {column: dtypes[column] for column in columns if column in dtypes}
+
+
+def conform(frame, required=INPUT_COLUMNS):
+    """
+    Validates housing rows and casts them to the schema in place.
+
+    Numeric columns must be numbers and become float32, and
+    ``ocean_proximity`` must only hold the known values (or be missing) and
+    becomes a categorical over all of them, so that every frame encodes it
+    the same way. Other columns are left as they are.
+
+    Parameters:
+    frame (pandas.DataFrame): Housing rows.
+    required (list): Columns that must be present.
+
+    Returns:
+    pandas.DataFrame: ``frame``, cast to the schema.
+
+    Raises:
+    SchemaError: If a required column is missing, a numeric column is not
+    numeric or ``ocean_proximity`` has an unknown value.
+    """
+    import pandas as pd
+
+    missing = [column for column in required if column not in frame.columns]
+    if missing:
+        raise SchemaError(f"Missing columns {missing}")
+    for column, dtype in housing_dtypes(frame.columns).items():
+        values = frame[column]
+        if column == CATEGORY_COLUMN:
+            unknown = set(values.dropna().unique()) - set(OCEAN_PROXIMITY)
+            if unknown:
+                raise SchemaError(f"Unknown {CATEGORY_COLUMN} values {sorted(unknown)}")
+            if not (
+                isinstance(values.dtype, pd.CategoricalDtype)
+                and list(values.cat.categories) == OCEAN_PROXIMITY
+            ):
+                frame[column] = pd.Categorical(values, categories=OCEAN_PROXIMITY)
+        elif values.dtype != dtype:
+            if not (pd.api.types.is_numeric_dtype(values) or values.isna().all()):
+                raise SchemaError(f"Column {column} is not numeric")
+            frame[column] = values.astype(dtype)
+    return frame
+
+
+def read_housing(path, columns=HOUSING_COLUMNS, required=None):
+    """
+    Reads housing rows typed and validated by the schema.
+
+    CSV columns are parsed straight into float32 and categorical columns, so
+    no float64 or string copy of the data is ever held.
+
+    Parameters:
+    path (str): CSV, Parquet or Feather file.
+    columns (list): Columns to read, or None for all of them.
+    required (list): Columns that must be present, ``columns`` by default or
+    ``INPUT_COLUMNS`` when reading all of them.
+
+    Returns:
+    pandas.DataFrame: Loaded data.
+    """
+    try:
+        frame = read_frame(path, columns, dtypes=housing_dtypes(columns))
+    except ValueError as e:
+        raise SchemaError(f"{path} does not match the housing schema: {e}") from e
+    return conform(frame, _required(columns, required))
+
+
+def iter_housing(path, chunksize, columns=None, required=None):
+    """
+    Reads housing rows as a stream of chunks typed and validated by the
+    schema, see :func:`read_housing`.
+
+    Yields:
+    pandas.DataFrame: Consecutive chunks of the file, in row order.
+    """
+    required = _required(columns, required)
+    try:
+        for chunk in iter_frames(
+            path, chunksize, columns, dtypes=housing_dtypes(columns)
+        ):
+            yield conform(chunk, required)
+    except SchemaError:
+        raise
+    except ValueError as e:
+        raise SchemaError(f"{path} does not match the housing schema: {e}") from e
+
+
+def _required(columns, required):
+    if required is not None:
+        return required
+    return INPUT_COLUMNS if columns is None else columns
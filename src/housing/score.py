@@ -0,0 +1,327 @@
+import argparse
+import collections
+import logging
+import math
+import os
+
+from . import instrumentation
+from .instrumentation import span
+from .schema import HOUSING_COLUMNS, iter_housing, read_housing
+from .storage import FrameWriter
+
+PREDICTION_COLUMN = "prediction"
+
+_predictor = None
+
+
+def load_data(file_path, columns=HOUSING_COLUMNS):
+    """
+    Loads data from a CSV, Parquet or Feather file into a pandas DataFrame.
+
+    Parquet and Feather files are memory-mapped and only ``columns`` are read.
+    The columns are typed and validated by the housing schema, see
+    :func:`schema.read_housing`.
+
+    Parameters:
+    file_path (str): Path to the data file.
+    columns (list): Columns to read, or None for all of them.
+
+    Returns:
+    pandas.DataFrame: Loaded data.
+    """
+    return read_housing(file_path, columns)
+
+
+class StreamingMetrics:
+    """
+    Regression metrics accumulated one chunk at a time.
+
+    Keeps only running sums, and merges the label variance of each chunk with
+    Chan's parallel update, so memory does not depend on the number of rows.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.squared_error = 0.0
+        self.absolute_error = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, y_true, y_pred):
+        import numpy as np
+
+        y_true = np.asarray(y_true, dtype=np.float64)
+        if len(y_true) == 0:
+            return
+        errors = y_true - y_pred
+        self.squared_error += float(np.dot(errors, errors))
+        self.absolute_error += float(np.abs(errors).sum())
+        n, mean = len(y_true), float(y_true.mean())
+        m2 = float(((y_true - mean) ** 2).sum())
+        total = self.rows + n
+        delta = mean - self._mean
+        self._m2 += m2 + delta**2 * self.rows * n / total
+        self._mean += delta * n / total
+        self.rows = total
+
+    @property
+    def rmse(self):
+        return math.sqrt(self.squared_error / self.rows)
+
+    @property
+    def mae(self):
+        return self.absolute_error / self.rows
+
+    @property
+    def r2(self):
+        # R2 is undefined when the labels do not vary, e.g. for a single row.
+        if self._m2 == 0:
+            return math.nan
+        return 1 - self.squared_error / self._m2
+
+    def as_dict(self):
+        return {"RMSE": self.rmse, "MAE": self.mae, "R2": self.r2}
+
+
+def _init_worker(model_path):
+    from .features import load_predictor
+
+    global _predictor
+    _predictor = load_predictor(model_path)
+
+
+def _predict_chunk(frame):
+    return _predictor(frame)
+
+
+def bulk_score(model_path, input_file, predictions_file, chunksize=100000, n_jobs=None):
+    """
+    Scores a large dataset chunk by chunk in a pool of worker processes.
+
+    Each worker loads the model and feature pipeline once. Chunks are read
+    lazily and at most two per worker are in flight, so memory stays flat
+    regardless of the input size. Predictions are appended to
+    ``predictions_file`` in the original row order.
+
+    Parameters:
+    model_path (str): Path to the folder with the trained model and its
+    feature pipeline.
+    input_file (str): CSV, Parquet or Feather file to score.
+    predictions_file (str): CSV, Parquet or Feather file receiving one
+    ``prediction`` per input row.
+    chunksize (int): Number of rows per chunk.
+    n_jobs (int): Number of worker processes, None for all cores. With 1,
+    chunks are scored in the calling process.
+
+    Returns:
+    StreamingMetrics: Metrics over all rows, or None if the input has no
+    ``median_house_value`` column.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    import numpy as np
+    import pandas as pd
+
+    from .features import LABEL_COLUMN
+
+    n_workers = n_jobs or os.cpu_count()
+    metrics = StreamingMetrics()
+    pending = collections.deque()
+
+    def drain(writer, limit):
+        while len(pending) > limit:
+            predictions, labels = pending.popleft()
+            if not isinstance(predictions, np.ndarray):
+                predictions = predictions.result()
+            if labels is not None:
+                metrics.update(labels, predictions)
+            writer.write(pd.DataFrame({PREDICTION_COLUMN: predictions}))
+
+    if n_workers == 1:
+        _init_worker(model_path)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            n_workers, initializer=_init_worker, initargs=(model_path,)
+        )
+    try:
+        with FrameWriter(predictions_file) as writer:
+            for chunk in iter_housing(input_file, chunksize):
+                labels = (
+                    chunk[LABEL_COLUMN].to_numpy() if LABEL_COLUMN in chunk else None
+                )
+                if executor is None:
+                    pending.append((_predict_chunk(chunk), labels))
+                else:
+                    pending.append((executor.submit(_predict_chunk, chunk), labels))
+                drain(writer, 2 * n_workers)
+            drain(writer, 0)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    logging.info(f"Scored {metrics.rows or writer.rows} rows into {predictions_file}")
+    return metrics if metrics.rows else None
+
+
+def score_model(
+    model_path,
+    test_data,
+    output_folder,
+    args=None,
+    chunksize=None,
+    n_jobs=None,
+    predictions_file=None,
+    run=None,
+):
+    """
+    Scores a machine learning model on test data and saves the results.
+
+    The test data is transformed with the feature pipeline fitted during
+    training; nothing is refitted on the test set. With ``chunksize``, the
+    data is scored out of core by :func:`bulk_score` and the predictions are
+    saved as well.
+
+    Parameters:
+    model_path (str): Path to the folder with the trained model and its
+    feature pipeline.
+    test_data (str): Path to the test dataset.
+    output_folder (str): Path to save the scores.
+    args (argparse.Namespace): Command line arguments logged to the run, if any.
+    chunksize (int): Score in chunks of this many rows.
+    n_jobs (int): Number of worker processes for chunked scoring.
+    predictions_file (str): Where chunked scoring writes the predictions,
+    ``predictions.csv`` in ``output_folder`` by default.
+    run (tracking.TrackedRun): Parent of the "Model Scoring" run, if any.
+    """
+    from sklearn.metrics import mean_squared_error
+
+    from .features import LABEL_COLUMN, load_pipeline
+    from .model_store import load_model
+    from .tracking import get_tracker
+
+    os.makedirs(output_folder, exist_ok=True)
+    with span("score") as stage:
+        if chunksize:
+            predictions_file = predictions_file or os.path.join(
+                output_folder, "predictions.csv"
+            )
+            with span("bulk_score") as bulk:
+                streamed = bulk_score(
+                    model_path, test_data, predictions_file, chunksize, n_jobs
+                )
+                bulk.rows = stage.rows = streamed.rows if streamed else None
+            metrics = streamed.as_dict() if streamed else {}
+        else:
+            with span("load") as load:
+                test_set = load_data(test_data)
+                load.rows = stage.rows = len(test_set)
+            test_set_labels = test_set[LABEL_COLUMN].copy()
+            test_set = test_set.drop(LABEL_COLUMN, axis=1)
+
+            with span("load_model"):
+                pipeline = load_pipeline(model_path)
+                model = load_model(model_path)
+
+            with span("features", rows=stage.rows):
+                test_set_prepared = pipeline.transform(test_set)
+
+            with span("predict", rows=stage.rows):
+                predictions = model.predict(test_set_prepared)
+            mse = mean_squared_error(test_set_labels, predictions)
+            metrics = {"RMSE": math.sqrt(mse)}
+
+        scores_path = os.path.join(output_folder, "scores.txt")
+        with open(scores_path, "w") as f:
+            for name, value in metrics.items():
+                f.write(f"{name}: {value}\n")
+
+    logging.info(f"Model scoring completed. Scores saved to {scores_path}")
+
+    tracker = run.tracker if run is not None else get_tracker()
+    with tracker.start_run("Model Scoring", parent=run) as scoring_run:
+        if args is not None:
+            scoring_run.log_params(vars(args))
+        scoring_run.log_metrics(metrics)
+        scoring_run.log_metrics(stage.metrics())
+        scoring_run.log_artifact(scores_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score the model.")
+    parser.add_argument(
+        "--model-folder",
+        default=os.path.join("..", "artifacts"),
+        help="Path to the model",
+    )
+    parser.add_argument(
+        "--dataset-folder",
+        default=os.path.join("..", "data/processed/test.csv"),
+        help="Path to the dataset",
+    )
+    parser.add_argument(
+        "--output-folder",
+        default=os.path.join("..", "scores"),
+        help="Path to save the scores",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="Score out of core in chunks of this many rows and save predictions",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        help="Number of worker processes for chunked scoring",
+    )
+    parser.add_argument(
+        "--predictions-file",
+        help="Where chunked scoring writes the predictions",
+    )
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+    parser.add_argument(
+        "--profile-dir", help="Save a cProfile dump of each stage in this folder"
+    )
+    parser.add_argument(
+        "--span-log", help="Append stage timings to this JSON Lines file"
+    )
+
+    args = parser.parse_args(argv)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    instrumentation.configure(args.profile_dir, args.span_log)
+
+    logging.info("Starting model scoring process")
+    from .tracking import close_tracker
+
+    try:
+        score_model(
+            args.model_folder,
+            args.dataset_folder,
+            args.output_folder,
+            args,
+            chunksize=args.chunksize,
+            n_jobs=args.n_jobs,
+            predictions_file=args.predictions_file,
+        )
+    finally:
+        close_tracker()
+    logging.info("Model scoring completed successfully")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1020 @@
+import contextlib
+import json
+import logging
+import math
+import numbers
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import sklearn
+from joblib import Parallel, delayed, effective_n_jobs
+from joblib import hash as joblib_hash
+from sklearn.base import clone
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+
+
+class SearchResult:
+    """
+    Outcome of a hyperparameter search.
+
+    Mirrors the attributes of scikit-learn's ``GridSearchCV`` that the training
+    code relies on.
+
+    Attributes:
+    best_params_ (dict): Parameters of the best candidate.
+    best_score_ (float): Mean cross-validated negative MSE of the best candidate.
+    best_estimator_ (estimator): Best candidate refitted on the full data.
+    cv_results_ (dict): Per evaluation ``params``, ``mean_test_score``,
+    ``std_test_score``, ``n_resources`` and ``iter`` lists.
+    """
+
+    def __init__(self, best_params, best_score, best_estimator, cv_results):
+        self.best_params_ = best_params
+        self.best_score_ = best_score
+        self.best_estimator_ = best_estimator
+        self.cv_results_ = cv_results
+
+
+def _take(data, index):
+    return data.iloc[index] if hasattr(data, "iloc") else data[index]
+
+
+def _split(X, y, fold):
+    """
+    Returns the training features and labels and the held-out features and
+    labels of a fold. A fold with a third array carries the values of the
+    last columns of ``X`` for a model fitted on its training rows, see the
+    ``fold_features`` of the searches.
+    """
+    train_index, test_index = fold[0], fold[1]
+    X_train, X_test = _take(X, train_index), _take(X, test_index)
+    if len(fold) == 3:
+        columns = fold[2]
+        X_train[:, -columns.shape[1] :] = columns[train_index]
+        X_test[:, -columns.shape[1] :] = columns[test_index]
+    return X_train, _take(y, train_index), X_test, np.asarray(_take(y, test_index))
+
+
+class _SharedArrays:
+    """
+    Read-only memory-mapped copies of the arrays used by the search workers.
+
+    Each array is written once to a temporary ``.npy`` file and reopened with
+    ``mmap_mode="r"``. joblib pickles memory-mapped arrays as a reference to
+    their file, so worker processes map the same pages instead of receiving
+    a copy of the data with every task. Nothing is written when the search
+    runs in a single process, or for data that is not a NumPy array.
+
+    Parameters:
+    n_jobs (int): Number of parallel workers of the search.
+    """
+
+    def __init__(self, n_jobs):
+        self.folder = None
+        if effective_n_jobs(n_jobs) > 1:
+            self.folder = tempfile.mkdtemp(prefix="housing_search_")
+        self._count = 0
+
+    def share(self, array):
+        if self.folder is None or not isinstance(array, np.ndarray):
+            return array
+        path = os.path.join(self.folder, f"{self._count}.npy")
+        self._count += 1
+        np.save(path, array)
+        return np.load(path, mmap_mode="r")
+
+    def share_folds(self, folds, fold_features=None):
+        """
+        Returns the (train, test) row indices of each fold as int32 arrays,
+        shared with the workers, followed by the columns computed for the fold
+        by ``fold_features``, if any.
+        """
+        shared = []
+        for train, test in folds:
+            fold = (
+                self.share(train.astype(np.int32)),
+                self.share(test.astype(np.int32)),
+            )
+            if fold_features is not None:
+                fold += (self.share(np.asarray(fold_features(train, test))),)
+            shared.append(fold)
+        return shared
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.folder is not None:
+            shutil.rmtree(self.folder, ignore_errors=True)
+
+
+class SearchCheckpoint:
+    """
+    Scores of completed (candidate, fold) fits, kept on disk.
+
+    Each score is appended to ``<folder>/<data key>.jsonl`` as soon as its fit
+    finishes. The data key hashes the features, the labels and the
+    scikit-learn version, and each entry is keyed by a hash of the estimator
+    parameters, the candidate and the fold indices. A search restarted on the
+    same data therefore only fits what is missing, while a change of data or
+    grid never reuses stale scores. A line cut short by a crash is ignored.
+
+    Parameters:
+    folder (str): Checkpoint directory.
+    X (pandas.DataFrame or numpy.ndarray): Training features.
+    y (pandas.Series or numpy.ndarray): Training labels.
+    """
+
+    def __init__(self, folder, X, y):
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(
+            folder,
+            f"{joblib_hash((X, y, sklearn.__version__), coerce_mmap=True)}.jsonl",
+        )
+        self.scores = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.scores[entry["key"]] = entry["score"]
+            logging.info(f"Resuming search with {len(self.scores)} checkpointed fits")
+        self._file = open(self.path, "a+")
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    @staticmethod
+    def key(estimator, params, sizes, fold):
+        return joblib_hash((estimator.get_params(), params, sizes, fold))
+
+    def put(self, key, score):
+        self.scores[key] = score
+        self._file.write(json.dumps({"key": key, "score": score}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _indexed(index, function, *args):
+    # Tags a result with its task, as unordered results come back in the
+    # order the fits finish.
+    return index, function(*args)
+
+
+def _timed_fit_and_score(*args):
+    start = time.process_time()
+    score = _fit_and_score(*args)
+    return score, time.process_time() - start
+
+
+def _fit_and_score(estimator, params, X, y, fold, sizes=None):
+    """
+    Fits one candidate on a fold and returns its negative MSE on the held-out
+    rows. With ``sizes``, a single forest is grown with ``warm_start`` through
+    each ``n_estimators`` in ``sizes`` and one score per size is returned.
+    """
+    model = clone(estimator).set_params(**params)
+    X_train, y_train, X_test, y_test = _split(X, y, fold)
+    if sizes is None:
+        model.fit(X_train, y_train)
+        return -np.mean((y_test - model.predict(X_test)) ** 2)
+    model.set_params(warm_start=True)
+    scores = []
+    for n_estimators in sizes:
+        model.set_params(n_estimators=n_estimators).fit(X_train, y_train)
+        scores.append(-np.mean((y_test - model.predict(X_test)) ** 2))
+    return scores
+
+
+def _group_by_size(estimator, candidates, warm_start):
+    """
+    Groups candidates that differ only in ``n_estimators``.
+
+    Returns a list of ``(params, indices, sizes)`` tuples, where ``params`` are
+    the shared parameters, ``indices`` the positions of the grouped candidates
+    and ``sizes`` their ``n_estimators`` in increasing order, or None if the
+    group is fitted without warm start.
+    """
+    estimator_params = estimator.get_params()
+    if not (
+        warm_start
+        and "warm_start" in estimator_params
+        and "n_estimators" in estimator_params
+    ):
+        return [(params, [i], None) for i, params in enumerate(candidates)]
+    groups = {}
+    for i, params in enumerate(candidates):
+        shared = {k: v for k, v in params.items() if k != "n_estimators"}
+        size = params.get("n_estimators", estimator_params["n_estimators"])
+        key = tuple(sorted((k, repr(v)) for k, v in shared.items()))
+        groups.setdefault(key, (shared, []))[1].append((size, i))
+    return [
+        (shared, [i for _, i in sorted(members)], [n for n, _ in sorted(members)])
+        for shared, members in groups.values()
+    ]
+
+
+class _Evaluator:
+    """
+    Runs (candidate, fold) fits in parallel batches until the budget is spent.
+
+    ``time_budget`` is wall-clock time from the start of the search and
+    ``cpu_budget`` the CPU time spent in the fits, summed over the workers.
+    """
+
+    def __init__(
+        self,
+        parallel,
+        estimator,
+        time_budget=None,
+        cpu_budget=None,
+        warm_start=True,
+        checkpoint=None,
+    ):
+        self.parallel = parallel
+        self.estimator = estimator
+        self.deadline = time.monotonic() + time_budget if time_budget else None
+        self.cpu_budget = cpu_budget
+        self.cpu_seconds = 0.0
+        self.warm_start = warm_start
+        self.checkpoint = checkpoint
+        self.results = {
+            "params": [],
+            "mean_test_score": [],
+            "std_test_score": [],
+            "n_resources": [],
+            "n_folds": [],
+            "iter": [],
+        }
+
+    def expired(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return self.cpu_budget is not None and self.cpu_seconds >= self.cpu_budget
+
+    def fit(self, tasks, X, y, folds):
+        """
+        Returns the scores of ``(params, sizes, fold)`` tasks, fitting in
+        parallel only those that are not checkpointed yet.
+        """
+        scores = [None] * len(tasks)
+        keys = [None] * len(tasks)
+        if self.checkpoint is not None:
+            # Folds are memory-mapped only when shared with workers, which
+            # must not change their key when resuming with another n_jobs.
+            fold_keys = {
+                fold: joblib_hash(folds[fold], coerce_mmap=True) for _, _, fold in tasks
+            }
+            for i, (params, sizes, fold) in enumerate(tasks):
+                keys[i] = self.checkpoint.key(
+                    self.estimator, params, sizes, fold_keys[fold]
+                )
+                scores[i] = self.checkpoint.scores.get(keys[i])
+        pending = [i for i, score in enumerate(scores) if score is None]
+        results = self.parallel(
+            delayed(_indexed)(
+                i,
+                _timed_fit_and_score,
+                self.estimator,
+                tasks[i][0],
+                X,
+                y,
+                folds[tasks[i][2]],
+                tasks[i][1],
+            )
+            for i in pending
+        )
+        # Results arrive as the fits finish, so each one is checkpointed and
+        # counted against the CPU budget without waiting for slower fits.
+        for i, (score, cpu_seconds) in results:
+            scores[i] = score
+            self.cpu_seconds += cpu_seconds
+            if self.checkpoint is not None:
+                self.checkpoint.put(keys[i], score)
+        return scores
+
+    def record(self, params, fold_scores, n_resources, iteration):
+        fold_scores = fold_scores[~np.isnan(fold_scores)]
+        self.results["params"].append(params)
+        self.results["mean_test_score"].append(fold_scores.mean())
+        self.results["std_test_score"].append(fold_scores.std())
+        self.results["n_resources"].append(n_resources)
+        self.results["n_folds"].append(len(fold_scores))
+        self.results["iter"].append(iteration)
+
+    def evaluate(self, candidates, X, y, folds, iteration=0, n_resources=None):
+        """
+        Returns the mean fold score of each candidate, NaN for candidates that
+        were not evaluated before the budget ran out.
+
+        Candidates differing only in ``n_estimators`` are evaluated together
+        by growing a single warm-started forest per fold.
+        """
+        groups = _group_by_size(self.estimator, candidates, self.warm_start)
+        n_workers = effective_n_jobs(self.parallel.n_jobs)
+        batch_size = max(1, math.ceil(n_workers / len(folds)))
+        fold_scores = np.full((len(candidates), len(folds)), np.nan)
+        for start in range(0, len(groups), batch_size):
+            if self.expired() and start > 0:
+                logging.warning(
+                    f"Search budget exhausted after {start} of "
+                    f"{len(groups)} candidate groups"
+                )
+                break
+            batch = groups[start : start + batch_size]
+            scores = iter(
+                self.fit(
+                    [
+                        (params, sizes, fold)
+                        for params, _, sizes in batch
+                        for fold in range(len(folds))
+                    ],
+                    X,
+                    y,
+                    folds,
+                )
+            )
+            for _, indices, _ in batch:
+                for fold in range(len(folds)):
+                    fold_scores[indices, fold] = next(scores)
+
+        means = fold_scores.mean(axis=1)
+        for i in np.flatnonzero(~np.isnan(means)):
+            self.record(candidates[i], fold_scores[i], n_resources or len(y), iteration)
+        return means
+
+
+@contextlib.contextmanager
+def _evaluation(
+    estimator, X, y, n_jobs, time_budget, cpu_budget, warm_start, checkpoint_dir
+):
+    """
+    Yields an :class:`_Evaluator` and the :class:`_SharedArrays` of a search.
+    """
+    with contextlib.ExitStack() as stack:
+        checkpoint = None
+        if checkpoint_dir is not None:
+            checkpoint = stack.enter_context(SearchCheckpoint(checkpoint_dir, X, y))
+        parallel = stack.enter_context(
+            Parallel(n_jobs, return_as="generator_unordered")
+        )
+        shared = stack.enter_context(_SharedArrays(n_jobs))
+        yield _Evaluator(
+            parallel, estimator, time_budget, cpu_budget, warm_start, checkpoint
+        ), shared
+
+
+def _refit(estimator, params, X, y):
+    model = clone(estimator).set_params(**params)
+    return model.fit(X, y)
+
+
+def _search_candidates(
+    estimator,
+    candidates,
+    X,
+    y,
+    cv,
+    n_jobs,
+    time_budget,
+    cpu_budget,
+    warm_start,
+    checkpoint_dir,
+    fold_features,
+):
+    with _evaluation(
+        estimator, X, y, n_jobs, time_budget, cpu_budget, warm_start, checkpoint_dir
+    ) as (evaluator, shared):
+        folds = shared.share_folds(KFold(cv).split(X), fold_features)
+        means = evaluator.evaluate(
+            candidates, shared.share(X), shared.share(np.asarray(y)), folds
+        )
+
+    best = int(np.nanargmax(means))
+    logging.info(f"Best parameters {candidates[best]} with score {means[best]}")
+    return SearchResult(
+        candidates[best],
+        means[best],
+        _refit(estimator, candidates[best], X, y),
+        evaluator.results,
+    )
+
+
+def grid_search(
+    estimator,
+    param_grid,
+    X,
+    y,
+    cv=5,
+    n_jobs=None,
+    time_budget=None,
+    cpu_budget=None,
+    warm_start=True,
+    checkpoint_dir=None,
+    fold_features=None,
+):
+    """
+    Exhaustive cross-validated search over ``param_grid``.
+
+    Equivalent to ``GridSearchCV(..., scoring="neg_mean_squared_error")`` with
+    unshuffled K-fold splits, but (candidate, fold) fits are dispatched to
+    ``n_jobs`` workers and the search stops starting new candidates once
+    ``time_budget`` seconds have elapsed or the fits have used ``cpu_budget``
+    CPU seconds. Candidates that differ only in ``n_estimators`` share one
+    warm-started forest per fold, which gives the same scores as fitting each
+    size separately. The fold indices are computed once and, with several
+    workers, the data and folds are shared through read-only memory-mapped
+    files rather than copied to every task.
+
+    Parameters:
+    estimator (estimator): Unfitted scikit-learn regressor.
+    param_grid (dict or list): Grid in ``ParameterGrid`` format.
+    X (pandas.DataFrame or numpy.ndarray): Training features.
+    y (pandas.Series or numpy.ndarray): Training labels.
+    cv (int): Number of folds.
+    n_jobs (int): Number of parallel workers, -1 for all cores.
+    time_budget (float): Wall-clock budget in seconds, or None.
+    cpu_budget (float): Budget of CPU seconds spent fitting, or None.
+    warm_start (bool): Grow forests incrementally across ``n_estimators``.
+    checkpoint_dir (str): Directory of a :class:`SearchCheckpoint`, so that a
+    killed search resumes where it stopped, or None.
+    fold_features (callable): Called with the train and test row indices of
+    each fold, returns the values that the last columns of ``X`` take for a
+    model fitted on the train rows only, as an array with one row per row
+    of ``X``. Features built from the labels, such as a neighbour target
+    mean, are thus recomputed inside each fold instead of leaking the
+    held-out labels into the training rows. None when ``X`` does not depend
+    on the labels. ``X`` must then be a NumPy array.
+
+    Returns:
+    SearchResult: Best parameters, score and refitted estimator.
+    """
+    return _search_candidates(
+        estimator,
+        list(ParameterGrid(param_grid)),
+        X,
+        y,
+        cv,
+        n_jobs,
+        time_budget,
+        cpu_budget,
+        warm_start,
+        checkpoint_dir,
+        fold_features,
+    )
+
+
+def _to_python(params):
+    return {
+        name: value.item() if isinstance(value, np.generic) else value
+        for name, value in params.items()
+    }
+
+
+def random_search(
+    estimator,
+    param_distributions,
+    X,
+    y,
+    cv=5,
+    n_iter=10,
+    n_jobs=None,
+    time_budget=None,
+    cpu_budget=None,
+    random_state=42,
+    warm_start=True,
+    checkpoint_dir=None,
+    fold_features=None,
+):
+    """
+    Cross-validated search over ``n_iter`` random candidates.
+
+    Candidates are drawn like ``RandomizedSearchCV`` draws them and evaluated
+    like :func:`grid_search`, so sampled candidates that share everything but
+    ``n_estimators`` are grown as one warm-started forest.
+
+    Parameters:
+    estimator (estimator): Unfitted scikit-learn regressor.
+    param_distributions (dict): Lists or scipy distributions of the params.
+    X (pandas.DataFrame or numpy.ndarray): Training features.
+    y (pandas.Series or numpy.ndarray): Training labels.
+    cv (int): Number of folds.
+    n_iter (int): Number of candidates.
+    n_jobs (int): Number of parallel workers, -1 for all cores.
+    time_budget (float): Wall-clock budget in seconds, or None.
+    cpu_budget (float): Budget of CPU seconds spent fitting, or None.
+    random_state (int): Seed of the sampling.
+    warm_start (bool): Grow forests incrementally across ``n_estimators``.
+    checkpoint_dir (str): Directory of a :class:`SearchCheckpoint`, or None.
+    fold_features (callable): Per-fold columns of ``X``, see
+    :func:`grid_search`.
+
+    Returns:
+    SearchResult: Best parameters, score and refitted estimator.
+    """
+    candidates = [
+        _to_python(params)
+        for params in ParameterSampler(
+            param_distributions, n_iter, random_state=random_state
+        )
+    ]
+    return _search_candidates(
+        estimator,
+        candidates,
+        X,
+        y,
+        cv,
+        n_jobs,
+        time_budget,
+        cpu_budget,
+        warm_start,
+        checkpoint_dir,
+        fold_features,
+    )
+
+
+def _perturb(params, param_distributions, rng, scale=0.2):
+    """
+    Returns a neighbour of ``params``. Values from a list move to an adjacent
+    entry, values from a distribution take a Gaussian step of ``scale`` times
+    the width of its support, clipped to the support.
+    """
+    neighbour = {}
+    for name, values in param_distributions.items():
+        value = params[name]
+        if hasattr(values, "support"):
+            low, high = values.support()
+            width = high - low if np.isfinite(high - low) else abs(value) or 1.0
+            moved = min(max(value + rng.normal(0.0, scale * width), low), high)
+            if isinstance(value, numbers.Integral):
+                moved = int(round(moved))
+            neighbour[name] = moved
+        else:
+            values = list(values)
+            i = values.index(value) + int(rng.integers(-1, 2))
+            neighbour[name] = values[min(max(i, 0), len(values) - 1)]
+    return neighbour
+
+
+def _propose(param_distributions, completed, seen, size, rng, explore):
+    """
+    Draws up to ``size`` unseen candidates. Each is a neighbour of one of the
+    best quarter of the ``completed`` candidates, or with probability
+    ``explore`` (and while nothing is completed) a random draw.
+    """
+    ranked = sorted(completed, key=lambda c: -c[0])
+    good = [params for _, params in ranked[: max(1, len(ranked) // 4)]]
+    batch = []
+    for _ in range(100 * size):
+        if len(batch) == size:
+            break
+        if not good or rng.random() < explore:
+            (params,) = ParameterSampler(
+                param_distributions, 1, random_state=int(rng.integers(2**31))
+            )
+            params = _to_python(params)
+        else:
+            params = _perturb(
+                good[int(rng.integers(len(good)))], param_distributions, rng
+            )
+        key = repr(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            batch.append(params)
+    return batch
+
+
+def _is_beaten(scores, reference, z):
+    """
+    True if the paired fold differences put ``scores`` below ``reference``
+    with ``z`` standard errors to spare.
+    """
+    differences = scores - reference
+    if len(differences) < 2:
+        return False
+    standard_error = differences.std(ddof=1) / math.sqrt(len(differences))
+    return differences.mean() + z * standard_error < 0
+
+
+def adaptive_search(
+    estimator,
+    param_distributions,
+    X,
+    y,
+    cv=5,
+    n_iter=30,
+    n_initial=None,
+    explore=0.25,
+    z=2.0,
+    n_jobs=None,
+    time_budget=None,
+    cpu_budget=None,
+    random_state=42,
+    checkpoint_dir=None,
+    fold_features=None,
+):
+    """
+    Randomized search that samples around the best candidates so far and
+    drops candidates that cannot win.
+
+    A first batch of random candidates is evaluated, then each further batch
+    perturbs the best quarter of the completed candidates, with a share
+    ``explore`` of fresh random draws. Candidates of a batch are raced fold
+    by fold: after each fold, a candidate whose paired fold differences to
+    the leader (the best completed candidate or the best of the batch so far)
+    are negative by ``z`` standard errors is not fitted on the remaining
+    folds. The search stops after ``n_iter`` candidates or when the wall-clock
+    or CPU budget runs out, and only candidates scored on every fold can be
+    returned.
+
+    Parameters:
+    estimator (estimator): Unfitted scikit-learn regressor.
+    param_distributions (dict): Lists or scipy distributions of the params.
+    X (pandas.DataFrame or numpy.ndarray): Training features.
+    y (pandas.Series or numpy.ndarray): Training labels.
+    cv (int): Number of folds.
+    n_iter (int): Maximum number of candidates.
+    n_initial (int): Size of the random first batch, by default the larger of
+    5 and the number of workers.
+    explore (float): Share of random draws after the first batch.
+    z (float): Standard errors by which a candidate must trail to be dropped.
+    n_jobs (int): Number of parallel workers, -1 for all cores.
+    time_budget (float): Wall-clock budget in seconds, or None.
+    cpu_budget (float): Budget of CPU seconds spent fitting, or None.
+    random_state (int): Seed of the sampling.
+    checkpoint_dir (str): Directory of a :class:`SearchCheckpoint`, or None.
+    fold_features (callable): Per-fold columns of ``X``, see
+    :func:`grid_search`.
+
+    Returns:
+    SearchResult: Best parameters, score and refitted estimator.
+    """
+    rng = np.random.default_rng(random_state)
+    n_workers = effective_n_jobs(n_jobs)
+    completed, seen, best = [], set(), None
+    with _evaluation(
+        estimator, X, y, n_jobs, time_budget, cpu_budget, False, checkpoint_dir
+    ) as (evaluator, shared):
+        folds = shared.share_folds(KFold(cv).split(X), fold_features)
+        X_shared, y_shared = shared.share(X), shared.share(np.asarray(y))
+        n_started, iteration = 0, 0
+        while n_started < n_iter:
+            if completed and evaluator.expired():
+                logging.warning(f"Search budget exhausted after {n_started} candidates")
+                break
+            size = (n_initial or max(5, n_workers)) if iteration == 0 else n_workers
+            batch = _propose(
+                param_distributions,
+                completed,
+                seen,
+                min(size, n_iter - n_started),
+                rng,
+                explore,
+            )
+            if not batch:
+                break
+            n_started += len(batch)
+            fold_scores = np.full((len(batch), cv), np.nan)
+            active = list(range(len(batch)))
+            for fold in range(cv):
+                if fold > 0 and completed and evaluator.expired():
+                    break
+                tasks = [(batch[i], None, fold) for i in active]
+                fold_scores[active, fold] = evaluator.fit(
+                    tasks, X_shared, y_shared, folds
+                )
+                contenders = [fold_scores[i, : fold + 1] for i in active]
+                if best is not None:
+                    contenders.append(best[: fold + 1])
+                leader = max(contenders, key=np.mean)
+                active = [
+                    i
+                    for i in active
+                    if not _is_beaten(fold_scores[i, : fold + 1], leader, z)
+                ]
+            for params, scores in zip(batch, fold_scores):
+                if np.isnan(scores[0]):
+                    continue
+                evaluator.record(params, scores, len(y), iteration)
+                if not np.isnan(scores).any():
+                    completed.append((scores.mean(), params))
+                    if best is None or scores.mean() > best.mean():
+                        best = scores
+            logging.info(
+                f"Adaptive round {iteration}: {len(batch)} candidates, "
+                f"{sum(not np.isnan(s).any() for s in fold_scores)} scored on "
+                f"every fold"
+            )
+            iteration += 1
+
+    best_score, best_params = max(completed, key=lambda c: c[0])
+    logging.info(f"Best parameters {best_params} with score {best_score}")
+    return SearchResult(
+        best_params,
+        best_score,
+        _refit(estimator, best_params, X, y),
+        evaluator.results,
+    )
+
+
+def halving_search(
+    estimator,
+    param_grid,
+    X,
+    y,
+    cv=5,
+    factor=3,
+    min_resources=None,
+    n_jobs=None,
+    time_budget=None,
+    cpu_budget=None,
+    random_state=42,
+    warm_start=True,
+    checkpoint_dir=None,
+    fold_features=None,
+):
+    """
+    Successive-halving search over ``param_grid``.
+
+    All candidates are first cross-validated on a small random subsample of
+    the rows. Only the best ``1 / factor`` of them are promoted to the next
+    round, which uses ``factor`` times as many rows, until the last round is
+    run on the full data. If the wall-clock or CPU budget runs out, the best
+    candidate of the most advanced round is returned. Rounds select their
+    rows through the fold indices, so the data is shared with the workers
+    once.
+
+    Parameters:
+    estimator (estimator): Unfitted scikit-learn regressor.
+    param_grid (dict or list): Grid in ``ParameterGrid`` format.
+    X (pandas.DataFrame or numpy.ndarray): Training features.
+    y (pandas.Series or numpy.ndarray): Training labels.
+    cv (int): Number of folds.
+    factor (int): Reduction factor of candidates between rounds.
+    min_resources (int): Rows used in the first round. By default chosen so
+    that the last round uses all rows.
+    n_jobs (int): Number of parallel workers, -1 for all cores.
+    time_budget (float): Wall-clock budget in seconds, or None.
+    cpu_budget (float): Budget of CPU seconds spent fitting, or None.
+    random_state (int): Seed of the row subsampling.
+    warm_start (bool): Grow forests incrementally across ``n_estimators``.
+    checkpoint_dir (str): Directory of a :class:`SearchCheckpoint`, so that a
+    killed search resumes where it stopped, or None.
+    fold_features (callable): Per-fold columns of ``X``, see
+    :func:`grid_search`.
+
+    Returns:
+    SearchResult: Best parameters, score and refitted estimator.
+    """
+    candidates = list(ParameterGrid(param_grid))
+    n_samples = len(y)
+    n_rounds = 1 + int(math.floor(math.log(len(candidates), factor)))
+    if min_resources is None:
+        min_resources = max(n_samples // factor ** (n_rounds - 1), 2 * cv)
+    order = np.random.default_rng(random_state).permutation(n_samples)
+
+    with _evaluation(
+        estimator, X, y, n_jobs, time_budget, cpu_budget, warm_start, checkpoint_dir
+    ) as (evaluator, shared):
+        X_shared, y_shared = shared.share(X), shared.share(np.asarray(y))
+        for iteration in range(n_rounds):
+            n_resources = min(min_resources * factor**iteration, n_samples)
+            if iteration == n_rounds - 1:
+                n_resources = n_samples
+            rows = np.sort(order[:n_resources])
+            # The folds of a round index the full data, so the subsample is
+            # never copied.
+            folds = shared.share_folds(
+                ((rows[train], rows[test]) for train, test in KFold(cv).split(rows)),
+                fold_features,
+            )
+            logging.info(
+                f"Halving round {iteration}: {len(candidates)} candidates "
+                f"on {n_resources} rows"
+            )
+            means = evaluator.evaluate(
+                candidates, X_shared, y_shared, folds, iteration, n_resources
+            )
+            ranked = [
+                i for i in np.argsort(-means, kind="stable") if not np.isnan(means[i])
+            ]
+            best_params, best_score = candidates[ranked[0]], means[ranked[0]]
+            if evaluator.expired() or len(candidates) == 1:
+                break
+            candidates = [
+                candidates[i] for i in ranked[: math.ceil(len(candidates) / factor)]
+            ]
+
+    logging.info(f"Best parameters {best_params} with score {best_score}")
+    return SearchResult(
+        best_params,
+        best_score,
+        _refit(estimator, best_params, X, y),
+        evaluator.results,
+    )
+
+
+class BakeOffResult(SearchResult):
+    """
+    Outcome of :func:`bake_off`.
+
+    Attributes:
+    best_model_ (str): Name of the winning model family.
+    leaderboard_ (list): One dict per evaluated candidate, best first, with
+    its ``model``, ``params``, ``rmse``, ``n_folds``, mean ``fit_seconds``
+    per fold, ``predict_us_per_row`` and ``status``: ``complete``, ``cut``
+    when it could not beat the leader, or ``budget`` when the budget ran out
+    first.
+    """
+
+    def __init__(
+        self,
+        best_model,
+        best_params,
+        best_score,
+        best_estimator,
+        cv_results,
+        leaderboard,
+    ):
+        super().__init__(best_params, best_score, best_estimator, cv_results)
+        self.best_model_ = best_model
+        self.leaderboard_ = leaderboard
+
+
+def _timed_fit_and_predict(estimator, params, X, y, fold):
+    """
+    Fits one candidate on a fold and returns its negative MSE, the fit wall
+    time, the predict wall time per held-out row and the CPU time used.
+    """
+    start_cpu = time.process_time()
+    model = clone(estimator).set_params(**params)
+    X_train, y_train, X_test, y_test = _split(X, y, fold)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    predictions = model.predict(X_test)
+    predict_seconds = (time.perf_counter() - start) / len(y_test)
+    score = -np.mean((y_test - predictions) ** 2)
+    return score, fit_seconds, predict_seconds, time.process_time() - start_cpu
+
+
+def bake_off(
+    families,
+    X,
+    y,
+    cv=5,
+    z=2.0,
+    n_jobs=None,
+    time_budget=None,
+    cpu_budget=None,
+    fold_features=None,
+):
+    """
+    Cross-validates several model families against each other and ranks them
+    on accuracy and cost.
+
+    The fits of every candidate of every family on every fold are queued
+    into one pool of ``n_jobs`` workers that map the same shared copy of the
+    data and folds. The queue runs fold by fold, and within a fold in the
+    given order of the families, cheapest first, and is handed to the
+    workers as they free up. The cheap baselines therefore set the bar early
+    while the expensive candidates are still fitting. After each fit, the
+    candidate is compared with the leader, the best candidate scored on the
+    same folds. If its paired fold differences are negative by ``z``
+    standard errors, its remaining folds are dropped from the queue, like in
+    :func:`adaptive_search`. No new fit is started once the wall-clock or CPU
+    budget is spent and some candidate is complete.
+
+    Parameters:
+    families (list): ``(name, estimator, candidates)`` tuples, where
+    ``candidates`` is a list of parameter dicts of the unfitted estimator.
+    X (pandas.DataFrame or numpy.ndarray): Training features.
+    y (pandas.Series or numpy.ndarray): Training labels.
+    cv (int): Number of folds.
+    z (float): Standard errors by which a candidate must trail to be cut.
+    n_jobs (int): Number of parallel workers, -1 for all cores.
+    time_budget (float): Wall-clock budget in seconds, or None.
+    cpu_budget (float): Budget of CPU seconds spent fitting, or None.
+    fold_features (callable): Per-fold columns of ``X``, see
+    :func:`grid_search`.
+
+    Returns:
+    BakeOffResult: Winning family, parameters and refitted estimator, and the
+    leaderboard.
+
+    Raises:
+    ValueError: If ``families`` holds no candidate.
+    """
+    candidates = [
+        (iteration, name, estimator, params)
+        for iteration, (name, estimator, family) in enumerate(families)
+        for params in family
+    ]
+    if not candidates:
+        raise ValueError("The bake-off needs at least one candidate")
+    scores = np.full((len(candidates), cv), np.nan)
+    fit_seconds = np.full((len(candidates), cv), np.nan)
+    predict_seconds = np.full((len(candidates), cv), np.nan)
+    cut = set()
+    with _evaluation(None, X, y, n_jobs, time_budget, cpu_budget, False, None) as (
+        evaluator,
+        shared,
+    ):
+        folds = shared.share_folds(KFold(cv).split(X), fold_features)
+        X_shared, y_shared = shared.share(X), shared.share(np.asarray(y))
+
+        def tasks():
+            # The pool pulls tasks as workers free up, so cuts and the budget
+            # apply to the fits that have not started yet.
+            for fold in range(cv):
+                for i, (_, _, estimator, params) in enumerate(candidates):
+                    if i in cut:
+                        continue
+                    if evaluator.expired() and (~np.isnan(scores)).all(axis=1).any():
+                        return
+                    yield delayed(_indexed)(
+                        (i, fold),
+                        _timed_fit_and_predict,
+                        estimator,
+                        params,
+                        X_shared,
+                        y_shared,
+                        folds[fold],
+                    )
+
+        for (i, fold), timings in evaluator.parallel(tasks()):
+            score, fit_seconds[i, fold], predict_seconds[i, fold], cpu = timings
+            scores[i, fold] = score
+            evaluator.cpu_seconds += cpu
+            scored = ~np.isnan(scores[i])
+            rivals = [
+                j
+                for j in range(len(candidates))
+                if j != i and not np.isnan(scores[j, scored]).any()
+            ]
+            if rivals:
+                leader = max(rivals, key=lambda j: scores[j, scored].mean())
+                if _is_beaten(scores[i, scored], scores[leader, scored], z):
+                    cut.add(i)
+
+    leaderboard, best = [], None
+    for i, (iteration, name, estimator, params) in enumerate(candidates):
+        n_folds = int((~np.isnan(scores[i])).sum())
+        if not n_folds:
+            continue
+        evaluator.record(params, scores[i], len(y), iteration)
+        complete = n_folds == cv
+        if complete and (best is None or scores[i].mean() > scores[best].mean()):
+            best = i
+        leaderboard.append(
+            {
+                "model": name,
+                "params": params,
+                "rmse": math.sqrt(-np.nanmean(scores[i])),
+                "n_folds": n_folds,
+                "fit_seconds": np.nanmean(fit_seconds[i]),
+                "predict_us_per_row": 1e6 * np.nanmean(predict_seconds[i]),
+                "status": "complete" if complete else "cut" if i in cut else "budget",
+            }
+        )
+    for iteration, (name, _, family) in enumerate(families):
+        n_cut = sum(candidates[i][0] == iteration for i in cut)
+        logging.info(f"Bake-off {name}: {len(family)} candidates, {n_cut} cut")
+
+    leaderboard.sort(key=lambda entry: (entry["status"] != "complete", entry["rmse"]))
+    _, name, estimator, params = candidates[best]
+    logging.info(f"Best model {name} {params} with score {scores[best].mean()}")
+    return BakeOffResult(
+        name,
+        params,
+        scores[best].mean(),
+        _refit(estimator, params, X, y),
+        evaluator.results,
+        leaderboard,
+    )
+
+
+SEARCHES = {
+    "grid": grid_search,
+    "halving": halving_search,
+    "random": random_search,
+    "adaptive": adaptive_search,
+}
+# Searches whose space is sampled from distributions rather than a grid.
+SAMPLING_SEARCHES = ("random", "adaptive")
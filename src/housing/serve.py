@@ -0,0 +1,374 @@
+import argparse
+import collections
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from .features import load_predictor
+from .model_store import ENGINES
+from .schema import conform
+
+
+class LatencyStats:
+    """
+    Thread-safe request counters and a sliding window of request latencies.
+
+    Parameters:
+    window (int): Number of most recent latencies used for the percentiles.
+    """
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self._batch_sizes = collections.deque(maxlen=window)
+        self.started = time.monotonic()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record_request(self, rows, latency):
+        with self._lock:
+            self.requests += 1
+            self.rows += rows
+            self._latencies.append(latency)
+
+    def record_batch(self, rows):
+        with self._lock:
+            self.batches += 1
+            self._batch_sizes.append(rows)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        """
+        Returns the counters, throughput and latency percentiles as a dict.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies)
+            batch_sizes = np.array(self._batch_sizes)
+            uptime = time.monotonic() - self.started
+            snapshot = {
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "errors": self.errors,
+                "uptime_seconds": uptime,
+                "requests_per_second": self.requests / uptime,
+                "rows_per_second": self.rows / uptime,
+                "mean_batch_rows": float(batch_sizes.mean()) if self.batches else 0.0,
+            }
+        for percentile in (50, 90, 99):
+            snapshot[f"latency_p{percentile}_ms"] = (
+                float(np.percentile(latencies, percentile) * 1000)
+                if len(latencies)
+                else 0.0
+            )
+        return snapshot
+
+
+class _Request:
+    def __init__(self, frame):
+        self.frame = frame
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent prediction requests into micro-batches.
+
+    A single worker thread waits for the first pending request, then keeps
+    collecting requests until ``max_batch_size`` rows are queued or
+    ``max_wait`` seconds have passed, and runs one vectorized ``predict``
+    over all of them.
+
+    Parameters:
+    predict (callable): Maps a DataFrame of input rows to an array of
+    predictions.
+    max_batch_size (int): Maximum number of rows per batch.
+    max_wait (float): Maximum time in seconds a request waits for others.
+    stats (LatencyStats): Where batch sizes are recorded.
+    """
+
+    def __init__(self, predict, max_batch_size=1024, max_wait=0.005, stats=None):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = stats or LatencyStats()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, frame):
+        """
+        Queues rows for prediction and blocks until their batch is done.
+
+        Parameters:
+        frame (pandas.DataFrame): Input rows.
+
+        Returns:
+        numpy.ndarray: One prediction per row.
+        """
+        request = _Request(frame)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch, rows = [first], len(first.frame)
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            batch.append(request)
+            rows += len(request.frame)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            try:
+                frame = pd.concat([r.frame for r in batch], ignore_index=True)
+                predictions = self.predict(frame)
+                self.stats.record_batch(len(frame))
+                start = 0
+                for request in batch:
+                    stop = start + len(request.frame)
+                    request.result = predictions[start:stop]
+                    start = stop
+            except Exception as e:
+                logging.error(f"Prediction batch failed: {e}")
+                for request in batch:
+                    request.error = e
+            for request in batch:
+                request.done.set()
+
+
+def parse_rows(body, content_type=""):
+    """
+    Parses a request body of housing rows.
+
+    Accepts a JSON list of objects, a JSON object with a ``rows`` list, a
+    single JSON object, or JSON Lines (one object per line). Rows are cast
+    to and validated against the housing schema here, so that a malformed
+    request cannot fail the micro-batch it would have joined.
+
+    Parameters:
+    body (bytes): Request body.
+    content_type (str): Value of the Content-Type header.
+
+    Returns:
+    pandas.DataFrame: Parsed rows.
+    """
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get("rows", [rows])
+    frame = pd.DataFrame.from_records(rows)
+    if len(frame):
+        conform(frame)
+    return frame
+
+
+class PredictionServer(ThreadingHTTPServer):
+    """
+    Threading HTTP server with a listen backlog sized for bursts of
+    concurrent clients, which the default of 5 would reset.
+    """
+
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """
+    Serves ``POST /predict``, ``GET /metrics`` and ``GET /health``.
+    """
+
+    batcher = None
+    stats = None
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        start = time.monotonic()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            frame = parse_rows(
+                self.rfile.read(length), self.headers.get("Content-Type", "")
+            )
+        except (ValueError, TypeError) as e:
+            self.stats.record_error()
+            self._send_json(400, {"error": f"Invalid request body: {e}"})
+            return
+        try:
+            predictions = self.batcher.submit(frame) if len(frame) else np.empty(0)
+        except Exception as e:
+            self.stats.record_error()
+            self._send_json(500, {"error": str(e)})
+            return
+        self.stats.record_request(len(frame), time.monotonic() - start)
+        self._send_json(200, {"predictions": predictions.tolist()})
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, self.stats.snapshot())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+
+def make_server(
+    model_folder,
+    host="127.0.0.1",
+    port=8000,
+    max_batch_size=1024,
+    max_wait=0.005,
+    engine="auto",
+):
+    """
+    Creates a prediction server with the model loaded and a micro-batcher
+    running. Call ``serve_forever`` on the result to start handling requests
+    and ``shutdown`` followed by ``batcher.close`` to stop.
+
+    Parameters:
+    model_folder (str): Folder with the trained model and feature pipeline.
+    host (str): Interface to bind.
+    port (int): Port to bind, 0 for any free port.
+    max_batch_size (int): Maximum number of rows per prediction batch.
+    max_wait (float): Maximum time in seconds a request waits for others.
+    engine (str): Forest engine, see :func:`model_store.load_model`. By
+    default small batches use the flattened forest and larger ones the
+    scikit-learn estimator.
+
+    Returns:
+    PredictionServer: Server with ``batcher`` and ``stats``
+    attributes.
+    """
+    stats = LatencyStats()
+    batcher = MicroBatcher(
+        load_predictor(model_folder, engine), max_batch_size, max_wait, stats
+    )
+    handler = type(
+        "BoundPredictionHandler",
+        (PredictionHandler,),
+        {"batcher": batcher, "stats": stats},
+    )
+    server = PredictionServer((host, port), handler)
+    server.batcher = batcher
+    server.stats = stats
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve model predictions over HTTP.")
+    parser.add_argument(
+        "--model-folder",
+        default=os.path.join("..", "artifacts"),
+        help="Path to the model",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind")
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=1024,
+        help="Maximum number of rows per prediction batch",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5.0,
+        help="Maximum time a request waits to be batched with others",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="auto",
+        help="Forest engine: flattened arrays, scikit-learn or by batch size",
+    )
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+
+    args = parser.parse_args(argv)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log and not args.log_path:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    server = make_server(
+        args.model_folder,
+        args.host,
+        args.port,
+        args.max_batch_size,
+        args.max_wait_ms / 1000,
+        args.engine,
+    )
+    logging.info(f"Serving predictions on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+
+
+if __name__ == "__main__":
+    main()
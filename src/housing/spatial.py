@@ -0,0 +1,246 @@
+import numpy as np
+from sklearn.model_selection import KFold
+from sklearn.neighbors import KDTree
+
+KM_PER_DEGREE = 111.195
+# Floor of the k-th neighbour distance, so a location with many rows does
+# not report an infinite density.
+MIN_RADIUS_KM = 0.1
+
+
+def _locations(points):
+    """
+    Returns the distinct rows of an (n, 2) array and the index of each row
+    among them.
+    """
+    keys = points[:, 0] + 1j * points[:, 1]
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return points[first], inverse
+
+
+class SpatialNeighbors:
+    """
+    k-nearest-neighbour aggregates over the training coordinates.
+
+    The longitude and latitude of the training rows are projected to
+    kilometres (equirectangular, around their mean latitude). Housing data
+    repeats the same rounded coordinates for many rows, so the KD-tree
+    indexes the distinct locations, with the number of rows and the sums of
+    their income and label at each, and is pickled with the feature
+    pipeline. A row is then described by the ``n_neighbors`` locations
+    nearest to it:
+
+    - ``neighbor_median_income``: the mean ``median_income`` of their rows.
+    - ``neighbor_density``: their rows per km² within the distance of the
+      k-th of them.
+    - ``neighbor_target_mean``: the mean label of their rows, when labels
+      were given to :meth:`fit_transform`.
+
+    A training row is described among the other training rows, exactly as
+    :meth:`transform` describes a new row among all of them, so training
+    and scoring see the same features: the row is left out of its own
+    location, and a location it was alone at is not counted.
+
+    Building the tree costs O(u log u) for u locations and each query
+    O(k log u). Only the distinct locations of the queried rows are looked
+    up, in batches of ``batch_size``, so memory stays bounded on millions of
+    rows. The target mean of a training row is computed out of fold, from a
+    tree over the rows of the other ``n_folds - 1`` folds, so the label of a
+    row never leaks into its own features. Cross-validating a model on these
+    features would still let the held-out labels into the training rows, so
+    :meth:`fold_target_mean` recomputes the column for each validation fold.
+
+    Parameters:
+    n_neighbors (int): Number of neighbouring locations aggregated.
+    n_folds (int): Folds of the out-of-fold target mean.
+    batch_size (int): Locations per index query.
+    leaf_size (int): Leaf size of the KD-tree.
+    random_state (int): Seed of the fold assignment.
+    """
+
+    def __init__(
+        self,
+        n_neighbors=10,
+        n_folds=5,
+        batch_size=65536,
+        leaf_size=40,
+        random_state=42,
+    ):
+        self.n_neighbors = n_neighbors
+        self.n_folds = n_folds
+        self.batch_size = batch_size
+        self.leaf_size = leaf_size
+        self.random_state = random_state
+
+    @property
+    def feature_names(self):
+        names = ["neighbor_median_income", "neighbor_density"]
+        if self.label_sums_ is not None:
+            names.append("neighbor_target_mean")
+        return names
+
+    def _project(self, longitude, latitude):
+        points = np.empty((len(longitude), 2))
+        points[:, 0] = longitude
+        points[:, 0] *= KM_PER_DEGREE * self.cos_latitude_
+        points[:, 1] = latitude
+        points[:, 1] *= KM_PER_DEGREE
+        return points
+
+    def _query(self, tree, points, k=None):
+        """
+        Yields the slice, distances and indices of the ``k`` (by default
+        ``n_neighbors``) nearest locations of each batch of ``points``.
+        """
+        k = min(k or self.n_neighbors, tree.data.shape[0])
+        for start in range(0, len(points), self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            distances, indices = tree.query(points[batch], k=k)
+            yield batch, distances, indices
+
+    def _aggregate(self, points):
+        out = np.empty((len(points), len(self.feature_names)))
+        for batch, distances, indices in self._query(self.tree_, points):
+            rows = self.counts_[indices].sum(axis=1)
+            out[batch, 0] = self.income_sums_[indices].sum(axis=1) / rows
+            radius = np.maximum(distances[:, -1], MIN_RADIUS_KM)
+            out[batch, 1] = rows / (np.pi * radius**2)
+            if self.label_sums_ is not None:
+                out[batch, 2] = self.label_sums_[indices].sum(axis=1) / rows
+        return out
+
+    def fit_transform(self, longitude, latitude, median_income, y=None, dtype=None):
+        """
+        Indexes the training rows and returns their neighbour features.
+
+        Parameters:
+        longitude (numpy.ndarray): Longitude of each row.
+        latitude (numpy.ndarray): Latitude of each row.
+        median_income (numpy.ndarray): Median income of each row.
+        y (numpy.ndarray): Label of each row, or None to skip the target mean.
+        dtype (numpy.dtype): Type of the returned features.
+
+        Returns:
+        numpy.ndarray: One column per entry of ``feature_names``.
+        """
+        self.cos_latitude_ = float(np.cos(np.radians(np.mean(latitude))))
+        locations, location_of_row = _locations(self._project(longitude, latitude))
+        if len(locations) <= self.n_neighbors:
+            raise ValueError(
+                f"SpatialNeighbors needs more than {self.n_neighbors} distinct "
+                f"locations, got {len(locations)}"
+            )
+        n = len(locations)
+        self.tree_ = KDTree(locations, leaf_size=self.leaf_size)
+        self.counts_ = np.bincount(location_of_row, minlength=n).astype(np.float64)
+        self.income_sums_ = np.bincount(
+            location_of_row, weights=median_income, minlength=n
+        )
+        self.label_sums_ = None
+
+        out = np.empty((len(location_of_row), 2 + (y is not None)), dtype=dtype)
+        out[:, :2] = self._leave_one_out(locations, location_of_row, median_income)
+        if y is not None:
+            y = np.asarray(y, dtype=np.float64)
+            self.label_sums_ = np.bincount(location_of_row, weights=y, minlength=n)
+            out[:, 2] = self._out_of_fold_target_mean(locations, location_of_row, y)
+        return out
+
+    def _leave_one_out(self, locations, location_of_row, median_income):
+        """
+        Returns the income and density features of each training row among
+        the other training rows.
+
+        The ``n_neighbors + 1`` nearest locations of each training location
+        are looked up, its own first. A row is taken out of its own location,
+        which is replaced by the next nearest one when the row was alone
+        there.
+        """
+        k = self.n_neighbors
+        n = len(locations)
+        rows, income_sums, radius = np.empty(n), np.empty(n), np.empty(n)
+        alone = self.counts_ == 1
+        for batch, distances, indices in self._query(self.tree_, locations, k + 1):
+            skip = alone[batch]
+            columns = np.arange(k) + skip[:, None]
+            chosen = np.take_along_axis(indices, columns, axis=1)
+            rows[batch] = self.counts_[chosen].sum(axis=1) - 1 + skip
+            income_sums[batch] = self.income_sums_[chosen].sum(axis=1)
+            radius[batch] = distances[np.arange(len(skip)), k - 1 + skip]
+        own_income = np.where(alone[location_of_row], 0.0, median_income)
+        rows = rows[location_of_row]
+        out = np.empty((len(location_of_row), 2))
+        out[:, 0] = (income_sums[location_of_row] - own_income) / rows
+        radius = np.maximum(radius, MIN_RADIUS_KM)[location_of_row]
+        out[:, 1] = rows / (np.pi * radius**2)
+        return out
+
+    def _out_of_fold_target_mean(self, locations, location_of_row, y):
+        n = len(locations)
+        target_mean = np.empty(len(y))
+        folds = KFold(self.n_folds, shuffle=True, random_state=self.random_state)
+        for train_index, fold_index in folds.split(location_of_row):
+            counts = np.bincount(location_of_row[train_index], minlength=n)
+            sums = np.bincount(
+                location_of_row[train_index], weights=y[train_index], minlength=n
+            )
+            (indexed,) = np.nonzero(counts)
+            tree = KDTree(locations[indexed], leaf_size=self.leaf_size)
+            queried = np.unique(location_of_row[fold_index])
+            means = np.empty(n)
+            for batch, _, indices in self._query(tree, locations[queried]):
+                indices = indexed[indices]
+                rows = counts[indices].sum(axis=1)
+                means[queried[batch]] = sums[indices].sum(axis=1) / rows
+            target_mean[fold_index] = means[location_of_row[fold_index]]
+        return target_mean
+
+    def fold_target_mean(self, longitude, latitude, median_income, y, train_index):
+        """
+        Returns the neighbour target mean of every row as a fit on the
+        ``train_index`` rows alone would give it: out of fold for those rows,
+        and among them for the others, so no label of the other rows is used.
+
+        Parameters:
+        longitude (numpy.ndarray): Longitude of each row.
+        latitude (numpy.ndarray): Latitude of each row.
+        median_income (numpy.ndarray): Median income of each row.
+        y (numpy.ndarray): Label of each row.
+        train_index (numpy.ndarray): Rows the fit would see.
+
+        Returns:
+        numpy.ndarray: Target mean of each row.
+        """
+        fold = SpatialNeighbors(
+            self.n_neighbors,
+            self.n_folds,
+            self.batch_size,
+            self.leaf_size,
+            self.random_state,
+        )
+        target_mean = np.empty(len(y))
+        target_mean[train_index] = fold.fit_transform(
+            longitude[train_index],
+            latitude[train_index],
+            median_income[train_index],
+            np.asarray(y)[train_index],
+        )[:, 2]
+        rest = np.ones(len(y), dtype=bool)
+        rest[train_index] = False
+        target_mean[rest] = fold.transform(longitude[rest], latitude[rest])[:, 2]
+        return target_mean
+
+    def transform(self, longitude, latitude, dtype=None):
+        """
+        Returns the neighbour features of new rows among the training rows.
+
+        Parameters:
+        longitude (numpy.ndarray): Longitude of each row.
+        latitude (numpy.ndarray): Latitude of each row.
+        dtype (numpy.dtype): Type of the returned features.
+
+        Returns:
+        numpy.ndarray: One column per entry of ``feature_names``.
+        """
+        locations, location_of_row = _locations(self._project(longitude, latitude))
+        return self._aggregate(locations)[location_of_row].astype(dtype, copy=False)
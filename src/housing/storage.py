@@ -0,0 +1,180 @@
+import logging
+import os
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+
+def data_file(folder, name, file_format="csv"):
+    """
+    Builds the path of a processed data file for the given storage format.
+
+    Parameters:
+    folder (str): Directory containing the file.
+    name (str): File name without extension, e.g. ``"train"``.
+    file_format (str): One of ``FORMATS``.
+
+    Returns:
+    str: Path to the file.
+    """
+    return os.path.join(folder, name + FORMATS[file_format])
+
+
+def write_frame(frame, path):
+    """
+    Writes a DataFrame in the format implied by the file extension.
+
+    Feather files are written uncompressed so that they can be memory-mapped
+    without decoding when read back.
+
+    Parameters:
+    frame (pandas.DataFrame): Data to write.
+    path (str): Destination path ending in ``.csv``, ``.parquet`` or ``.feather``.
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == FORMATS["parquet"]:
+        frame.to_parquet(path, index=False)
+    elif ext == FORMATS["feather"]:
+        frame.reset_index(drop=True).to_feather(path, compression="uncompressed")
+    else:
+        frame.to_csv(path, index=False)
+    logging.debug(f"Wrote {len(frame)} rows to {path}")
+
+
+def _cast(frame, dtypes):
+    if not dtypes:
+        return frame
+    return frame.astype(
+        {column: dtype for column, dtype in dtypes.items() if column in frame},
+        copy=False,
+    )
+
+
+def read_frame(path, columns=None, dtypes=None):
+    """
+    Reads a DataFrame in the format implied by the file extension.
+
+    Columnar files are memory-mapped and only the requested columns are read.
+
+    Parameters:
+    path (str): Path ending in ``.csv``, ``.parquet`` or ``.feather``.
+    columns (list): Columns to read, or None for all of them.
+    dtypes (dict): Type of some columns. CSV columns are parsed directly into
+    it, columnar files are cast after reading.
+
+    Returns:
+    pandas.DataFrame: Loaded data.
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == FORMATS["parquet"]:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    elif ext == FORMATS["feather"]:
+        import pyarrow.feather as feather
+
+        table = feather.read_table(path, columns=columns, memory_map=True)
+    else:
+        import pandas as pd
+
+        return pd.read_csv(path, usecols=columns, dtype=dtypes)
+    return _cast(table.to_pandas(split_blocks=True, self_destruct=True), dtypes)
+
+
+def iter_frames(path, chunksize, columns=None, dtypes=None):
+    """
+    Reads a CSV, Parquet or Feather file as a stream of DataFrame chunks.
+
+    Parameters:
+    path (str): Path ending in ``.csv``, ``.parquet`` or ``.feather``.
+    chunksize (int): Maximum number of rows per chunk.
+    columns (list): Columns to read, or None for all of them.
+    dtypes (dict): Type of some columns, as for :func:`read_frame`.
+
+    Yields:
+    pandas.DataFrame: Consecutive chunks of the file, in row order.
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == FORMATS["parquet"]:
+        import pyarrow.parquet as pq
+
+        with pq.ParquetFile(path, memory_map=True) as parquet_file:
+            for batch in parquet_file.iter_batches(chunksize, columns=columns):
+                yield _cast(batch.to_pandas(), dtypes)
+    elif ext == FORMATS["feather"]:
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                for offset in range(0, batch.num_rows, chunksize):
+                    yield _cast(batch.slice(offset, chunksize).to_pandas(), dtypes)
+    else:
+        import pandas as pd
+
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns, dtype=dtypes)
+
+
+class FrameWriter:
+    """
+    Appends DataFrame chunks to a single output file.
+
+    The format is implied by the file extension, as for :func:`write_frame`.
+    Only one chunk is held in memory at a time, so arbitrarily large outputs
+    can be produced from a stream of chunks. The schema of the first chunk is
+    used for all later ones.
+
+    Parameters:
+    path (str): Destination path ending in ``.csv``, ``.parquet`` or ``.feather``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._ext = os.path.splitext(path)[1]
+        self._writer = None
+        self._schema = None
+        self._columns = None
+
+    def write(self, frame):
+        if self._columns is None:
+            self._columns = list(frame.columns)
+        frame = frame[self._columns]
+        if self._ext in (FORMATS["parquet"], FORMATS["feather"]):
+            self._write_arrow(frame)
+        else:
+            frame.to_csv(
+                self.path,
+                mode="a" if self.rows else "w",
+                header=not self.rows,
+                index=False,
+            )
+        self.rows += len(frame)
+
+    def _write_arrow(self, frame):
+        import pyarrow as pa
+
+        if self._writer is None:
+            self._schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            if self._ext == FORMATS["parquet"]:
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, self._schema)
+        table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        logging.debug(f"Wrote {self.rows} rows to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
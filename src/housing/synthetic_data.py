@@ -0,0 +1,146 @@
+import argparse
+import logging
+import os
+
+from .ingest_data import HOUSING_PATH
+from .storage import FrameWriter
+
+HOUSING_ROWS = 20640
+SCALES = (1, 10, 100, 1000)
+MEDIAN_HOUSE_VALUE_CAP = 500001.0
+COUNT_COLUMNS = ["total_rooms", "total_bedrooms", "population", "households"]
+
+
+def synthesize_housing(source, n_rows, rng):
+    """
+    Draws synthetic rows with the schema and distributions of ``housing.csv``.
+
+    Rows are resampled from ``source`` with replacement and every numeric
+    column is perturbed (a smoothed bootstrap), so the marginal distributions,
+    the correlations between columns, the ``ocean_proximity`` categories, the
+    capped house values and the share of missing ``total_bedrooms`` follow
+    the real data without copying it row for row. The count columns of a
+    block share one size factor, so ratios such as rooms per household stay
+    realistic.
+
+    Parameters:
+    source (pandas.DataFrame): Real housing data.
+    n_rows (int): Number of rows to draw.
+    rng (numpy.random.Generator): Random generator.
+
+    Returns:
+    pandas.DataFrame: Synthetic rows with the columns and dtypes of ``source``.
+    """
+    import numpy as np
+
+    rows = source.iloc[rng.integers(0, len(source), n_rows)].reset_index(drop=True)
+    synthetic = rows.copy()
+    for column in ("longitude", "latitude"):
+        synthetic[column] = (rows[column] + rng.normal(0.0, 0.01, n_rows)).round(2)
+    synthetic["housing_median_age"] = np.clip(
+        rows["housing_median_age"] + rng.integers(-2, 3, n_rows), 1, 52
+    ).astype(np.float64)
+    size = rng.lognormal(0.0, 0.1, n_rows)
+    for column in COUNT_COLUMNS:
+        counts = rows[column] * size * rng.lognormal(0.0, 0.03, n_rows)
+        synthetic[column] = np.maximum(counts.round(), 1.0)
+    synthetic["median_income"] = (
+        (rows["median_income"] * rng.lognormal(0.0, 0.05, n_rows))
+        .clip(0.4999, 15.0001)
+        .round(4)
+    )
+    value = rows["median_house_value"] * rng.lognormal(0.0, 0.05, n_rows)
+    synthetic["median_house_value"] = (
+        value.clip(14999.0, MEDIAN_HOUSE_VALUE_CAP - 1)
+        .round(-2)
+        .where(
+            rows["median_house_value"] < MEDIAN_HOUSE_VALUE_CAP,
+            MEDIAN_HOUSE_VALUE_CAP,
+        )
+    )
+    return synthetic.astype(source.dtypes)
+
+
+def write_synthetic_housing(
+    folder, scale, seed=42, chunksize=1_000_000, housing_path=HOUSING_PATH
+):
+    """
+    Writes ``scale`` times the rows of ``housing.csv`` as a synthetic
+    ``housing.csv`` in ``folder``.
+
+    Rows are generated and written in chunks, so memory does not grow with
+    the scale. The folder can be passed as ``housing_path`` to the ingestion
+    functions in place of the downloaded archive.
+
+    Parameters:
+    folder (str): Output folder.
+    scale (int): Multiple of the 20,640 rows of the real data.
+    seed (int): Seed making the output deterministic for a given chunksize.
+    chunksize (int): Number of rows generated at a time.
+    housing_path (str): Folder of the real data the rows are drawn from.
+
+    Returns:
+    str: Path of the written CSV.
+    """
+    import numpy as np
+
+    from .ingest_data import load_housing_data
+
+    source = load_housing_data(housing_path)
+    rng = np.random.default_rng(seed)
+    n_rows = int(scale * HOUSING_ROWS)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, "housing.csv")
+    with FrameWriter(path) as writer:
+        for start in range(0, n_rows, chunksize):
+            writer.write(
+                synthesize_housing(source, min(chunksize, n_rows - start), rng)
+            )
+    logging.info(f"Wrote {writer.rows} synthetic housing rows to {path}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic data with the schema of housing.csv."
+    )
+    parser.add_argument(
+        "--output-folder",
+        default=os.path.join("..", "data", "synthetic"),
+        help="Path to save the data, one subfolder per scale",
+    )
+    parser.add_argument(
+        "--scales",
+        type=float,
+        nargs="+",
+        default=list(SCALES),
+        help="Multiples of the size of the real data",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+
+    args = parser.parse_args(argv)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log and not args.log_path:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    for scale in args.scales:
+        write_synthetic_housing(
+            os.path.join(args.output_folder, f"{scale:g}x"), scale, args.seed
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+import argparse
+import collections
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+
+# In the user cache rather than next to the code, which may be installed in
+# a read-only site-packages.
+DEFAULT_SPOOL_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "housing",
+    "tracking_spool",
+)
+SPOOL_FILE = "events.jsonl"
+MAX_BATCH_SIZE = 100
+
+_STOP = "stop"
+_FLUSH = "flush"
+
+_default_tracker = None
+_default_lock = threading.Lock()
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class TrackedRun:
+    """
+    Handle of a run started with :meth:`Tracker.start_run`.
+
+    Every method only queues an event and returns immediately. Used as a
+    context manager, the run is ended when the block exits, as ``FAILED`` if
+    it raised.
+
+    Parameters:
+    tracker (Tracker): Tracker delivering the events.
+    key (str): Local identifier of the run, valid before the tracking server
+    has assigned it a run id.
+    """
+
+    def __init__(self, tracker, key):
+        self.tracker = tracker
+        self.key = key
+
+    def log_params(self, params):
+        self.tracker._put(
+            "params", self.key, params={k: str(v) for k, v in params.items()}
+        )
+
+    def log_metrics(self, metrics, step=0):
+        self.tracker._put(
+            "metrics",
+            self.key,
+            metrics={k: float(v) for k, v in metrics.items()},
+            step=step,
+        )
+
+    def log_metric(self, name, value, step=0):
+        self.log_metrics({name: value}, step)
+
+    def log_artifact(self, path):
+        """
+        Queues a file for upload. The file is read when its batch is flushed,
+        or copied into the spool if the server is down by then.
+        """
+        self.tracker._put("artifact", self.key, path=os.path.abspath(path))
+
+    def end(self, status="FINISHED"):
+        self.tracker._put("end_run", self.key, status=status)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end("FINISHED" if exc_type is None else "FAILED")
+
+
+class Tracker:
+    """
+    Non-blocking, batched client for an MLflow tracking server.
+
+    Runs, params, metrics and artifacts are queued in memory and delivered by
+    a background thread, which groups consecutive params and metrics of a run
+    into ``log_batch`` calls. MLflow itself is only imported by that thread.
+    When delivery fails, the undelivered events are appended to a JSON Lines
+    spool and the server is left alone for ``retry_interval`` seconds, during
+    which new events go straight to the spool. The spool is replayed, oldest
+    first, before the next batch once the server answers again, or explicitly
+    with :meth:`replay`.
+
+    Parameters:
+    tracking_uri (str): Tracking server or store, the MLflow default if None.
+    experiment_name (str): Experiment of the runs, the default one if None.
+    spool_dir (str): Directory of the spool and of spooled artifacts,
+    ``~/.cache/housing/tracking_spool`` by default.
+    client (mlflow.tracking.MlflowClient): Client to use instead of one
+    created for ``tracking_uri``.
+    flush_interval (float): Seconds the worker waits to gather a batch.
+    retry_interval (float): Seconds between attempts to reach a failed
+    server.
+    """
+
+    def __init__(
+        self,
+        tracking_uri=None,
+        experiment_name=None,
+        spool_dir=DEFAULT_SPOOL_DIR,
+        client=None,
+        flush_interval=1.0,
+        retry_interval=30.0,
+    ):
+        self.tracking_uri = tracking_uri
+        self.experiment_name = experiment_name
+        self.spool_dir = spool_dir
+        self.spool_path = os.path.join(spool_dir, SPOOL_FILE)
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self._client = client
+        self._experiment_id = None
+        self._run_ids = {}
+        self._offline_until = 0.0
+        self._inflight = collections.deque()
+        self._send_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def start_run(self, run_name=None, parent=None):
+        """
+        Queues the creation of a run.
+
+        Parameters:
+        run_name (str): Name of the run.
+        parent (TrackedRun): Run to nest the new run under, if any.
+
+        Returns:
+        TrackedRun: Handle to log to.
+        """
+        key = uuid.uuid4().hex
+        self._put(
+            "start_run",
+            key,
+            run_name=run_name,
+            parent=parent.key if parent is not None else None,
+        )
+        return TrackedRun(self, key)
+
+    def flush(self, timeout=None):
+        """
+        Waits until the events queued so far are delivered or spooled.
+
+        Returns:
+        bool: False if ``timeout`` expired first.
+        """
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """
+        Stops the worker after the queued events are delivered or spooled.
+
+        If the worker is still blocked on the server after ``timeout``
+        seconds, the events it has not delivered are spooled from here, so a
+        batch in flight may be replayed twice.
+        """
+        if not self._worker.is_alive():
+            return
+        self._queue.put((_STOP, None))
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            logging.warning("Tracking server is not responding, spooling events")
+            pending = list(self._inflight)
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, dict):
+                    pending.append(item)
+            self._spool(pending)
+
+    def replay(self):
+        """
+        Delivers the spooled events.
+
+        Returns:
+        int: Number of events delivered. Events that could not be delivered
+        stay in the spool and the error is raised.
+        """
+        with self._send_lock:
+            return self._replay_spool()
+
+    def _put(self, kind, run, **fields):
+        self._queue.put({"type": kind, "run": run, "timestamp": _now_ms(), **fields})
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            batch, controls = [], []
+            while True:
+                if isinstance(item, dict):
+                    batch.append(item)
+                else:
+                    controls.append(item)
+                timeout = 0 if controls else deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(timeout, 0))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._deliver(batch)
+                except Exception:
+                    # The worker must keep draining the queue, or flush() and
+                    # close() would wait for it forever.
+                    logging.exception(f"Dropping {len(batch)} tracking events")
+                    self._inflight = collections.deque()
+            for kind, done in controls:
+                if kind == _FLUSH:
+                    done.set()
+            if any(kind == _STOP for kind, _ in controls):
+                return
+
+    def _deliver(self, batch):
+        if time.monotonic() < self._offline_until:
+            self._spool(batch)
+            return
+        with self._send_lock:
+            self._inflight = collections.deque(batch)
+            try:
+                self._replay_spool()
+                self._send(self._inflight)
+            except Exception as e:
+                logging.warning(
+                    f"Tracking server unavailable, spooling "
+                    f"{len(self._inflight)} events to {self.spool_path}: {e}"
+                )
+                self._offline_until = time.monotonic() + self.retry_interval
+                self._spool(self._inflight)
+            self._inflight = collections.deque()
+
+    def _get_client(self):
+        if self._client is None:
+            from mlflow.tracking import MlflowClient
+
+            self._client = MlflowClient(self.tracking_uri)
+        if self._experiment_id is None:
+            if self.experiment_name is None:
+                self._experiment_id = "0"
+            else:
+                experiment = self._client.get_experiment_by_name(self.experiment_name)
+                self._experiment_id = (
+                    experiment.experiment_id
+                    if experiment is not None
+                    else self._client.create_experiment(self.experiment_name)
+                )
+        return self._client
+
+    def _send(self, events):
+        """
+        Delivers events in order, removing each one from the deque once the
+        server has accepted it. Events the server rejects as invalid are
+        dropped, since retrying them could never succeed.
+        """
+        from mlflow.exceptions import MlflowException
+
+        client = self._get_client()
+        while events:
+            try:
+                self._send_next(client, events)
+            except MlflowException as e:
+                if not 400 <= e.get_http_status_code() < 500:
+                    raise
+                logging.warning(f"Dropping rejected {events[0]['type']} event: {e}")
+                events.popleft()
+
+    def _send_next(self, client, events):
+        event = events[0]
+        kind, key = event["type"], event["run"]
+        if kind == "start_run":
+            tags = {}
+            if event["parent"] in self._run_ids:
+                tags["mlflow.parentRunId"] = self._run_ids[event["parent"]]
+            run = client.create_run(
+                self._experiment_id,
+                start_time=event["timestamp"],
+                tags=tags,
+                run_name=event["run_name"],
+            )
+            self._run_ids[key] = run.info.run_id
+            events.popleft()
+            return
+        if key not in self._run_ids:
+            logging.warning(f"Dropping {kind} event of an unknown run {key}")
+            events.popleft()
+            return
+        run_id = self._run_ids[key]
+        if kind == "artifact":
+            client.log_artifact(run_id, event["path"])
+            events.popleft()
+        elif kind == "end_run":
+            client.set_terminated(run_id, event["status"], event["timestamp"])
+            events.popleft()
+        else:
+            self._send_batch(client, run_id, events)
+
+    def _send_batch(self, client, run_id, events):
+        from mlflow.entities import Metric, Param
+
+        key, group = events[0]["run"], []
+        for event in events:
+            if event["type"] not in ("params", "metrics") or event["run"] != key:
+                break
+            group.append(event)
+        params = [
+            Param(name, value)
+            for event in group
+            if event["type"] == "params"
+            for name, value in event["params"].items()
+        ]
+        metrics = [
+            Metric(name, value, event["timestamp"], event["step"])
+            for event in group
+            if event["type"] == "metrics"
+            for name, value in event["metrics"].items()
+        ]
+        for start in range(0, max(len(params), len(metrics)), MAX_BATCH_SIZE):
+            client.log_batch(
+                run_id,
+                metrics=metrics[start : start + MAX_BATCH_SIZE],
+                params=params[start : start + MAX_BATCH_SIZE],
+            )
+        for _ in group:
+            events.popleft()
+
+    def _spool(self, events):
+        if not events:
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        artifact_dir = os.path.join(self.spool_dir, "artifacts")
+        with open(self.spool_path, "a") as f:
+            for event in events:
+                event = dict(event)
+                if event["run"] in self._run_ids:
+                    event["run_id"] = self._run_ids[event["run"]]
+                try:
+                    if event["type"] == "artifact" and not event["path"].startswith(
+                        os.path.abspath(artifact_dir)
+                    ):
+                        copy_dir = os.path.join(artifact_dir, uuid.uuid4().hex)
+                        os.makedirs(copy_dir)
+                        event["path"] = shutil.copy(event["path"], copy_dir)
+                    f.write(json.dumps(event) + "\n")
+                except OSError as e:
+                    logging.warning(f"Dropping {event['type']} event: {e}")
+
+    def _replay_spool(self):
+        if not os.path.exists(self.spool_path):
+            return 0
+        with open(self.spool_path) as f:
+            events = collections.deque(json.loads(line) for line in f if line.strip())
+        for event in events:
+            if "run_id" in event:
+                self._run_ids.setdefault(event["run"], event["run_id"])
+        total = len(events)
+        try:
+            self._send(events)
+        except Exception:
+            tmp_path = self.spool_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+            os.replace(tmp_path, self.spool_path)
+            raise
+        os.remove(self.spool_path)
+        shutil.rmtree(os.path.join(self.spool_dir, "artifacts"), ignore_errors=True)
+        logging.info(f"Replayed {total} spooled tracking events")
+        return total
+
+
+def get_tracker():
+    """
+    Returns the process-wide tracker, created on first use for the MLflow
+    default tracking URI.
+
+    Its events are delivered from a daemon thread, so a process using it
+    must call :func:`close_tracker` before exiting, or the events still
+    queued are lost. The ``main`` functions of the CLIs do.
+
+    Returns:
+    Tracker: Shared tracker.
+    """
+    global _default_tracker
+    with _default_lock:
+        if _default_tracker is None:
+            _default_tracker = Tracker()
+        return _default_tracker
+
+
+def close_tracker():
+    """
+    Delivers the queued events of the process-wide tracker and stops it, if
+    one was created. A later :func:`get_tracker` creates a new one.
+    """
+    global _default_tracker
+    with _default_lock:
+        tracker, _default_tracker = _default_tracker, None
+    if tracker is not None:
+        tracker.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay tracking events spooled while the server was down."
+    )
+    parser.add_argument(
+        "--tracking-uri",
+        default=os.environ.get("MLFLOW_TRACKING_URI"),
+        help="MLflow tracking server, the MLflow default if unset",
+    )
+    parser.add_argument(
+        "--spool-dir", default=DEFAULT_SPOOL_DIR, help="Directory of the spool"
+    )
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+
+    args = parser.parse_args(argv)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log and not args.log_path:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    tracker = Tracker(args.tracking_uri, spool_dir=args.spool_dir)
+    try:
+        tracker.replay()
+    finally:
+        tracker.close()
+
+
+if __name__ == "__main__":
+    main()
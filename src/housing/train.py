@@ -0,0 +1,328 @@
+import argparse
+import logging
+import os
+
+from . import instrumentation
+from .instrumentation import span
+from .schema import HOUSING_COLUMNS, read_housing
+from .storage import FORMATS, data_file
+
+# Model families of the bake-off, cheapest first.
+MODELS = ("linear", "tree", "forest")
+LEADERBOARD_FILE = "leaderboard.csv"
+
+
+def load_data(file_path, columns=HOUSING_COLUMNS):
+    """
+    Loads data from a CSV, Parquet or Feather file into a pandas DataFrame.
+
+    Parquet and Feather files are memory-mapped and only ``columns`` are read.
+    The columns are typed and validated by the housing schema, see
+    :func:`schema.read_housing`.
+
+    Parameters:
+    file_path (str): Path to the data file.
+    columns (list): Columns to read, or None for all of them.
+
+    Returns:
+    pandas.DataFrame: Loaded data.
+    """
+    return read_housing(file_path, columns)
+
+
+def train_model(
+    train_data,
+    output_folder,
+    args=None,
+    search="grid",
+    n_jobs=None,
+    time_budget=None,
+    run=None,
+    checkpoint_dir=None,
+    cpu_budget=None,
+    n_neighbors=None,
+    models=None,
+):
+    """
+    Trains a RandomForestRegressor model using a hyperparameter search and saves
+    the best model together with its fitted feature pipeline.
+
+    Parameters:
+    train_data (str): Path to the training dataset.
+    output_folder (str): Path to save the trained model.
+    args (argparse.Namespace): Command line arguments logged to the run, if any.
+    search (str): Search engine, one of ``search.SEARCHES``. ``"grid"`` and
+    ``"halving"`` walk a fixed grid, ``"random"`` and ``"adaptive"`` sample
+    ``n_estimators`` from 1-200 and ``max_features`` from 1-8.
+    n_jobs (int): Number of parallel search workers, -1 for all cores.
+    time_budget (float): Wall-clock budget of the search in seconds.
+    run (tracking.TrackedRun): Run receiving the params and metrics, a new
+    "Model Training" run of the default tracker if None.
+    checkpoint_dir (str): Where the search checkpoints its fits, so that a
+    killed training resumes the search instead of restarting it.
+    cpu_budget (float): CPU seconds the search may spend fitting.
+    n_neighbors (int): Add the spatial features of this many nearest
+    training neighbours, see :class:`spatial.SpatialNeighbors`.
+    models (list): Model families of ``MODELS`` to compare with
+    :func:`search.bake_off` instead of searching the forest alone. Each family
+    is evaluated on its grid, ``search`` is not used, and the leaderboard is
+    saved as ``leaderboard.csv`` next to the model.
+
+    Raises:
+    ValueError: If ``models`` is empty, names a family not in ``MODELS``, or
+    is combined with ``checkpoint_dir``, as the bake-off does not checkpoint
+    its fits.
+    """
+    if models is not None:
+        if not models:
+            raise ValueError(f"models must name some of {list(MODELS)}")
+        unknown = [name for name in models if name not in MODELS]
+        if unknown:
+            raise ValueError(f"Unknown models {unknown}, expected {list(MODELS)}")
+        if checkpoint_dir:
+            raise ValueError("The model bake-off cannot be checkpointed")
+
+    import numpy as np
+    import pandas as pd
+    from scipy.stats import randint
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_squared_error
+    from sklearn.model_selection import ParameterGrid
+    from sklearn.tree import DecisionTreeRegressor
+
+    from .features import LABEL_COLUMN, HousingFeatures, save_pipeline
+    from .model_store import save_model
+    from .search import SAMPLING_SEARCHES, SEARCHES, bake_off
+    from .tracking import get_tracker
+
+    with span("train") as stage:
+        with span("load") as load:
+            train_set = load_data(train_data)
+            load.rows = stage.rows = len(train_set)
+        train_set_labels = train_set[LABEL_COLUMN].to_numpy()
+        train_set = train_set.drop(LABEL_COLUMN, axis=1)
+
+        with span("features", rows=stage.rows):
+            pipeline = HousingFeatures(n_neighbors=n_neighbors)
+            train_set_prepared = pipeline.fit_transform(train_set, train_set_labels)
+        del train_set
+
+        param_grid = [
+            {"n_estimators": [3, 10, 30], "max_features": [2, 4, 6, 8]},
+            {"bootstrap": [False], "n_estimators": [3, 10], "max_features": [2, 3, 4]},
+        ]
+        param_distributions = {
+            "n_estimators": randint(low=1, high=201),
+            "max_features": randint(low=1, high=9),
+        }
+        tree_grid = {"max_depth": [4, 8, 12, None], "min_samples_leaf": [1, 10]}
+
+        forest_reg = RandomForestRegressor(random_state=42)
+        # The neighbour target mean is rebuilt in each fold from the labels of
+        # its training rows, so the held-out labels do not leak into them.
+        fold_features = pipeline.fold_features(train_set_prepared, train_set_labels)
+        leaderboard_path = None
+        with span("search", rows=stage.rows):
+            if models:
+                families = {
+                    "linear": (LinearRegression(), [{}]),
+                    "tree": (
+                        DecisionTreeRegressor(random_state=42),
+                        list(ParameterGrid(tree_grid)),
+                    ),
+                    "forest": (forest_reg, list(ParameterGrid(param_grid))),
+                }
+                search_result = bake_off(
+                    [(name, *families[name]) for name in MODELS if name in models],
+                    train_set_prepared,
+                    train_set_labels,
+                    cv=5,
+                    n_jobs=n_jobs,
+                    time_budget=time_budget,
+                    cpu_budget=cpu_budget,
+                    fold_features=fold_features,
+                )
+                os.makedirs(output_folder, exist_ok=True)
+                leaderboard_path = os.path.join(output_folder, LEADERBOARD_FILE)
+                pd.DataFrame(search_result.leaderboard_).to_csv(
+                    leaderboard_path, index=False
+                )
+            else:
+                search_result = SEARCHES[search](
+                    forest_reg,
+                    param_distributions if search in SAMPLING_SEARCHES else param_grid,
+                    train_set_prepared,
+                    train_set_labels,
+                    cv=5,
+                    n_jobs=n_jobs,
+                    time_budget=time_budget,
+                    cpu_budget=cpu_budget,
+                    checkpoint_dir=checkpoint_dir,
+                    fold_features=fold_features,
+                )
+
+        best_model = search_result.best_estimator_
+
+        with span("save"):
+            model_path = save_model(best_model, output_folder)
+            save_pipeline(pipeline, output_folder)
+
+        with span("predict", rows=stage.rows):
+            final_predictions = best_model.predict(train_set_prepared)
+        mse = mean_squared_error(train_set_labels, final_predictions)
+        rmse = np.sqrt(mse)
+
+    own_run = run is None
+    if own_run:
+        run = get_tracker().start_run("Model Training")
+    if args is not None:
+        run.log_params(vars(args))  # Logging parameters here
+
+    run.log_metric("rmse", rmse)
+    run.log_metrics(stage.metrics())
+    if leaderboard_path is not None:
+        run.log_params({"best_model": search_result.best_model_})
+        for entry in search_result.leaderboard_:
+            if entry["status"] == "complete":
+                run.log_metrics(
+                    {
+                        f"{entry['model']}.{key}": entry[key]
+                        for key in ("rmse", "fit_seconds", "predict_us_per_row")
+                    }
+                )
+        run.log_artifact(leaderboard_path)
+    if own_run:
+        run.end()
+
+    logging.info(f"Model training completed. Model saved to {model_path}")
+
+
+def check_search_args(parser, args):
+    """
+    Exits through ``parser.error`` if the ``--search``, ``--models`` and
+    ``--checkpoint-dir`` arguments are unknown or cannot be combined.
+
+    Parameters:
+    parser (argparse.ArgumentParser): Parser of the arguments.
+    args (argparse.Namespace): Parsed arguments, ``search`` being None when
+    not given.
+    """
+    from .search import SEARCHES
+
+    if args.search is not None and args.search not in SEARCHES:
+        parser.error(f"--search must be one of {sorted(SEARCHES)}")
+    for name in args.models or []:
+        if name not in MODELS:
+            parser.error(f"--models must be among {list(MODELS)}")
+    if args.models and args.search is not None:
+        parser.error("--search cannot be used with --models")
+    if args.models and args.checkpoint_dir:
+        parser.error("--checkpoint-dir cannot be used with --models")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the model.")
+    parser.add_argument(
+        "--input-folder",
+        default=os.path.join("..", "data", "processed"),
+        help="Path to the input data",
+    )
+    parser.add_argument(
+        "--output-folder",
+        default=os.path.join("..", "artifacts"),
+        help="Path to save the model",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(FORMATS),
+        default="csv",
+        help="Storage format of the processed training file",
+    )
+    parser.add_argument(
+        "--search",
+        help="Hyperparameter search engine: grid (default), halving, random or "
+        "adaptive",
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        help="Compare these model families: linear, tree and/or forest",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        help="Number of parallel search workers, -1 to use all cores",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Wall-clock budget of the hyperparameter search in seconds",
+    )
+    parser.add_argument(
+        "--cpu-budget",
+        type=float,
+        help="CPU seconds the hyperparameter search may spend fitting",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        help="Checkpoint the search here and resume it if training is restarted",
+    )
+    parser.add_argument(
+        "--neighbors",
+        type=int,
+        help="Add features of this many nearest neighbours by location",
+    )
+    parser.add_argument("--log-level", default="INFO", help="Set the logging level")
+    parser.add_argument("--log-path", help="Path to save the log file")
+    parser.add_argument(
+        "--no-console-log", action="store_true", help="Disable console logging"
+    )
+    parser.add_argument(
+        "--profile-dir", help="Save a cProfile dump of each stage in this folder"
+    )
+    parser.add_argument(
+        "--span-log", help="Append stage timings to this JSON Lines file"
+    )
+
+    args = parser.parse_args(argv)
+
+    check_search_args(parser, args)
+
+    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+
+    if args.log_path:
+        logging.basicConfig(filename=args.log_path, level=log_level, format=log_format)
+    else:
+        logging.basicConfig(level=log_level, format=log_format)
+
+    if args.no_console_log and not args.log_path:
+        logging.getLogger().addHandler(logging.NullHandler())
+
+    instrumentation.configure(args.profile_dir, args.span_log)
+
+    logging.info("Starting model training process")
+    from .tracking import close_tracker
+
+    try:
+        train_data = data_file(args.input_folder, "train", args.format)
+        train_model(
+            train_data,
+            args.output_folder,
+            args,
+            search=args.search or "grid",
+            n_jobs=args.n_jobs,
+            time_budget=args.time_budget,
+            checkpoint_dir=args.checkpoint_dir,
+            cpu_budget=args.cpu_budget,
+            n_neighbors=args.neighbors,
+            models=args.models,
+        )
+    finally:
+        close_tracker()
+    logging.info("Model training completed successfully")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.features import LABEL_COLUMN, HousingFeatures, save_pipeline
+from housing.ingest_data import load_housing_data
+from housing.model_store import save_model
+
+
+@pytest.fixture(scope="session")
+def housing():
+    return load_housing_data().sample(2000, random_state=0).reset_index(drop=True)
+
+
+@pytest.fixture
+def model_folder(housing, tmp_path):
+    train_set = housing.iloc[:1500]
+    pipeline = HousingFeatures()
+    model = RandomForestRegressor(n_estimators=5, random_state=42).fit(
+        pipeline.fit_transform(train_set), train_set[LABEL_COLUMN]
+    )
+    folder = str(tmp_path / "artifacts")
+    save_pipeline(pipeline, folder)
+    save_model(model, folder)
+    return folder
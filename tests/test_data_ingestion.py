@@ -1,12 +1,22 @@
+import hashlib
+import http.server
 import os
 import sys
+import threading
 
 import pandas as pd
 import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
-from ingest_data import fetch_housing_data, prepare_data
+from housing.ingest_data import (
+    download_file,
+    fetch_housing_data,
+    income_category,
+    load_housing_data,
+    prepare_data,
+)
+from housing.storage import read_frame
 
 TEST_HOUSING_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "raw")
 
@@ -19,10 +29,8 @@ def setup_test_environment():
     yield
 
 
-def test_prepare_data(setup_test_environment):
-    output_folder = os.path.join(
-        os.path.dirname(__file__), "..", "data"
-    )  # Adjusted path to data directory
+def test_prepare_data(setup_test_environment, tmp_path):
+    output_folder = str(tmp_path)
     prepare_data(output_folder)
 
     assert os.path.exists(os.path.join(output_folder, "processed"))
@@ -45,5 +53,125 @@ def test_prepare_data(setup_test_environment):
     assert all(col in test_data.columns for col in expected_columns)
 
 
+@pytest.mark.parametrize("file_format", ["parquet", "feather"])
+def test_prepare_data_columnar(setup_test_environment, tmp_path, file_format):
+    train_file, test_file = prepare_data(str(tmp_path), file_format)
+
+    assert train_file.endswith("." + file_format)
+    train_data = read_frame(train_file, columns=["median_income", "households"])
+    assert list(train_data.columns) == ["median_income", "households"]
+    assert len(train_data) + len(read_frame(test_file)) == 20640
+
+
+def test_prepare_data_chunked(setup_test_environment, tmp_path):
+    train_file, test_file = prepare_data(str(tmp_path / "a"), chunksize=1000)
+    _, rerun_file = prepare_data(str(tmp_path / "b"), chunksize=1000)
+    train_data = pd.read_csv(train_file)
+    test_data = pd.read_csv(test_file)
+
+    assert len(train_data) == 16512
+    assert len(test_data) == 4128
+    housing = pd.concat([train_data, test_data])
+    strata = income_category(housing["median_income"]).value_counts()
+    test_strata = income_category(test_data["median_income"]).value_counts()
+    assert ((test_strata - strata * 0.2).abs() <= 1).all()
+
+    pd.testing.assert_frame_equal(test_data, pd.read_csv(rerun_file))
+
+
+class ArchiveHandler(http.server.BaseHTTPRequestHandler):
+    """Local stand-in for the dataset host with ETag and Range support."""
+
+    payload = b""
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body, status = self.payload, 200
+        byte_range = self.headers.get("Range")
+        if byte_range and self.headers.get("If-Range", self.etag) == self.etag:
+            start = int(byte_range.split("=")[1].rstrip("-"))
+            body, status = self.payload[start:], 206
+        self.send_response(status)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def archive_server():
+    with open(os.path.join(TEST_HOUSING_PATH, "housing.tgz"), "rb") as f:
+        ArchiveHandler.payload = f.read()
+    ArchiveHandler.requests = []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/housing.tgz"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_downloads_without_extracting(archive_server, tmp_path):
+    digest = hashlib.sha256(ArchiveHandler.payload).hexdigest()
+    fetch_housing_data(archive_server, str(tmp_path), expected_sha256=digest)
+
+    assert len(ArchiveHandler.requests) == 1
+    assert os.path.exists(tmp_path / "housing.tgz")
+    assert not os.path.exists(tmp_path / "housing.tgz.part")
+    assert not os.path.exists(tmp_path / "housing.csv")
+
+
+def test_load_housing_data_streams_from_archive(archive_server, tmp_path):
+    fetch_housing_data(archive_server, str(tmp_path), expected_sha256=None)
+    housing = load_housing_data(str(tmp_path))
+
+    assert len(housing) == 20640
+    assert "ocean_proximity" in housing.columns
+    assert not os.path.exists(tmp_path / "housing.csv")
+
+
+def test_fetch_uses_cache_without_network(archive_server, tmp_path):
+    digest = hashlib.sha256(ArchiveHandler.payload).hexdigest()
+    fetch_housing_data(archive_server, str(tmp_path), expected_sha256=digest)
+    fetch_housing_data(archive_server, str(tmp_path), expected_sha256=digest)
+
+    assert len(ArchiveHandler.requests) == 1
+
+
+def test_fetch_rejects_checksum_mismatch(archive_server, tmp_path):
+    with pytest.raises(ValueError):
+        fetch_housing_data(archive_server, str(tmp_path), expected_sha256="0" * 64)
+    assert not os.path.exists(tmp_path / "housing.tgz")
+
+
+def test_download_conditional_request(archive_server, tmp_path):
+    path = str(tmp_path / "housing.tgz")
+    assert download_file(archive_server, path)
+    assert not download_file(archive_server, path)
+
+    assert ArchiveHandler.requests[-1]["If-None-Match"] == ArchiveHandler.etag
+
+
+def test_download_resumes_partial_file(archive_server, tmp_path):
+    path = str(tmp_path / "housing.tgz")
+    with open(path + ".part", "wb") as f:
+        f.write(ArchiveHandler.payload[:1000])
+
+    assert download_file(archive_server, path)
+
+    assert ArchiveHandler.requests[-1]["Range"] == "bytes=1000-"
+    with open(path, "rb") as f:
+        assert f.read() == ArchiveHandler.payload
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import pstats
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing import instrumentation
+from housing.instrumentation import span
+
+
+@pytest.fixture
+def configured(tmp_path):
+    profile_dir, span_log = tmp_path / "profiles", tmp_path / "spans.jsonl"
+    instrumentation.configure(str(profile_dir), str(span_log))
+    yield profile_dir, span_log
+    instrumentation.configure()
+
+
+def test_spans_nest_and_flatten_into_metrics():
+    with span("train", rows=1000) as stage:
+        with span("load") as load:
+            load.rows = 1000
+        with span("save"):
+            pass
+
+    assert [child.name for child in stage.children] == ["train.load", "train.save"]
+    assert stage.wall_seconds >= sum(c.wall_seconds for c in stage.children)
+    assert stage.rows_per_second == pytest.approx(1000 / stage.wall_seconds)
+
+    metrics = stage.metrics()
+    assert metrics["train.load.rows"] == 1000
+    assert "train.save.wall_seconds" in metrics
+    assert "train.save.rows_per_second" not in metrics
+    assert metrics["train.peak_rss_mb"] > 0
+
+
+def test_span_is_recorded_when_the_block_fails():
+    with pytest.raises(ValueError):
+        with span("score") as stage:
+            raise ValueError
+
+    assert stage.wall_seconds is not None
+    assert instrumentation._stack() == []
+
+
+def test_top_level_spans_are_profiled_and_logged(configured):
+    profile_dir, span_log = configured
+
+    with span("ingest", rows=10):
+        with span("split"):
+            sum(range(1000))
+
+    records = [json.loads(line) for line in span_log.read_text().splitlines()]
+    assert [r["span"] for r in records] == ["ingest.split", "ingest"]
+    assert records[1]["rows"] == 10
+
+    assert records[0]["profile"] is None
+    assert os.listdir(profile_dir) == [os.path.basename(records[1]["profile"])]
+    stats = pstats.Stats(records[1]["profile"])
+    assert stats.total_calls > 0
+    assert logging.getLogger("instrumentation").getEffectiveLevel() <= logging.INFO
+
+
+def test_configure_again_replaces_the_span_log(tmp_path):
+    first, second = tmp_path / "first.jsonl", tmp_path / "second.jsonl"
+    try:
+        instrumentation.configure(span_log=str(first))
+        instrumentation.configure(span_log=str(second))
+        instrumentation.configure(span_log=str(second))
+        with span("score"):
+            pass
+    finally:
+        instrumentation.configure()
+
+    assert first.read_text() == ""
+    assert len(second.read_text().splitlines()) == 1
+    assert instrumentation.logger.handlers == []
@@ -0,0 +1,157 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_regression
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.compact_model import compact_model
+from housing.forest_engine import FlatForest, compact_forest, compile_forest
+from housing.model_store import (
+    FLAT_MAX_ROWS,
+    FOREST_FILE,
+    RoutedForest,
+    load_forest,
+    load_model,
+    save_forest,
+    save_model,
+)
+
+
+@pytest.fixture
+def regression_data():
+    return make_regression(n_samples=500, n_features=8, noise=10.0, random_state=0)
+
+
+@pytest.mark.parametrize("bootstrap", [True, False])
+def test_mapped_forest_matches_sklearn(regression_data, tmp_path, bootstrap):
+    X, y = regression_data
+    model = RandomForestRegressor(
+        n_estimators=10, max_features=4, bootstrap=bootstrap, random_state=42
+    ).fit(X, y)
+    path = str(tmp_path / FOREST_FILE)
+
+    save_forest(model, path)
+    forest = load_forest(path)
+
+    np.testing.assert_allclose(forest.predict(X), model.predict(X), rtol=1e-12)
+    assert not forest.threshold.flags.owndata
+    assert not forest.threshold.flags.writeable
+
+
+def test_load_model_engines(regression_data, tmp_path):
+    X, y = regression_data
+    folder = str(tmp_path)
+    model = RandomForestRegressor(n_estimators=3, random_state=42).fit(X, y)
+    save_model(model, folder)
+
+    assert isinstance(load_model(folder), RandomForestRegressor)
+    assert isinstance(load_model(folder, "flat"), FlatForest)
+    routed = load_model(folder, "auto")
+    assert isinstance(routed, RoutedForest)
+    for rows in (1, FLAT_MAX_ROWS, FLAT_MAX_ROWS + 1, len(X)):
+        np.testing.assert_allclose(routed.predict(X[:rows]), model.predict(X[:rows]))
+    with pytest.raises(ValueError):
+        load_model(folder, "numba")
+
+    save_model(model, folder, {"value_dtype": "uint16"})
+    assert isinstance(load_model(folder, "auto"), FlatForest)
+
+    multi_output = RandomForestRegressor(n_estimators=3)
+    save_model(multi_output.fit(X, np.column_stack([y, y])), folder)
+    assert not os.path.exists(os.path.join(folder, FOREST_FILE))
+    assert isinstance(load_model(folder, "auto"), RandomForestRegressor)
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 5000])
+def test_flat_forest_matches_sklearn(regression_data, batch_size):
+    X, y = regression_data
+    model = RandomForestRegressor(n_estimators=30, random_state=42).fit(X, y)
+    forest = compile_forest(model)
+    batch = np.resize(X, (batch_size, X.shape[1]))
+
+    np.testing.assert_allclose(forest.predict(batch), model.predict(batch), rtol=1e-12)
+    np.testing.assert_array_equal(
+        forest.apply(batch) - forest.roots, model.apply(batch)
+    )
+
+
+def test_compact_forest_is_exact_without_quantization(regression_data):
+    X, y = regression_data
+    model = RandomForestRegressor(n_estimators=10, random_state=42).fit(X, y)
+    compact = compact_forest(compile_forest(model), value_dtype=None)
+
+    assert compact.threshold.dtype == np.float32
+    assert compact.feature.dtype == np.uint8
+    np.testing.assert_allclose(compact.predict(X), model.predict(X), rtol=1e-12)
+
+
+@pytest.mark.parametrize("value_dtype", ["uint8", "uint16"])
+def test_compact_forest_quantization_error(regression_data, tmp_path, value_dtype):
+    X, y = regression_data
+    model = RandomForestRegressor(n_estimators=10, random_state=42).fit(X, y)
+    path = str(tmp_path / FOREST_FILE)
+
+    save_forest(model, path, {"value_dtype": value_dtype})
+    forest = load_forest(path)
+
+    assert forest.value.dtype == np.dtype(value_dtype)
+    error = np.abs(forest.predict(X) - model.predict(X))
+    assert error.max() <= forest.value_scale / 2 + 1e-9
+
+
+def test_compact_forest_pruning_tolerance(regression_data):
+    X, y = regression_data
+    model = RandomForestRegressor(n_estimators=10, random_state=42).fit(X, y)
+    forest = compile_forest(model)
+    compact = compact_forest(forest, tolerance=20.0, value_dtype=None)
+
+    assert len(compact.value) < len(forest.value)
+    assert compact.max_depth <= forest.max_depth
+    error = np.abs(compact.predict(X) - model.predict(X))
+    assert error.max() <= 20.0 + 1e-9
+
+
+def test_compact_model_report(model_folder, housing, tmp_path):
+    test_file = str(tmp_path / "test.csv")
+    housing.iloc[1500:].to_csv(test_file, index=False)
+
+    report = compact_model(model_folder, test_file, tolerance=1000.0)
+
+    assert report["COMPACT_BYTES"] < report["FOREST_BYTES"]
+    assert report["MAX_ABS_DIFF"] <= 1000.0 + 10.0
+    assert abs(report["RMSE_DELTA"]) <= report["MAX_ABS_DIFF"] + 1e-9
+    assert load_model(model_folder, "flat").value.dtype == np.uint16
+    with open(os.path.join(model_folder, "compaction.txt")) as f:
+        assert f.read().startswith("TOLERANCE: 1000.0\nVALUE_DTYPE: uint16\n")
+
+
+def test_compact_model_dry_run_leaves_folder_untouched(model_folder, housing, tmp_path):
+    test_file = str(tmp_path / "test.csv")
+    housing.iloc[1500:].to_csv(test_file, index=False)
+    before = {
+        name: os.path.getmtime(os.path.join(model_folder, name))
+        for name in os.listdir(model_folder)
+    }
+
+    report = compact_model(
+        model_folder, test_file, tolerance=500.0, value_dtype="uint8", dry_run=True
+    )
+
+    assert report["TOLERANCE"] == 500.0 and report["VALUE_DTYPE"] == "uint8"
+    after = {
+        name: os.path.getmtime(os.path.join(model_folder, name))
+        for name in os.listdir(model_folder)
+    }
+    assert after == before
+
+
+def test_compact_model_rejects_other_models(model_folder, regression_data, tmp_path):
+    save_model(DecisionTreeRegressor(max_depth=3).fit(*regression_data), model_folder)
+
+    with pytest.raises(TypeError, match="DecisionTreeRegressor"):
+        compact_model(model_folder, str(tmp_path / "test.csv"))
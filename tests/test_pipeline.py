@@ -0,0 +1,153 @@
+import importlib.util
+import os
+import sys
+import threading
+from modulefinder import ModuleFinder
+
+import pytest
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "../src"))
+sys.path.insert(0, SRC)
+
+from housing.pipeline import PipelineRunner, Stage, housing_stages, main
+
+
+def copy_upper(source, target, calls, barrier=None):
+    calls.append(os.path.basename(target))
+    if barrier is not None:
+        barrier.wait()
+    with open(source) as f, open(target, "w") as g:
+        g.write(f.read().upper())
+
+
+@pytest.fixture
+def toy_pipeline(tmp_path):
+    calls = []
+    raw = tmp_path / "raw.txt"
+    raw.write_text("housing")
+
+    def stage(name, source, target, **params):
+        return Stage(
+            name,
+            copy_upper,
+            inputs=[source],
+            outputs=[target],
+            params={"source": source, "target": target, "calls": calls, **params},
+            code=[],
+            untracked=["calls", "barrier"],
+        )
+
+    def stages(**params):
+        return [
+            stage("prepare", str(raw), str(tmp_path / "prepared.txt")),
+            stage(
+                "score_a",
+                str(tmp_path / "prepared.txt"),
+                str(tmp_path / "a.txt"),
+                **params,
+            ),
+            stage(
+                "score_b",
+                str(tmp_path / "prepared.txt"),
+                str(tmp_path / "b.txt"),
+                **params,
+            ),
+        ]
+
+    return raw, calls, stages
+
+
+def test_runner_skips_current_stages(toy_pipeline, tmp_path):
+    raw, calls, stages = toy_pipeline
+    runner = PipelineRunner(str(tmp_path / "cache"))
+
+    assert runner.run(stages()) == {"prepare": True, "score_a": True, "score_b": True}
+    assert calls[0] == "prepared.txt"
+
+    calls.clear()
+    rerun = PipelineRunner(str(tmp_path / "cache")).run(stages())
+    assert rerun == {"prepare": False, "score_a": False, "score_b": False}
+    assert calls == []
+
+
+def test_runner_reruns_what_changed(toy_pipeline, tmp_path):
+    raw, calls, stages = toy_pipeline
+    runner = PipelineRunner(str(tmp_path / "cache"))
+    runner.run(stages())
+
+    os.remove(tmp_path / "b.txt")
+    assert runner.run(stages()) == {
+        "prepare": False,
+        "score_a": False,
+        "score_b": True,
+    }
+
+    raw.write_text("housing prices")
+    assert all(runner.run(stages()).values())
+    assert (tmp_path / "a.txt").read_text() == "HOUSING PRICES"
+
+    # An input change that leaves the upstream output identical stops there.
+    raw.write_text("HOUSING PRICES")
+    assert runner.run(stages()) == {
+        "prepare": True,
+        "score_a": False,
+        "score_b": False,
+    }
+
+
+def test_runner_runs_independent_stages_concurrently(toy_pipeline, tmp_path):
+    _, calls, stages = toy_pipeline
+    barrier = threading.Barrier(2, timeout=10)
+
+    results = PipelineRunner(str(tmp_path / "cache"), max_workers=2).run(
+        stages(barrier=barrier)
+    )
+
+    assert all(results.values())
+    assert not barrier.broken
+
+
+def test_housing_stages_fingerprint_the_modules_they_import(tmp_path):
+    # Logging and tracking do not change the outputs of a stage.
+    bookkeeping = {"housing", "housing.instrumentation", "housing.tracking"}
+    for stage in housing_stages(str(tmp_path), str(tmp_path), str(tmp_path)):
+        finder = ModuleFinder(path=[SRC])
+        finder.import_hook(stage.func.__module__)
+        imported = {
+            name
+            for name, module in finder.modules.items()
+            if (module.__file__ or "").startswith(SRC)
+        }
+        code = {importlib.util.resolve_name(name, "housing") for name in stage.code}
+        assert imported - bookkeeping <= code, stage.name
+
+
+@pytest.mark.parametrize(
+    "option, message",
+    [
+        (["--search", "gird"], "--search must be one of"),
+        (["--models", "tree", "--search", "grid"], "--search cannot be used"),
+        (["--models", "tree", "--checkpoint-dir", "ckpt"], "--checkpoint-dir cannot"),
+    ],
+)
+def test_main_rejects_bad_search_options_before_running(
+    option, message, tmp_path, capsys
+):
+    with pytest.raises(SystemExit):
+        main(["--data-folder", str(tmp_path), *option])
+
+    assert message in capsys.readouterr().err
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_bake_off_fingerprint_ignores_the_search(tmp_path):
+    runner = PipelineRunner(str(tmp_path))
+
+    def train_fingerprint(**params):
+        stages = housing_stages(str(tmp_path), str(tmp_path), str(tmp_path), **params)
+        return runner.fingerprint(stages[1])
+
+    bake_off = train_fingerprint(models=["linear", "tree"])
+    assert train_fingerprint(models=["linear", "tree"], search="random") == bake_off
+    assert train_fingerprint(models=["linear"]) != bake_off
+    assert train_fingerprint(search="random") != train_fingerprint()
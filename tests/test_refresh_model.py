@@ -0,0 +1,142 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from housing.features import LABEL_COLUMN, HousingFeatures, load_pipeline, save_pipeline
+from housing.model_store import MODEL_FILE, load_model, save_model
+from housing.refresh_model import refresh_model
+
+
+@pytest.fixture
+def splits(housing, tmp_path):
+    paths = {}
+    for name, rows in [
+        ("history", slice(0, 1500)),
+        ("new", slice(1500, 1800)),
+        ("holdout", slice(1800, None)),
+    ]:
+        paths[name] = str(tmp_path / f"{name}.csv")
+        housing.iloc[rows].to_csv(paths[name], index=False)
+    return paths
+
+
+def test_refresh_adds_trees_and_keeps_old_ones(model_folder, splits):
+    old = pd.read_pickle(os.path.join(model_folder, MODEL_FILE))
+
+    report = refresh_model(
+        model_folder, splits["new"], splits["history"], splits["holdout"], n_trees=3
+    )
+
+    model = pd.read_pickle(os.path.join(model_folder, MODEL_FILE))
+    assert report["TREES"] == len(model.estimators_) == 8
+    assert report["HISTORY_ROWS"] == 300
+    for before, after in zip(old.estimators_, model.estimators_):
+        np.testing.assert_array_equal(before.tree_.value, after.tree_.value)
+    X = load_pipeline(model_folder).transform(pd.read_csv(splits["holdout"]))
+    np.testing.assert_allclose(
+        load_model(model_folder, "flat").predict(X), model.predict(X)
+    )
+    assert os.path.exists(os.path.join(model_folder, "refresh.txt"))
+
+
+def test_refresh_dry_run_leaves_folder_untouched(model_folder, splits):
+    before = {
+        name: os.path.getmtime(os.path.join(model_folder, name))
+        for name in os.listdir(model_folder)
+    }
+
+    report = refresh_model(
+        model_folder, splits["new"], splits["history"], n_trees=3, dry_run=True
+    )
+
+    assert report["TREES"] == 8
+    after = {
+        name: os.path.getmtime(os.path.join(model_folder, name))
+        for name in os.listdir(model_folder)
+    }
+    assert after == before
+
+
+def test_refresh_retires_oldest_trees(model_folder, splits):
+    old = pd.read_pickle(os.path.join(model_folder, MODEL_FILE))
+
+    report = refresh_model(
+        model_folder,
+        splits["new"],
+        splits["history"],
+        splits["holdout"],
+        max_trees=5,
+        full_retrain=True,
+    )
+
+    model = pd.read_pickle(os.path.join(model_folder, MODEL_FILE))
+    assert report["ADDED_TREES"] == 1
+    assert report["RETIRED_TREES"] == 1 and model.n_estimators == 5
+    np.testing.assert_array_equal(
+        old.estimators_[1].tree_.value, model.estimators_[0].tree_.value
+    )
+    assert report["RMSE_VS_FULL_RETRAIN"] == pytest.approx(
+        report["RMSE"] - report["FULL_RETRAIN_RMSE"]
+    )
+
+
+def test_refresh_requires_tree_count_without_history(model_folder, splits):
+    with pytest.raises(ValueError):
+        refresh_model(model_folder, splits["new"])
+
+
+def test_refresh_with_spatial_features(housing, splits, tmp_path):
+    history = pd.read_csv(splits["history"])
+    labels = history[LABEL_COLUMN].to_numpy()
+    pipeline = HousingFeatures(n_neighbors=5)
+    model = RandomForestRegressor(n_estimators=5, random_state=42).fit(
+        pipeline.fit_transform(history, labels), labels
+    )
+    folder = str(tmp_path / "spatial")
+    save_pipeline(pipeline, folder)
+    save_model(model, folder)
+
+    report = refresh_model(
+        folder,
+        splits["new"],
+        splits["history"],
+        splits["holdout"],
+        n_trees=3,
+        full_retrain=True,
+    )
+
+    assert report["TREES"] == 8
+    assert report["RMSE"] < 2 * report["OLD_RMSE"]
+    assert np.isfinite(report["FULL_RETRAIN_RMSE"])
+
+
+def test_refresh_never_reuses_tree_seeds(model_folder, splits):
+    for _ in range(3):
+        refresh_model(model_folder, splits["new"], n_trees=2, max_trees=5)
+
+    model = pd.read_pickle(os.path.join(model_folder, MODEL_FILE))
+    seeds = [tree.random_state for tree in model.estimators_]
+    assert len(set(seeds)) == len(seeds) == model.n_estimators == 5
+
+
+def test_refresh_rejects_other_models(housing, splits, tmp_path):
+    folder = str(tmp_path / "linear")
+    pipeline = HousingFeatures()
+    save_pipeline(pipeline, folder)
+    save_model(
+        LinearRegression().fit(
+            pipeline.fit_transform(housing), housing[LABEL_COLUMN].to_numpy()
+        ),
+        folder,
+    )
+
+    with pytest.raises(TypeError, match="LinearRegression"):
+        refresh_model(folder, splits["new"], n_trees=3)
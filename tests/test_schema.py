@@ -0,0 +1,72 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.features import CATEGORY_FEATURES, FEATURE_COLUMNS, HousingFeatures
+from housing.schema import (
+    HOUSING_COLUMNS,
+    NUMERIC_COLUMNS,
+    OCEAN_PROXIMITY,
+    SchemaError,
+    conform,
+    read_housing,
+)
+from housing.storage import write_frame
+
+
+@pytest.fixture
+def housing_file(housing, tmp_path):
+    path = str(tmp_path / "housing.csv")
+    housing.to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_read_housing_uses_compact_dtypes(housing, tmp_path, file_format):
+    path = str(tmp_path / f"housing.{file_format}")
+    write_frame(housing.astype({column: "float64" for column in NUMERIC_COLUMNS}), path)
+
+    frame = read_housing(path)
+
+    assert list(frame.columns) == HOUSING_COLUMNS
+    assert (frame[NUMERIC_COLUMNS].dtypes == np.float32).all()
+    assert list(frame["ocean_proximity"].cat.categories) == OCEAN_PROXIMITY
+    assert (
+        frame["total_bedrooms"].isna().sum() == housing["total_bedrooms"].isna().sum()
+    )
+
+
+def test_read_housing_rejects_a_missing_column(housing, tmp_path):
+    path = str(tmp_path / "housing.csv")
+    housing.drop(columns="median_income").to_csv(path, index=False)
+
+    with pytest.raises(SchemaError, match="median_income"):
+        read_housing(path, columns=None)
+
+
+def test_conform_rejects_bad_values(housing):
+    unknown = housing.astype({"ocean_proximity": object})
+    unknown.loc[0, "ocean_proximity"] = "ON THE MOON"
+    with pytest.raises(SchemaError, match="ON THE MOON"):
+        conform(unknown)
+
+    text = housing.astype({"population": object})
+    text.loc[0, "population"] = "many"
+    with pytest.raises(SchemaError, match="population"):
+        conform(text)
+
+
+def test_features_one_hot_ocean_proximity(housing_file):
+    housing = read_housing(housing_file)
+
+    prepared = HousingFeatures().fit_transform(housing)
+
+    one_hot = prepared[:, [FEATURE_COLUMNS.index(f) for f in CATEGORY_FEATURES]]
+    expected = pd.get_dummies(housing["ocean_proximity"], dtype=np.float32)
+    np.testing.assert_array_equal(one_hot, expected.to_numpy())
+    assert prepared.dtype == np.float32
@@ -0,0 +1,114 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from mlflow.tracking import MlflowClient
+from sklearn.metrics import r2_score
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.features import (
+    FEATURE_COLUMNS,
+    LABEL_COLUMN,
+    HousingFeatures,
+    load_predictor,
+)
+from housing.score import StreamingMetrics, bulk_score, score_model
+from housing.tracking import Tracker
+
+
+@pytest.fixture
+def test_file(housing, tmp_path):
+    path = str(tmp_path / "test.csv")
+    housing.iloc[1500:].to_csv(path, index=False)
+    return path
+
+
+def test_pipeline_transform_uses_training_medians(housing):
+    features = housing.drop(LABEL_COLUMN, axis=1)
+    pipeline = HousingFeatures().fit(features)
+    batch = features.iloc[:10].copy()
+    batch["total_bedrooms"] = np.nan
+
+    prepared = pipeline.transform(batch)
+
+    assert prepared.shape == (10, len(FEATURE_COLUMNS))
+    assert not np.isnan(prepared).any()
+    bedrooms = prepared[:, FEATURE_COLUMNS.index("total_bedrooms")]
+    assert (bedrooms == np.float32(features["total_bedrooms"].median())).all()
+
+
+def test_pipeline_matches_pandas_features(housing):
+    features = housing.drop([LABEL_COLUMN, "ocean_proximity"], axis=1)
+    expected = features.assign(
+        rooms_per_household=features["total_rooms"] / features["households"],
+        bedrooms_per_room=features["total_bedrooms"] / features["total_rooms"],
+        population_per_household=features["population"] / features["households"],
+    )
+    expected = expected.fillna(expected.median())
+    expected = expected.join(
+        pd.get_dummies(
+            housing["ocean_proximity"], prefix="ocean_proximity", dtype=float
+        )
+    )
+
+    prepared = HousingFeatures(dtype="float64").fit_transform(housing)
+
+    np.testing.assert_allclose(prepared, expected[FEATURE_COLUMNS].to_numpy())
+
+
+def test_score_model(model_folder, test_file, tmp_path):
+    store_uri = (tmp_path / "mlruns").as_uri()
+    tracker = Tracker(store_uri, spool_dir=str(tmp_path / "spool"))
+    output_folder = str(tmp_path / "scores")
+
+    with tracker.start_run("Test") as run:
+        score_model(model_folder, test_file, output_folder, run=run)
+    tracker.close()
+
+    with open(os.path.join(output_folder, "scores.txt")) as f:
+        assert f.read().startswith("RMSE: ")
+    (scoring_run,) = MlflowClient(store_uri).search_runs(
+        ["0"], "attributes.run_name = 'Model Scoring'"
+    )
+    assert "RMSE" in scoring_run.data.metrics
+    assert "score.predict.wall_seconds" in scoring_run.data.metrics
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_bulk_score_matches_in_memory(model_folder, test_file, tmp_path, n_jobs):
+    predictions_file = str(tmp_path / "predictions.csv")
+
+    metrics = bulk_score(
+        model_folder, test_file, predictions_file, chunksize=64, n_jobs=n_jobs
+    )
+
+    test_set = pd.read_csv(test_file)
+    expected = load_predictor(model_folder)(test_set)
+    predictions = pd.read_csv(predictions_file)["prediction"].to_numpy()
+    np.testing.assert_allclose(predictions, expected)
+    errors = test_set[LABEL_COLUMN] - expected
+    assert np.isclose(metrics.rmse, np.sqrt((errors**2).mean()))
+    assert np.isclose(metrics.r2, r2_score(test_set[LABEL_COLUMN], expected))
+
+
+def test_streaming_metrics_skip_empty_chunks():
+    y_true, y_pred = np.array([1.0, 2.0, 4.0, 7.0]), np.array([1.5, 2.0, 3.0, 7.5])
+    metrics = StreamingMetrics()
+
+    metrics.update(y_true[:0], y_pred[:0])
+    metrics.update(y_true[:2], y_pred[:2])
+    metrics.update(y_true[2:2], y_pred[2:2])
+    metrics.update(y_true[2:], y_pred[2:])
+
+    assert metrics.rows == 4
+    assert np.isclose(metrics.rmse, np.sqrt(((y_true - y_pred) ** 2).mean()))
+    assert np.isclose(metrics.r2, r2_score(y_true, y_pred))
+
+    constant = StreamingMetrics()
+    constant.update([3.0], [2.0])
+    constant.update([3.0, 3.0], [3.0, 5.0])
+    assert np.isclose(constant.rmse, np.sqrt(5 / 3))
+    assert np.isnan(constant.as_dict()["R2"])
@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.features import load_pipeline
+from housing.model_store import MODEL_FILE
+from housing.serve import make_server
+
+
+@pytest.fixture
+def server_url(model_folder):
+    server = make_server(model_folder, port=0, max_batch_size=64, max_wait=0.05)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    server.batcher.close()
+
+
+def post(url, body, content_type="application/json"):
+    request = urllib.request.Request(
+        url + "/predict", data=body, headers={"Content-Type": content_type}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["predictions"]
+
+
+def test_concurrent_requests_are_batched(server_url, model_folder, housing):
+    rows = housing.iloc[1500:1540]
+    model = pd.read_pickle(os.path.join(model_folder, MODEL_FILE))
+    expected = model.predict(load_pipeline(model_folder).transform(rows))
+    bodies = [json.dumps([row]).encode() for row in rows.to_dict(orient="records")]
+
+    with ThreadPoolExecutor(max_workers=len(bodies)) as pool:
+        predictions = list(pool.map(lambda body: post(server_url, body), bodies))
+
+    np.testing.assert_allclose(np.concatenate(predictions), expected)
+    with urllib.request.urlopen(server_url + "/metrics") as response:
+        metrics = json.loads(response.read())
+    assert metrics["requests"] == len(bodies)
+    assert metrics["batches"] < len(bodies)
+    assert metrics["latency_p99_ms"] > 0
+
+
+def test_jsonl_request(server_url, housing):
+    rows = housing.iloc[:3].to_dict(orient="records")
+    body = "\n".join(json.dumps(row) for row in rows).encode()
+
+    assert len(post(server_url, body, "application/x-ndjson")) == 3
+
+
+def test_invalid_rows_are_rejected(server_url):
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        post(server_url, json.dumps([{"longitude": -122.0}]).encode())
+
+    assert excinfo.value.code == 400
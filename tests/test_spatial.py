@@ -0,0 +1,161 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.neighbors import NearestNeighbors
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.features import FEATURE_COLUMNS, LABEL_COLUMN, HousingFeatures
+from housing.spatial import SpatialNeighbors
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    longitude = rng.uniform(-124, -114, 600)
+    latitude = rng.uniform(32, 42, 600)
+    income = rng.uniform(0, 15, 600)
+    labels = 1000 * income + rng.normal(0, 100, 600)
+    return longitude, latitude, income, labels
+
+
+def test_neighbor_features_match_brute_force(points):
+    longitude, latitude, income, labels = points
+    neighbors = SpatialNeighbors(n_neighbors=5, batch_size=64)
+
+    features = neighbors.fit_transform(longitude, latitude, income, labels)
+    new = neighbors.transform(longitude[:50] + 0.01, latitude[:50])
+
+    projected = neighbors._project(longitude, latitude)
+    brute = NearestNeighbors(n_neighbors=5, algorithm="brute").fit(projected)
+    # A training row is described among the other rows.
+    _, indices = brute.kneighbors()
+    np.testing.assert_allclose(features[:, 0], income[indices].mean(axis=1))
+    _, indices = brute.kneighbors(
+        neighbors._project(longitude[:50] + 0.01, latitude[:50])
+    )
+    np.testing.assert_allclose(new[:, 0], income[indices].mean(axis=1))
+    np.testing.assert_allclose(new[:, 2], labels[indices].mean(axis=1))
+    assert neighbors.feature_names[-1] == "neighbor_target_mean"
+
+
+def test_repeated_locations_are_indexed_once(points):
+    longitude, latitude, income, _ = points
+    repeated = np.r_[np.arange(600), np.zeros(9, dtype=int)]
+    neighbors = SpatialNeighbors(n_neighbors=5)
+
+    features = neighbors.fit_transform(
+        longitude[repeated], latitude[repeated], income[repeated]
+    )
+
+    assert neighbors.tree_.data.shape == (600, 2)
+    assert neighbors.counts_.sum() == 609
+    np.testing.assert_array_equal(features[600:], features[[0] * 9])
+    # A new row at location 0 also counts the row a training row leaves out.
+    assert neighbors.transform(longitude[:1], latitude[:1])[0, 1] > features[0, 1]
+
+
+@pytest.mark.parametrize("row", [0, 1])
+def test_training_rows_match_new_rows(points, row):
+    # Row 0 shares its location with the 9 repeated rows, row 1 is alone.
+    longitude, latitude, income, _ = points
+    repeated = np.r_[np.arange(600), np.zeros(9, dtype=int)]
+    longitude, latitude = longitude[repeated], latitude[repeated]
+    income = income[repeated] + np.arange(609)
+    others = np.arange(609) != row
+
+    fitted = SpatialNeighbors(n_neighbors=5).fit_transform(longitude, latitude, income)
+    without = SpatialNeighbors(n_neighbors=5)
+    without.fit_transform(longitude[others], latitude[others], income[others])
+    new = without.transform(longitude[[row]], latitude[[row]])
+
+    np.testing.assert_allclose(fitted[row, 0], new[0, 0])
+    np.testing.assert_allclose(fitted[row, 1], new[0, 1], rtol=1e-3)
+
+
+def test_target_mean_is_out_of_fold(points):
+    longitude, latitude, income, labels = points
+    leaked = labels.copy()
+    leaked[0] = 1e9
+
+    features = SpatialNeighbors(n_neighbors=5).fit_transform(
+        longitude, latitude, income, leaked
+    )
+
+    assert features[0, 2] < 1e6
+
+
+def test_fold_target_mean_ignores_held_out_labels(points):
+    longitude, latitude, income, labels = points
+    train, held_out = np.arange(450), np.arange(450, 600)
+    neighbors = SpatialNeighbors(n_neighbors=5)
+    neighbors.fit_transform(longitude, latitude, income, labels)
+    changed = labels.copy()
+    changed[held_out] = 1e9
+
+    target_mean = neighbors.fold_target_mean(
+        longitude, latitude, income, changed, train
+    )
+
+    fold = SpatialNeighbors(n_neighbors=5)
+    fitted = fold.fit_transform(
+        longitude[train], latitude[train], income[train], labels[train]
+    )
+    np.testing.assert_allclose(target_mean[train], fitted[:, 2])
+    np.testing.assert_allclose(
+        target_mean[held_out],
+        fold.transform(longitude[held_out], latitude[held_out])[:, 2],
+    )
+    assert target_mean.max() < 1e6
+
+
+def test_pipeline_saves_spatial_index(housing):
+    features = housing.drop(LABEL_COLUMN, axis=1)
+    pipeline = HousingFeatures(n_neighbors=8).fit(features, housing[LABEL_COLUMN])
+
+    prepared = pipeline.transform(features.iloc[:10])
+
+    assert prepared.shape == (10, len(FEATURE_COLUMNS) + 3)
+    assert list(pipeline.get_feature_names_out()[-3:]) == [
+        "neighbor_median_income",
+        "neighbor_density",
+        "neighbor_target_mean",
+    ]
+    assert prepared.flags.f_contiguous and not np.isnan(prepared).any()
+
+
+def test_training_transform_rebuilds_fit_features(housing):
+    features = housing.drop(LABEL_COLUMN, axis=1)
+    labels = housing[LABEL_COLUMN].to_numpy()
+    pipeline = HousingFeatures(n_neighbors=8)
+
+    fitted = pipeline.fit_transform(features, labels)
+
+    np.testing.assert_array_equal(pipeline.training_transform(features, labels), fitted)
+    assert not np.array_equal(pipeline.transform(features)[:, -1], fitted[:, -1])
+
+
+def test_fold_features_replace_the_target_mean(housing):
+    features = housing.drop(LABEL_COLUMN, axis=1)
+    labels = housing[LABEL_COLUMN].to_numpy()
+    pipeline = HousingFeatures(n_neighbors=8)
+    fitted = pipeline.fit_transform(features, labels)
+    train, test = np.arange(1500), np.arange(1500, len(labels))
+
+    column = pipeline.fold_features(fitted, labels)(train, test)
+
+    expected = pipeline.neighbors_.fold_target_mean(
+        fitted[:, FEATURE_COLUMNS.index("longitude")],
+        fitted[:, FEATURE_COLUMNS.index("latitude")],
+        fitted[:, FEATURE_COLUMNS.index("median_income")],
+        labels,
+        train,
+    )
+    assert column.shape == (len(labels), 1) and column.dtype == fitted.dtype
+    np.testing.assert_allclose(column[:, 0], expected, rtol=1e-6)
+    assert (
+        HousingFeatures(n_neighbors=8).fit(features).fold_features(fitted, labels)
+        is None
+    )
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "../src"))
+
+CLI_MODULES = ["housing.ingest_data", "housing.train", "housing.score"]
+HEAVY_MODULES = ["mlflow", "sklearn", "pandas", "numpy", "joblib", "pyarrow"]
+IMPORT_BUDGET_SECONDS = 0.2
+
+
+def run_python(code):
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def cumulative_import_time(stderr, module):
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    raise AssertionError(f"{module} not found in the import profile")
+
+
+@pytest.mark.parametrize("module", CLI_MODULES)
+def test_cli_import_time_budget(module):
+    result = run_python(
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+
+    assert result.stdout.split() == []
+    assert cumulative_import_time(result.stderr, module) < IMPORT_BUDGET_SECONDS
+
+
+@pytest.mark.parametrize("module", CLI_MODULES)
+def test_cli_help_skips_heavy_imports(module):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}\n"
+            "try:\n"
+            f"    {module}.main(['--help'])\n"
+            "except SystemExit:\n"
+            f"    print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert "usage:" in result.stdout
+    assert result.stdout.splitlines()[-1].split() == []
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.ingest_data import load_housing_data, prepare_data
+from housing.storage import read_frame
+from housing.synthetic_data import (
+    HOUSING_ROWS,
+    MEDIAN_HOUSE_VALUE_CAP,
+    synthesize_housing,
+    write_synthetic_housing,
+)
+
+TEST_HOUSING_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "raw")
+
+
+def test_synthesize_housing_follows_the_real_data():
+    source = load_housing_data(TEST_HOUSING_PATH)
+    synthetic = synthesize_housing(source, 50_000, np.random.default_rng(0))
+
+    assert list(synthetic.columns) == list(source.columns)
+    assert (synthetic.dtypes == source.dtypes).all()
+    assert len(synthetic) == 50_000
+    assert set(synthetic["ocean_proximity"]) <= set(source["ocean_proximity"])
+    assert synthetic["total_bedrooms"].isna().any()
+    assert synthetic.drop(columns="total_bedrooms").notna().all().all()
+    assert synthetic["median_house_value"].max() == MEDIAN_HOUSE_VALUE_CAP
+    assert synthetic["housing_median_age"].between(1, 52).all()
+    for column in ("median_income", "median_house_value"):
+        assert abs(synthetic[column].mean() / source[column].mean() - 1) < 0.05
+
+
+def test_synthesize_housing_is_deterministic():
+    source = load_housing_data(TEST_HOUSING_PATH)
+    first = synthesize_housing(source, 100, np.random.default_rng(7))
+    second = synthesize_housing(source, 100, np.random.default_rng(7))
+
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_synthetic_data_can_be_prepared(tmp_path):
+    raw = str(tmp_path / "raw")
+    path = write_synthetic_housing(raw, 0.5, chunksize=4000)
+
+    assert len(pd.read_csv(path)) == int(0.5 * HOUSING_ROWS)
+
+    prepare_data(str(tmp_path), housing_url=None, housing_path=raw)
+    train = read_frame(os.path.join(tmp_path, "processed", "train.csv"))
+    test = read_frame(os.path.join(tmp_path, "processed", "test.csv"))
+    assert len(train) + len(test) == int(0.5 * HOUSING_ROWS)
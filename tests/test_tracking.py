@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+from mlflow.tracking import MlflowClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from housing.tracking import SPOOL_FILE, Tracker, close_tracker, get_tracker
+
+
+class UnreachableClient:
+    """Stub client whose every call stalls and then fails."""
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            time.sleep(0.2)
+            raise ConnectionError("tracking server is down")
+
+        return call
+
+
+@pytest.fixture
+def store_uri(tmp_path):
+    return (tmp_path / "mlruns").as_uri()
+
+
+def log_runs(tracker, artifact):
+    with tracker.start_run("Parent") as parent:
+        parent.log_params({"search": "grid", "n_jobs": 4})
+        with tracker.start_run("Child", parent=parent) as child:
+            for step in range(3):
+                child.log_metrics({"rmse": 10.0 - step}, step=step)
+            child.log_artifact(artifact)
+
+
+def assert_logged(store_uri):
+    client = MlflowClient(store_uri)
+    runs = {run.info.run_name: run for run in client.search_runs(["0"])}
+    parent, child = runs["Parent"], runs["Child"]
+
+    assert parent.data.params == {"search": "grid", "n_jobs": "4"}
+    assert child.data.tags["mlflow.parentRunId"] == parent.info.run_id
+    assert [m.value for m in client.get_metric_history(child.info.run_id, "rmse")] == [
+        10.0,
+        9.0,
+        8.0,
+    ]
+    assert [a.path for a in client.list_artifacts(child.info.run_id)] == ["scores.txt"]
+    assert {run.info.status for run in runs.values()} == {"FINISHED"}
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "scores.txt"
+    path.write_text("RMSE: 1.0\n")
+    return str(path)
+
+
+def test_tracker_logs_to_file_store(store_uri, artifact, tmp_path):
+    tracker = Tracker(store_uri, spool_dir=str(tmp_path / "spool"), flush_interval=0.01)
+    log_runs(tracker, artifact)
+    tracker.close()
+
+    assert_logged(store_uri)
+    assert not os.path.exists(tmp_path / "spool" / SPOOL_FILE)
+
+
+def test_close_tracker_delivers_the_default_tracker(store_uri, artifact, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", store_uri)
+    tracker = get_tracker()
+    log_runs(tracker, artifact)
+
+    close_tracker()
+
+    assert_logged(store_uri)
+    assert get_tracker() is not tracker
+    close_tracker()
+
+
+def test_tracker_spools_and_replays(store_uri, artifact, tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    tracker = Tracker(spool_dir=spool_dir, client=UnreachableClient())
+
+    start = time.perf_counter()
+    log_runs(tracker, artifact)
+    assert time.perf_counter() - start < 0.1
+    tracker.close()
+    os.remove(artifact)
+
+    assert os.path.exists(os.path.join(spool_dir, SPOOL_FILE))
+    replayed = Tracker(store_uri, spool_dir=spool_dir).replay()
+
+    assert replayed == 9
+    assert_logged(store_uri)
+    assert not os.path.exists(os.path.join(spool_dir, SPOOL_FILE))
+
+
+def test_tracker_keeps_spooling_after_a_failed_event(artifact, tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    tracker = Tracker(spool_dir=spool_dir, client=UnreachableClient())
+
+    with tracker.start_run("Scoring") as run:
+        run.log_artifact(str(tmp_path / "deleted.txt"))
+        run.log_metrics({"rmse": 1.0})
+    assert tracker.flush(timeout=5)
+    with tracker.start_run("Again"):
+        pass
+    assert tracker.flush(timeout=5)
+    tracker.close()
+
+    with open(os.path.join(spool_dir, SPOOL_FILE)) as f:
+        kinds = [json.loads(line)["type"] for line in f]
+    assert kinds == ["start_run", "metrics", "end_run", "start_run", "end_run"]
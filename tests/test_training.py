@@ -1,24 +1,339 @@
 import os
 import sys
 
+import numpy as np
+import pandas as pd
 import pytest
+from sklearn.datasets import make_regression
+from sklearn.ensemble import RandomForestRegressor
+from scipy.stats import randint
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import GridSearchCV, ParameterGrid, RandomizedSearchCV
+from sklearn.tree import DecisionTreeRegressor
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
-from train import train_model
+from housing import search
+from housing.search import (
+    _is_beaten,
+    _SharedArrays,
+    adaptive_search,
+    bake_off,
+    grid_search,
+    halving_search,
+    random_search,
+)
+from housing.tracking import Tracker
+from housing.train import LEADERBOARD_FILE, main, train_model
+
+PARAM_GRID = [
+    {"n_estimators": [3, 10], "max_features": [2, 4]},
+    {"bootstrap": [False], "n_estimators": [3], "max_features": [2, 3]},
+]
 
 
 @pytest.fixture
-def sample_train_data_path():
-    return os.path.join(os.path.dirname(__file__), "..", "data", "processed/train.csv")
+def regression_data():
+    return make_regression(n_samples=300, n_features=6, noise=10.0, random_state=0)
 
 
-@pytest.fixture
-def sample_output_folder():
-    return os.path.join(os.path.dirname(__file__), "..", "artifacts")
+def test_train_model(housing, tmp_path):
+    train_file = str(tmp_path / "train.csv")
+    housing.to_csv(train_file, index=False)
+    output_folder = str(tmp_path / "artifacts")
+    tracker = Tracker((tmp_path / "mlruns").as_uri(), spool_dir=str(tmp_path / "spool"))
 
+    with tracker.start_run("Test") as run:
+        train_model(train_file, output_folder, run=run)
+    tracker.close()
 
-def test_train_model(sample_train_data_path, sample_output_folder):
-    train_model(sample_train_data_path, sample_output_folder)
-    model_path = os.path.join(sample_output_folder, "best_model.pkl")
+    model_path = os.path.join(output_folder, "best_model.pkl")
     assert os.path.exists(model_path), f"Expected model file {model_path} not found"
+
+
+def test_grid_search_matches_gridsearchcv(regression_data):
+    X, y = regression_data
+    forest = RandomForestRegressor(random_state=42)
+    expected = GridSearchCV(
+        forest, PARAM_GRID, cv=5, scoring="neg_mean_squared_error"
+    ).fit(X, y)
+
+    result = grid_search(forest, PARAM_GRID, X, y, cv=5, n_jobs=2)
+
+    assert result.best_params_ == expected.best_params_
+    assert np.isclose(result.best_score_, expected.best_score_)
+    np.testing.assert_allclose(
+        result.cv_results_["mean_test_score"],
+        expected.cv_results_["mean_test_score"],
+    )
+
+
+def test_warm_start_matches_separate_fits(regression_data):
+    X, y = regression_data
+    forest = RandomForestRegressor(random_state=42)
+    grid = {"n_estimators": [3, 10, 30], "max_features": [2, 4]}
+
+    warm = grid_search(forest, grid, X, y, warm_start=True)
+    cold = grid_search(forest, grid, X, y, warm_start=False)
+
+    assert warm.cv_results_["params"] == cold.cv_results_["params"]
+    assert warm.cv_results_["mean_test_score"] == cold.cv_results_["mean_test_score"]
+
+
+def test_halving_search_promotes_to_full_data(regression_data):
+    X, y = regression_data
+    result = halving_search(
+        RandomForestRegressor(random_state=42), PARAM_GRID, X, y, factor=2
+    )
+
+    assert max(result.cv_results_["n_resources"]) == len(y)
+    assert result.cv_results_["iter"].count(0) == 6
+    assert result.best_params_ in result.cv_results_["params"]
+
+
+def test_halving_search_is_the_same_in_parallel(regression_data):
+    X, y = regression_data
+    forest = RandomForestRegressor(random_state=42)
+
+    serial = halving_search(forest, PARAM_GRID, X, y, factor=2, n_jobs=1)
+    parallel = halving_search(forest, PARAM_GRID, X, y, factor=2, n_jobs=2)
+
+    assert parallel.cv_results_ == serial.cv_results_
+
+
+def test_shared_arrays_are_read_only_memmaps(regression_data):
+    X, _ = regression_data
+    with _SharedArrays(n_jobs=2) as shared:
+        shared_X = shared.share(X)
+        ((train, test),) = shared.share_folds([(np.arange(200), np.arange(200, 300))])
+
+        assert isinstance(shared_X, np.memmap) and not shared_X.flags.writeable
+        np.testing.assert_array_equal(shared_X, X)
+        assert train.dtype == np.int32 and isinstance(test, np.memmap)
+    assert not os.path.exists(shared.folder)
+
+    with _SharedArrays(n_jobs=1) as shared:
+        assert shared.share(X) is X
+
+
+def test_search_resumes_from_checkpoint(regression_data, tmp_path, monkeypatch):
+    X, y = regression_data
+    forest = RandomForestRegressor(random_state=42)
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    # The workers get memory-mapped folds, which must not change the keys
+    # when the search is resumed in a single process.
+    full = grid_search(
+        forest, PARAM_GRID, X, y, n_jobs=2, checkpoint_dir=checkpoint_dir
+    )
+
+    # Simulate a search killed while writing its sixth fit.
+    (path,) = (tmp_path / "checkpoints").iterdir()
+    lines = path.read_text().splitlines(keepends=True)
+    path.write_text("".join(lines[:5]) + lines[5][:10])
+    fits = []
+    fit_and_score = search._fit_and_score
+
+    def counting_fit_and_score(*args):
+        fits.append(args)
+        return fit_and_score(*args)
+
+    monkeypatch.setattr(search, "_fit_and_score", counting_fit_and_score)
+    resumed = grid_search(forest, PARAM_GRID, X, y, checkpoint_dir=checkpoint_dir)
+
+    assert len(fits) == len(lines) - 5
+    assert resumed.cv_results_ == full.cv_results_
+    assert resumed.best_params_ == full.best_params_
+    np.testing.assert_array_equal(
+        resumed.best_estimator_.predict(X), full.best_estimator_.predict(X)
+    )
+
+    fits.clear()
+    grid_search(forest, PARAM_GRID, X, y, checkpoint_dir=checkpoint_dir)
+    assert fits == []
+
+    grid_search(forest, PARAM_GRID, X, y + 1, checkpoint_dir=checkpoint_dir)
+    assert len(fits) == len(lines)
+
+
+PARAM_DISTRIBUTIONS = {"n_estimators": randint(1, 30), "max_features": randint(1, 7)}
+
+
+def test_random_search_matches_randomizedsearchcv(regression_data):
+    X, y = regression_data
+    forest = RandomForestRegressor(random_state=42)
+    expected = RandomizedSearchCV(
+        forest,
+        PARAM_DISTRIBUTIONS,
+        n_iter=6,
+        cv=5,
+        scoring="neg_mean_squared_error",
+        random_state=0,
+    ).fit(X, y)
+
+    result = random_search(forest, PARAM_DISTRIBUTIONS, X, y, n_iter=6, random_state=0)
+
+    assert result.cv_results_["params"] == expected.cv_results_["params"]
+    np.testing.assert_allclose(
+        result.cv_results_["mean_test_score"],
+        expected.cv_results_["mean_test_score"],
+    )
+    assert result.best_params_ == expected.best_params_
+
+
+def test_is_beaten_needs_consistent_fold_differences():
+    reference = np.array([-10.0, -20.0, -30.0])
+
+    assert not _is_beaten(np.array([-11.0]), reference[:1], z=2.0)
+    assert _is_beaten(np.array([-11.0, -21.0, -31.5]), reference, z=2.0)
+    assert not _is_beaten(np.array([-15.0, -15.0, -31.0]), reference, z=2.0)
+
+
+def test_adaptive_search_stops_losing_candidates(regression_data):
+    X, y = regression_data
+    result = adaptive_search(
+        RandomForestRegressor(random_state=42), PARAM_DISTRIBUTIONS, X, y, n_iter=12
+    )
+
+    results = result.cv_results_
+    assert len(results["params"]) == 12
+    assert len({repr(sorted(p.items())) for p in results["params"]}) == 12
+    assert min(results["n_folds"]) < 5
+    complete = [
+        score
+        for score, n in zip(results["mean_test_score"], results["n_folds"])
+        if n == 5
+    ]
+    assert result.best_score_ == max(complete)
+    assert result.best_params_ in results["params"]
+
+
+def test_search_respects_cpu_budget(regression_data):
+    X, y = regression_data
+    result = adaptive_search(
+        RandomForestRegressor(random_state=42),
+        PARAM_DISTRIBUTIONS,
+        X,
+        y,
+        n_iter=50,
+        cpu_budget=1e-9,
+    )
+
+    assert len(result.cv_results_["params"]) == 5
+    assert hasattr(result.best_estimator_, "estimators_")
+
+
+def test_search_respects_time_budget(regression_data):
+    X, y = regression_data
+    result = grid_search(
+        RandomForestRegressor(random_state=42), PARAM_GRID, X, y, time_budget=1e-9
+    )
+
+    assert len(result.cv_results_["params"]) < 6
+    assert hasattr(result.best_estimator_, "estimators_")
+
+
+def test_bake_off_cuts_candidates_behind_the_baseline(regression_data):
+    X, y = regression_data
+    families = [
+        ("linear", LinearRegression(), [{}]),
+        (
+            "tree",
+            DecisionTreeRegressor(random_state=42),
+            [{"max_depth": depth} for depth in (1, 2, 4, 8)],
+        ),
+        ("forest", RandomForestRegressor(random_state=42), [{"n_estimators": 5}]),
+    ]
+
+    result = bake_off(families, X, y)
+
+    board = result.leaderboard_
+    assert result.best_model_ == "linear"
+    assert isinstance(result.best_estimator_, LinearRegression)
+    assert board[0]["model"] == "linear" and board[0]["status"] == "complete"
+    assert len(board) == 6
+    cut = [entry for entry in board if entry["status"] == "cut"]
+    assert cut and all(entry["n_folds"] < 5 for entry in cut)
+    assert all(entry["fit_seconds"] > 0 for entry in board)
+    assert all(entry["predict_us_per_row"] > 0 for entry in board)
+
+
+def test_bake_off_shares_one_pool_across_families(regression_data):
+    X, y = regression_data
+    families = [
+        ("linear", LinearRegression(), [{}]),
+        ("forest", RandomForestRegressor(random_state=42), [{"n_estimators": 5}]),
+    ]
+
+    result = bake_off(families, X, y, n_jobs=2)
+
+    assert result.best_model_ == "linear"
+    assert [entry["model"] for entry in result.leaderboard_][0] == "linear"
+    assert result.leaderboard_[0]["n_folds"] == 5
+    with pytest.raises(ValueError, match="at least one candidate"):
+        bake_off([], X, y)
+
+
+@pytest.mark.parametrize(
+    "models, message", [([], "must name some"), (["linear", "svm"], "svm")]
+)
+def test_train_model_rejects_bad_models(models, message, tmp_path):
+    with pytest.raises(ValueError, match=message):
+        train_model(str(tmp_path / "train.csv"), str(tmp_path), models=models)
+
+
+def test_searches_recompute_fold_features(regression_data):
+    X, y = regression_data
+    # The last column is the label, which a model fitted on it predicts
+    # unless each fold hides it from the held-out rows.
+    leaky = np.column_stack([X, y])
+
+    def fold_features(train_index, test_index):
+        return np.zeros((len(y), 1))
+
+    tree = DecisionTreeRegressor(random_state=42)
+    grid = {"max_depth": [4, 8]}
+    leaked = grid_search(tree, grid, leaky, y)
+    honest = grid_search(tree, grid, leaky, y, n_jobs=2, fold_features=fold_features)
+    expected = grid_search(tree, grid, np.column_stack([X, np.zeros(len(y))]), y)
+
+    assert honest.cv_results_ == expected.cv_results_
+    assert leaked.best_score_ > 10 * honest.best_score_
+    result = bake_off(
+        [("tree", tree, list(ParameterGrid(grid)))],
+        leaky,
+        y,
+        fold_features=fold_features,
+    )
+    assert result.best_score_ == expected.best_score_
+
+
+def test_train_model_bake_off(housing, tmp_path):
+    train_file = str(tmp_path / "train.csv")
+    housing.to_csv(train_file, index=False)
+    output_folder = str(tmp_path / "artifacts")
+    tracker = Tracker((tmp_path / "mlruns").as_uri(), spool_dir=str(tmp_path / "spool"))
+
+    with tracker.start_run("Test") as run:
+        train_model(train_file, output_folder, models=["tree", "linear"], run=run)
+    tracker.close()
+
+    leaderboard = pd.read_csv(os.path.join(output_folder, LEADERBOARD_FILE))
+    assert set(leaderboard["model"]) == {"linear", "tree"}
+    assert (
+        leaderboard["rmse"].iloc[0]
+        == leaderboard.loc[leaderboard["status"] == "complete", "rmse"].min()
+    )
+    winner = {"linear": LinearRegression, "tree": DecisionTreeRegressor}
+    model = pd.read_pickle(os.path.join(output_folder, "best_model.pkl"))
+    assert isinstance(model, winner[leaderboard["model"].iloc[0]])
+    assert not os.path.exists(os.path.join(output_folder, "best_model.forest"))
+
+
+@pytest.mark.parametrize(
+    "option", [["--search", "random"], ["--checkpoint-dir", "checkpoints"]]
+)
+def test_bake_off_rejects_search_options(option, capsys):
+    with pytest.raises(SystemExit):
+        main(["--models", "tree", "linear", *option])
+
+    assert "cannot be used with --models" in capsys.readouterr().err